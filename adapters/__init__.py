@@ -2,7 +2,7 @@
 Adapters para transformar datos de diferentes fuentes al schema canónico
 """
 
-from adapters.adapter_base import DataAdapter, CSVAdapter, JSONAdapter
+from adapters.adapter_base import DataAdapter, CSVAdapter, JSONAdapter, JSONLinesAdapter, ParquetAdapter
 from adapters.tera_adapter import TeraAdapter
 from adapters.cloudfleet_adapter import CloudfleetAdapter
 from adapters.scania_adapter import ScaniaAdapter
@@ -12,6 +12,8 @@ __all__ = [
     'DataAdapter',
     'CSVAdapter',
     'JSONAdapter',
+    'JSONLinesAdapter',
+    'ParquetAdapter',
     'TeraAdapter',
     'CloudfleetAdapter',
     'ScaniaAdapter',
@@ -3,10 +3,29 @@ Base adapter class para transformar datos de diferentes fuentes
 al schema canónico de LogiQ AI.
 """
 
+import json
+import os
 import pandas as pd
 import yaml
 from abc import ABC, abstractmethod
-from typing import Dict, Optional
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import pyarrow  # Lectura columnar de Parquet/Arrow (opcional)
+    import pyarrow.feather
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+try:
+    import orjson  # Parseo JSON rápido (opcional)
+except ImportError:
+    orjson = None
+
+# Formato canónico de los timestamps (ISO8601 UTC)
+CANONICAL_TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+CANONICAL_TIMESTAMP_PATTERN = r'\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}Z'
 
 
 class DataAdapter(ABC):
@@ -21,6 +40,12 @@ class DataAdapter(ABC):
         """
         self.mapping_file = mapping_file
         self.mapping = self._load_mapping()
+        # Nombre de la fuente (ej: "tera"), clave de su watermark de carga incremental
+        self.source_name = os.path.basename(mapping_file).replace("_mapping.yaml", "")
+        # Formato en que la fuente manda sus timestamps (`timestamp_format` del mapeo)
+        self.timestamp_format = self.mapping.get("timestamp_format", CANONICAL_TIMESTAMP_FORMAT)
+        # Timestamps que no respetaron el formato declarado y pasaron por la inferencia
+        self.slow_path_rows = 0
     
     def _load_mapping(self) -> Dict:
         """Carga el archivo de mapeo YAML"""
@@ -59,19 +84,66 @@ class DataAdapter(ABC):
         
         return result_df
     
+    def _parse_timestamps(self, values: pd.Series) -> Tuple[pd.Series, int]:
+        """
+        Parsea timestamps con el formato declarado en el mapeo. Solo los
+        valores que no lo respetan pasan por la inferencia de formato (lenta).
+        
+        Returns:
+            (Serie datetime UTC, cantidad de valores que fueron por la ruta lenta)
+        """
+        numeric = values.map(lambda v: pd.api.types.is_number(v) and not isinstance(v, bool)) & values.notna()
+        # Cada ruta puede devolver otra resolución (s, us, ns): se llevan todas a ns para combinarlas
+        parsed = pd.to_datetime(
+            values.where(~numeric), format=self.timestamp_format, utc=True, errors='coerce'
+        ).dt.as_unit('ns')
+        slow = parsed.isna() & values.notna()
+        if slow.any():
+            # Números: segundos Unix (como las columnas *_epoch); texto: inferencia de formato
+            epochs = pd.to_datetime(
+                pd.to_numeric(values[slow & numeric], errors='coerce'), unit='s', utc=True, errors='coerce'
+            ).dt.as_unit('ns')
+            inferred = pd.to_datetime(
+                values[slow & ~numeric], format='mixed', utc=True, errors='coerce'
+            ).dt.as_unit('ns')
+            parsed = epochs.combine_first(inferred).combine_first(parsed)
+        return parsed, int(slow.sum())
+    
     def _normalize_timestamps(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         Normaliza columnas de timestamp a formato ISO8601 UTC.
+        Los valores que ya están en formato canónico se dejan tal cual; el
+        resto se parsea (ver _parse_timestamps) y se re-formatea.
         """
         timestamp_columns = ['timestamp', 'start_time', 'end_time']
         
         for col in timestamp_columns:
-            if col in df.columns:
-                try:
-                    # Intentar parsear y convertir a ISO8601
-                    df[col] = pd.to_datetime(df[col], utc=True).dt.strftime('%Y-%m-%dT%H:%M:%SZ')
-                except Exception as e:
-                    print(f"⚠️  Warning: No se pudo normalizar columna {col}: {e}")
+            if col not in df.columns:
+                continue
+            
+            values = df[col]
+            if values.dtype == object or pd.api.types.is_string_dtype(values):
+                canonical = values.str.fullmatch(CANONICAL_TIMESTAMP_PATTERN).fillna(False).astype(bool)
+            else:
+                canonical = pd.Series(False, index=values.index)
+            pending = ~canonical & values.notna()
+            if not pending.any():
+                continue
+            
+            try:
+                parsed, slow_rows = self._parse_timestamps(values[pending])
+            except Exception as e:
+                # Un valor inesperado no debe abortar la carga: la columna queda como vino
+                print(f"⚠️  Warning: No se pudo normalizar columna {col}: {e}")
+                continue
+            self.slow_path_rows += slow_rows
+            # Lo que no se pudo parsear queda con su valor original
+            formatted = parsed.dt.strftime(CANONICAL_TIMESTAMP_FORMAT).where(parsed.notna(), values[pending])
+            df[col] = values.astype(object).where(~pending, formatted)
+            
+            unparsed = int(parsed.isna().sum())
+            if unparsed:
+                print(f"⚠️  Warning: {unparsed} valores de {col} no se pudieron normalizar")
         
         return df
     
@@ -108,6 +180,96 @@ class DataAdapter(ABC):
         
         print(f"✅ Transformación completada: {len(transformed_df)} registros")
         return transformed_df
+    
+    def incremental_config(self) -> Optional[Dict]:
+        """
+        Sección `incremental` del mapeo (None si la fuente no la define):
+        key (PK canónica), watermark (columna canónica de tiempo),
+        lookback_hours (ventana que se relee para registros que aún cambian)
+        y update_columns (opcional: columnas de tiempo que cambian al
+        actualizarse un registro; una fila se relee si alguna es posterior al
+        corte o está vacía, aunque su watermark sea viejo).
+        """
+        return self.mapping.get("incremental")
+    
+    def source_columns(self, table_name: str) -> List[str]:
+        """Columnas de la fuente que usa el mapeo de una tabla (el resto se descarta)"""
+        return list(dict.fromkeys(self.mapping[table_name].values()))
+    
+    def iter_source_data(self, source_path: str, chunksize: Optional[int] = None,
+                         columns: Optional[Sequence[str]] = None) -> Iterator[pd.DataFrame]:
+        """
+        Datos originales en bloques de hasta `chunksize` filas.
+        Por defecto la fuente se entrega en un único bloque; los adapters
+        que pueden leer por partes (CSV) lo sobrescriben. Si se pasan
+        `columns`, los adapters que lo soportan leen solo esas columnas.
+        """
+        yield self.load_source_data(source_path)
+    
+    def process_chunks(self, source_path: str, table_name: str, watermark: Optional[str] = None,
+                       chunksize: Optional[int] = None) -> Iterator[Tuple[pd.DataFrame, Optional[str]]]:
+        """
+        Como process(), pero leyendo y transformando la fuente por bloques,
+        así la memoria no depende del tamaño del archivo. Si la fuente define
+        carga incremental, solo transforma los registros desde el watermark
+        (menos lookback_hours); sin watermark procesa todo.
+        
+        Args:
+            source_path: Ruta a los datos originales
+            table_name: Tabla destino en schema canónico
+            watermark: Último watermark guardado (ISO8601 UTC) o None
+            chunksize: Filas por bloque (None = un solo bloque)
+        
+        Yields:
+            (bloque transformado, watermark acumulado hasta ese bloque)
+        """
+        config = self.incremental_config()
+        cutoff = None
+        if config and watermark:
+            cutoff = pd.Timestamp(watermark) - pd.Timedelta(hours=config.get("lookback_hours", 0))
+        
+        print(f"📥 Cargando datos desde {source_path}...")
+        self.slow_path_rows = 0
+        new_watermark = watermark
+        read = kept = 0
+        
+        columns = self.source_columns(table_name)
+        for raw_df in self.iter_source_data(source_path, chunksize, columns):
+            read += len(raw_df)
+            if config:
+                source_column = self.mapping[table_name][config["watermark"]]
+                marks, _ = self._parse_timestamps(raw_df[source_column])
+                if marks.notna().any():
+                    latest = marks.max().strftime(CANONICAL_TIMESTAMP_FORMAT)
+                    new_watermark = max(latest, new_watermark) if new_watermark else latest
+                if cutoff is not None:
+                    # Filas sin timestamp válido se releen siempre (el upsert las ignora si no cambiaron)
+                    recent = marks.isna() | (marks >= cutoff)
+                    for column in config.get("update_columns", []):
+                        updated, _ = self._parse_timestamps(raw_df[self.mapping[table_name][column]])
+                        # Vacía = registro todavía abierto (ej: viaje sin llegada)
+                        recent |= updated.isna() | (updated >= cutoff)
+                    raw_df = raw_df[recent]
+            kept += len(raw_df)
+            yield self.transform(raw_df, table_name), new_watermark
+        
+        if cutoff is not None:
+            print(f"⏩ Watermark {watermark}: {kept} de {read} registros por procesar")
+        if self.slow_path_rows:
+            print(f"⚠️  {self.slow_path_rows} timestamps fuera del formato declarado "
+                  f"({self.timestamp_format}): normalizados por la ruta lenta")
+        print(f"✅ Transformación completada: {kept} registros a tabla '{table_name}'")
+    
+    def process_incremental(self, source_path: str, table_name: str,
+                            watermark: Optional[str]) -> Tuple[pd.DataFrame, Optional[str]]:
+        """
+        process_chunks() en un único bloque.
+        
+        Returns:
+            (DataFrame con el delta transformado, nuevo watermark)
+        """
+        (df, new_watermark), = self.process_chunks(source_path, table_name, watermark)
+        return df, new_watermark
 
 
 class CSVAdapter(DataAdapter):
@@ -116,6 +278,16 @@ class CSVAdapter(DataAdapter):
     def load_source_data(self, source_path: str) -> pd.DataFrame:
         """Carga datos desde archivo CSV"""
         return pd.read_csv(source_path)
+    
+    def iter_source_data(self, source_path: str, chunksize: Optional[int] = None,
+                         columns: Optional[Sequence[str]] = None) -> Iterator[pd.DataFrame]:
+        """Lee el CSV de a `chunksize` filas sin cargar el archivo completo"""
+        # Columnas faltantes en el archivo no fallan: transform() las llena con NULL
+        usecols = (lambda column: column in set(columns)) if columns else None
+        if not chunksize:
+            yield pd.read_csv(source_path, usecols=usecols)
+            return
+        yield from pd.read_csv(source_path, chunksize=chunksize, usecols=usecols)
 
 
 class JSONAdapter(DataAdapter):
@@ -124,3 +296,111 @@ class JSONAdapter(DataAdapter):
     def load_source_data(self, source_path: str) -> pd.DataFrame:
         """Carga datos desde archivo JSON"""
         return pd.read_json(source_path)
+
+
+class JSONLinesAdapter(DataAdapter):
+    """
+    Adapter para exports JSON Lines (un registro JSON por línea), como los
+    dumps de eventos de las APIs. Lee el archivo línea a línea, así que la
+    memoria depende del tamaño del bloque y no del archivo.
+    
+    El mapeo puede apuntar a campos anidados con puntos (ej: `vehicle.id`).
+    """
+    
+    def __init__(self, mapping_file: str):
+        super().__init__(mapping_file)
+        # Líneas que no son JSON válido (ej: la última de un dump cortado); se saltean
+        self.malformed_lines = 0
+    
+    @staticmethod
+    def _get_path(record: Dict, path: str):
+        """Valor de un campo anidado (`a.b.c`); None si falta algún nivel"""
+        value = record
+        for key in path.split("."):
+            if not isinstance(value, dict):
+                return None
+            value = value.get(key)
+        return value
+    
+    def _to_frame(self, records: List[Dict], columns: Optional[Sequence[str]]) -> pd.DataFrame:
+        if not columns:
+            return pd.json_normalize(records)
+        return pd.DataFrame({
+            column: [self._get_path(record, column) for record in records] for column in columns
+        })
+    
+    def load_source_data(self, source_path: str) -> pd.DataFrame:
+        """Carga datos desde archivo JSON Lines (todas las columnas, aplanadas con puntos)"""
+        return next(self.iter_source_data(source_path))
+    
+    def iter_source_data(self, source_path: str, chunksize: Optional[int] = None,
+                         columns: Optional[Sequence[str]] = None) -> Iterator[pd.DataFrame]:
+        """Parsea el archivo línea a línea en bloques de `chunksize` registros"""
+        loads = orjson.loads if orjson is not None else json.loads
+        self.malformed_lines = 0
+        records = []
+        emitted = False
+        
+        with open(source_path, "rb") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    records.append(loads(line))
+                except ValueError:
+                    self.malformed_lines += 1
+                    continue
+                if chunksize and len(records) >= chunksize:
+                    yield self._to_frame(records, columns)
+                    records, emitted = [], True
+        
+        if self.malformed_lines:
+            print(f"⚠️  {self.malformed_lines} líneas JSON inválidas ignoradas en {source_path}")
+        if records or not emitted:
+            yield self._to_frame(records, columns)
+
+
+class ParquetAdapter(DataAdapter):
+    """
+    Adapter para archivos columnares: Parquet y Arrow IPC (.arrow/.feather).
+    Solo lee (y decodifica, en varios hilos) las columnas que usa el mapeo.
+    Requiere pyarrow.
+    """
+    
+    ARROW_EXTENSIONS = (".arrow", ".feather", ".ipc")
+    
+    def _read_table(self, source_path: str, columns: Optional[Sequence[str]]):
+        if pyarrow is None:
+            raise ImportError("pyarrow no está instalado: pip install pyarrow")
+        
+        if source_path.endswith(self.ARROW_EXTENSIONS):
+            # memory_map: los bloques se leen del archivo a medida que se convierten
+            names = pyarrow.ipc.open_file(pyarrow.memory_map(source_path)).schema.names
+            present = [c for c in columns if c in names] if columns else None
+            return pyarrow.feather.read_table(source_path, columns=present, memory_map=True, use_threads=True)
+        
+        names = pyarrow.parquet.read_schema(source_path).names
+        present = [c for c in columns if c in names] if columns else None
+        return pyarrow.parquet.read_table(source_path, columns=present, use_threads=True)
+    
+    def load_source_data(self, source_path: str) -> pd.DataFrame:
+        """Carga datos desde archivo Parquet/Arrow"""
+        return self._read_table(source_path, None).to_pandas()
+    
+    def iter_source_data(self, source_path: str, chunksize: Optional[int] = None,
+                         columns: Optional[Sequence[str]] = None) -> Iterator[pd.DataFrame]:
+        """Lee solo las columnas pedidas, de a `chunksize` filas"""
+        if not chunksize:
+            yield self._read_table(source_path, columns).to_pandas()
+            return
+        
+        if source_path.endswith(self.ARROW_EXTENSIONS):
+            for batch in self._read_table(source_path, columns).to_batches(max_chunksize=chunksize):
+                yield batch.to_pandas()
+            return
+        
+        # Parquet: se decodifica por row groups, sin materializar el archivo completo
+        parquet_file = pyarrow.parquet.ParquetFile(source_path)
+        present = [c for c in columns if c in parquet_file.schema_arrow.names] if columns else None
+        for batch in parquet_file.iter_batches(batch_size=chunksize, columns=present, use_threads=True):
+            yield batch.to_pandas()
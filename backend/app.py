@@ -5,20 +5,45 @@ Expone endpoint /query para procesar consultas en lenguaje natural.
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import StreamingResponse, Response
+from pydantic import BaseModel, Field
 import sqlite3
 import os
 import sys
 import time
 import json
+import asyncio
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator, Literal, Tuple, FrozenSet
+
+try:
+    import orjson  # Serialización JSON rápida (opcional)
+except ImportError:
+    orjson = None
 
 # Agregar directorio raíz al path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from backend.lib.validate_sql import validate_sql, SQLValidationError
-from backend.lib.gemini_client import GeminiClient
+from backend.lib.validate_sql import validate_sql, SQLValidationError, ALLOWED_TABLES
+from backend.lib.gemini_client import DEFAULT_MODEL, GeminiClient
+from backend.lib.prompt_builder import PromptBuilder
+from backend.lib.db_pool import SQLiteConnectionPool, SQLitePoolTimeout
+from backend.lib.result_cache import ResultCache, CachedResult
+from backend.lib.translation_cache import TranslationCache
+from backend.lib.query_budget import QueryBudget, QueryBudgetExceeded
+from backend.lib.query_plan import QueryPlanGate, QueryTooExpensive, PlanEstimate
+from backend.lib.rollups import ROLLUP_TABLES, complete_rollup_sources, rewrite_with_rollups
+from backend.lib.partitions import PartitionLayout, load_partition_layout, prune_partitions
+from backend.lib.engines import SQLiteEngine, DuckDBEngine, EngineRouter
+from backend.lib.pagination import (
+    PaginationError, MAX_PAGE_SIZE, CURSOR_SECRET_CONFIGURED, check_cursor_secret,
+    plan_pagination, build_page_sql, encode_cursor, decode_cursor, drop_default_limit
+)
+from backend.lib.concurrency import (
+    AdmissionController, AdmissionRejected, create_executor, run_in_executor, retry_after_header
+)
+from backend.lib.llm_transport import DEFAULT_BASE_URL
+from backend.lib.explanations import Explainer, ExplanationCache, ExplanationUnavailable
 
 
 # Configuración
@@ -26,6 +51,80 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH = os.getenv("DB_PATH", os.path.join(PROJECT_ROOT, "data/logiq.db"))
 LOG_PATH = os.getenv("LOG_PATH", os.path.join(PROJECT_ROOT, "logs/queries.log"))
 PORT = int(os.getenv("PORT", 8000))
+# Procesos uvicorn (uvicorn toma WEB_CONCURRENCY como default de --workers)
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", 1))
+
+# Pool de conexiones SQLite (read-only)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 8))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", 16384))
+DB_MMAP_SIZE_MB = int(os.getenv("DB_MMAP_SIZE_MB", 256))
+DB_POOL_MAX_AGE_S = float(os.getenv("DB_POOL_MAX_AGE_S", 3600))
+
+# Workers de SQLite y control de admisión
+DB_WORKERS = int(os.getenv("DB_WORKERS", DB_POOL_SIZE))
+MAX_CONCURRENT_QUERIES = int(os.getenv("MAX_CONCURRENT_QUERIES", 16))
+MAX_QUEUED_QUERIES = int(os.getenv("MAX_QUEUED_QUERIES", 32))
+QUEUE_TIMEOUT_S = float(os.getenv("QUEUE_TIMEOUT_S", 5))
+RETRY_AFTER_S = float(os.getenv("RETRY_AFTER_S", 2))
+
+# Cache de resultados SQL (invalidado por versión de dataset)
+RESULT_CACHE_MAX_ENTRIES = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", 256))
+RESULT_CACHE_MAX_CELLS = int(os.getenv("RESULT_CACHE_MAX_CELLS", 2_000_000))
+RESULT_CACHE_TTL_S = float(os.getenv("RESULT_CACHE_TTL_S", 300))
+
+# Cache persistente NL→SQL (compartido entre workers)
+TRANSLATION_CACHE_PATH = os.getenv(
+    "TRANSLATION_CACHE_PATH", os.path.join(PROJECT_ROOT, "data/translation_cache.db")
+)
+TRANSLATION_CACHE_MAX_ENTRIES = int(os.getenv("TRANSLATION_CACHE_MAX_ENTRIES", 5000))
+
+# Transporte HTTP async al LLM: timeouts por intento, reintentos y llamadas en curso por proceso
+GEMINI_MODEL = os.getenv("GEMINI_MODEL", DEFAULT_MODEL)
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", DEFAULT_BASE_URL)
+LLM_CONNECT_TIMEOUT_S = float(os.getenv("LLM_CONNECT_TIMEOUT_S", 5))
+LLM_READ_TIMEOUT_S = float(os.getenv("LLM_READ_TIMEOUT_S", 30))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", 2))
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", 8))
+# Crear el transporte en segundo plano al arrancar: el backend responde desde el
+# primer instante (cache de traducciones o templates) y pasa al modelo cuando está listo
+LLM_LAZY_INIT = os.getenv("LLM_LAZY_INIT", "true").lower() == "true"
+
+# Prompt NL→SQL con solo las tablas y ejemplos relevantes, dentro de un presupuesto de tokens
+PROMPT_PRUNING = os.getenv("PROMPT_PRUNING", "true").lower() == "true"
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", 700))
+PROMPT_MAX_EXAMPLES = int(os.getenv("PROMPT_MAX_EXAMPLES", 3))
+
+# Explicaciones memoizadas por (pregunta, SQL, huella del resultado) y diferidas por query_id
+EXPLANATION_CACHE_MAX_ENTRIES = int(os.getenv("EXPLANATION_CACHE_MAX_ENTRIES", 1024))
+EXPLANATION_JOB_TTL_S = float(os.getenv("EXPLANATION_JOB_TTL_S", 600))
+EXPLANATION_MAX_WAIT_S = float(os.getenv("EXPLANATION_MAX_WAIT_S", 30))
+EXPLANATION_KEEPALIVE_S = float(os.getenv("EXPLANATION_KEEPALIVE_S", 15))
+
+# Filas por chunk en /query/stream
+STREAM_CHUNK_ROWS = int(os.getenv("STREAM_CHUNK_ROWS", 500))
+
+# Presupuesto de ejecución por consulta (0 = sin límite)
+QUERY_TIMEOUT = float(os.getenv("QUERY_TIMEOUT", 10))
+QUERY_MAX_VM_STEPS = int(os.getenv("QUERY_MAX_VM_STEPS", 100_000_000))
+FETCH_CHUNK_ROWS = 1000
+
+# Compuerta de costo (EXPLAIN QUERY PLAN): filas estimadas a recorrer (0 = sin límite)
+QUERY_PLAN_MAX_COST = float(os.getenv("QUERY_PLAN_MAX_COST", 1_000_000_000))
+QUERY_PLAN_WARN_COST = float(os.getenv("QUERY_PLAN_WARN_COST", 10_000_000))
+
+# Responder agregaciones desde los rollups diarios (mantenidos por load_data.py)
+ROLLUP_REWRITE = os.getenv("ROLLUP_REWRITE", "true").lower() == "true"
+
+# Leer solo las particiones mensuales que el filtro de tiempo puede tocar
+PARTITION_PRUNING = os.getenv("PARTITION_PRUNING", "true").lower() == "true"
+
+# Motor columnar opcional para agregaciones pesadas ("none" o "duckdb")
+COLUMNAR_ENGINE = os.getenv("COLUMNAR_ENGINE", "none").lower()
+COLUMNAR_MIN_COST = float(os.getenv("COLUMNAR_MIN_COST", 100_000))
+COLUMNAR_THREADS = int(os.getenv("COLUMNAR_THREADS", 0))
+
+# Los cursores de paginación tienen que poder validarse en cualquier worker
+check_cursor_secret(WEB_CONCURRENCY)
 
 # Inicializar FastAPI
 app = FastAPI(
@@ -44,7 +143,62 @@ app.add_middleware(
 )
 
 # Inicializar cliente Gemini
-gemini_client = GeminiClient()
+translation_cache = TranslationCache(TRANSLATION_CACHE_PATH, max_entries=TRANSLATION_CACHE_MAX_ENTRIES)
+gemini_client = GeminiClient(
+    translation_cache=translation_cache,
+    model_name=GEMINI_MODEL,
+    base_url=GEMINI_BASE_URL,
+    connect_timeout_s=LLM_CONNECT_TIMEOUT_S,
+    read_timeout_s=LLM_READ_TIMEOUT_S,
+    max_retries=LLM_MAX_RETRIES,
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    lazy=LLM_LAZY_INIT,
+    prompt_builder=PromptBuilder(PROMPT_MAX_TOKENS, PROMPT_MAX_EXAMPLES) if PROMPT_PRUNING else None
+)
+
+# Explicaciones: el modelo es parte de la clave (cambia al terminar la inicialización lazy)
+explainer = Explainer(
+    generate=lambda nl, sql, rows: gemini_client.generate_explanation_async(nl, sql, rows, raise_errors=True),
+    model=lambda: gemini_client.model_name,
+    fallback=gemini_client.generate_explanation_offline,
+    cache=ExplanationCache(max_entries=EXPLANATION_CACHE_MAX_ENTRIES),
+    job_ttl_s=EXPLANATION_JOB_TTL_S
+)
+
+# Pool de conexiones (las conexiones se abren bajo demanda)
+db_pool = SQLiteConnectionPool(
+    DB_PATH,
+    size=DB_POOL_SIZE,
+    cache_size_kb=DB_CACHE_SIZE_KB,
+    mmap_size_mb=DB_MMAP_SIZE_MB,
+    max_age_s=DB_POOL_MAX_AGE_S
+)
+
+result_cache = ResultCache(
+    max_entries=RESULT_CACHE_MAX_ENTRIES,
+    max_cells=RESULT_CACHE_MAX_CELLS,
+    ttl_s=RESULT_CACHE_TTL_S
+)
+
+plan_gate = QueryPlanGate(max_cost=QUERY_PLAN_MAX_COST, warn_cost=QUERY_PLAN_WARN_COST)
+
+# Motores de ejecución: SQLite siempre; DuckDB (si se configura) para agregaciones pesadas
+columnar_engine = None
+if COLUMNAR_ENGINE == "duckdb":
+    try:
+        columnar_engine = DuckDBEngine(DB_PATH, sorted(ALLOWED_TABLES | ROLLUP_TABLES), threads=COLUMNAR_THREADS)
+    except ImportError as e:
+        print(f"⚠️  {e}. Se usa solo SQLite.")
+engine_router = EngineRouter(SQLiteEngine(FETCH_CHUNK_ROWS), columnar_engine, min_cost=COLUMNAR_MIN_COST)
+
+# Pool dedicado a SQLite; las llamadas al LLM son async y no ocupan threads
+db_executor = create_executor(DB_WORKERS, "db")
+admission = AdmissionController(
+    max_concurrent=MAX_CONCURRENT_QUERIES,
+    max_queue=MAX_QUEUED_QUERIES,
+    queue_timeout_s=QUEUE_TIMEOUT_S,
+    retry_after_s=RETRY_AFTER_S
+)
 
 
 # Modelos Pydantic
@@ -52,6 +206,16 @@ class QueryRequest(BaseModel):
     """Request para endpoint /query"""
     user: str
     nl: str  # natural language query
+    # rows: lista de dicts (QueryResponse) | compact: columnas + filas como arrays
+    # | columnar: columnas + un array por columna
+    format: Literal["rows", "compact", "columnar"] = "rows"
+    # Si se indica, retorna solo la primera página + next_cursor (paginación keyset)
+    page_size: Optional[int] = Field(default=None, ge=1, le=MAX_PAGE_SIZE)
+    # Si la consulta agota su presupuesto, retornar las filas leídas hasta ese momento
+    allow_partial: bool = False
+    # inline: explicación en la respuesta | deferred: responde sin esperarla (query_id
+    # para GET /query/{query_id}/explanation[/stream]) | none: sin explicación
+    explain: Literal["inline", "deferred", "none"] = "inline"
 
 
 class QueryResponse(BaseModel):
@@ -62,37 +226,274 @@ class QueryResponse(BaseModel):
     explanation: str
     execution_time_ms: float
     rows_count: int
+    next_cursor: Optional[str] = None
+    partial: bool = False
+    # Advertencias de la compuerta de costo (consulta pesada pero permitida)
+    warnings: List[str] = []
+    # Explicación diferida en curso (explain=deferred y no estaba memoizada)
+    query_id: Optional[str] = None
+
+
+class PageRequest(BaseModel):
+    """Request para endpoint /query/page"""
+    cursor: str
+    format: Literal["rows", "compact", "columnar"] = "rows"
+
+
+class PageResponse(BaseModel):
+    """Response del endpoint /query/page"""
+    sql: str
+    rows: List[Dict[str, Any]]
+    rows_count: int
+    execution_time_ms: float
+    next_cursor: Optional[str] = None
 
 
 # Funciones auxiliares
-def get_db_connection():
-    """Obtiene conexión a SQLite"""
+def get_db_connection(detached: bool = False):
+    """
+    Obtiene una conexión read-only del pool (usar como context manager).
+    """
     if not os.path.exists(DB_PATH):
         raise HTTPException(
             status_code=500,
             detail=f"Base de datos no encontrada: {DB_PATH}. Ejecutar ./run_backend.sh primero."
         )
-    return sqlite3.connect(DB_PATH)
+    return db_pool.connection(detached=detached)
+
+
+def get_dataset_version(conn: sqlite3.Connection) -> int:
+    """Versión del dataset (PRAGMA user_version, incrementada por load_data.py)"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def new_query_budget() -> QueryBudget:
+    """Presupuesto de ejecución con los límites configurados"""
+    return QueryBudget(max_seconds=QUERY_TIMEOUT, max_steps=QUERY_MAX_VM_STEPS)
+
+
+# Versión de dataset → tablas de hechos cuyo rollup cubre todas las filas (None sin rollups)
+_rollups_by_version: Dict[int, Optional[FrozenSet[str]]] = {}
+
+
+def rollup_coverage(conn: sqlite3.Connection, version: int) -> Optional[FrozenSet[str]]:
+    """
+    None si load_data.py todavía no construyó los rollups en esta versión del
+    dataset; si no, las tablas de hechos sin filas de tiempo NULL (para esas
+    también se reescriben consultas sin límite de tiempo)
+    """
+    if version not in _rollups_by_version:
+        placeholders = ", ".join("?" for _ in ROLLUP_TABLES)
+        found = conn.execute(
+            f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({placeholders})",
+            tuple(ROLLUP_TABLES)
+        ).fetchone()[0]
+        _rollups_by_version[version] = complete_rollup_sources(conn) if found == len(ROLLUP_TABLES) else None
+    return _rollups_by_version[version]
+
+
+# Versión de dataset → particiones de telemetry/alerts (una sola versión a la vez)
+_partitions_by_version: Dict[int, PartitionLayout] = {}
+
+
+def partition_layout(conn: sqlite3.Connection, version: int) -> PartitionLayout:
+    """Particiones mensuales existentes en esta versión del dataset"""
+    layout = _partitions_by_version.get(version)
+    if layout is None:
+        layout = load_partition_layout(conn)
+        _partitions_by_version.clear()
+        _partitions_by_version[version] = layout
+    return layout
+
+
+def prepare_query(sql: str, rewrite: bool = True) -> Tuple[str, PlanEstimate]:
+    """
+    Elige el SQL a ejecutar (reescrito sobre rollups si el resultado es el
+    mismo, y leyendo solo las particiones que el filtro de tiempo puede
+    tocar) e inspecciona su plan antes de ejecutarlo (cacheado por SQL).
+    
+    Returns:
+        (SQL a ejecutar, estimación del plan)
+    
+    Raises:
+        QueryTooExpensive: Si el costo estimado supera QUERY_PLAN_MAX_COST
+    """
+    try:
+        with get_db_connection() as conn:
+            version = get_dataset_version(conn)
+            exec_sql = sql
+            coverage = rollup_coverage(conn, version) if rewrite and ROLLUP_REWRITE else None
+            if coverage is not None:
+                exec_sql = rewrite_with_rollups(sql, coverage) or sql
+            if rewrite and PARTITION_PRUNING:
+                exec_sql = prune_partitions(conn, exec_sql, partition_layout(conn, version)) or exec_sql
+            return exec_sql, plan_gate.check(conn, exec_sql, version)
+    except SQLitePoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
 
 def execute_sql(sql: str) -> List[Dict[str, Any]]:
     """
     Ejecuta SQL y retorna resultados como lista de dicts.
     """
-    conn = get_db_connection()
-    conn.row_factory = sqlite3.Row  # Para obtener resultados como dict
+    return fetch_result(sql).to_dicts()
+
+
+def fetch_result(sql: str, budget: Optional[QueryBudget] = None, allow_partial: bool = False) -> CachedResult:
+    """
+    Ejecuta SQL y retorna el resultado compacto (columnas + tuplas).
+    Los resultados se sirven desde el cache si el dataset no cambió.
+    El router elige el motor (SQLite o el columnar, si está configurado).
+    
+    Raises:
+        QueryBudgetExceeded: Si la consulta agota su presupuesto (y no se
+                             aceptan resultados parciales)
+    """
+    budget = budget or new_query_budget()
     
     try:
-        cursor = conn.cursor()
-        cursor.execute(sql)
-        rows = cursor.fetchall()
-        
-        # Convertir Row objects a dicts
-        result = [dict(row) for row in rows]
-        return result
-        
-    finally:
-        conn.close()
+        with get_db_connection() as conn:
+            version = get_dataset_version(conn)
+            cached = result_cache.get(sql, version)
+            
+            if cached is None:
+                # El costo del plan (ya cacheado por la compuerta) decide el motor
+                plan_cost = plan_gate.inspect(conn, sql, version).cost if engine_router.columnar else 0
+                columns, rows, partial, engine = engine_router.execute(
+                    conn, version, sql, plan_cost, budget, allow_partial
+                )
+                if engine != "sqlite":
+                    print(f"⚙️  Ejecutada en {engine}")
+                if partial:
+                    return CachedResult(columns, rows, partial=True)
+                
+                cached = result_cache.put(sql, version, columns, rows)
+    except SQLitePoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    
+    return cached
+
+
+def fetch_page(sql: str, page_size: int, cursor: Optional[str] = None, budget: Optional[QueryBudget] = None):
+    """
+    Ejecuta una página keyset.
+    
+    Sin cursor, planifica la paginación del SQL validado (sin LIMIT impuesto);
+    si no es paginable, ejecuta la consulta normal con el LIMIT por defecto.
+    
+    Returns:
+        (CachedResult de la página, SQL ejecutado, next_cursor o None)
+    """
+    budget = budget or new_query_budget()
+    
+    try:
+        with get_db_connection() as conn:
+            if cursor is None:
+                probe = conn.execute(f"SELECT * FROM ({sql.rstrip().rstrip(';')}) LIMIT 0")
+                plan = plan_pagination(sql, [col[0] for col in probe.description])
+                if plan is None:
+                    limited_sql = validate_sql(sql, strict=True)
+                    return fetch_result(limited_sql, budget), limited_sql, None
+                after, remaining = None, plan.cap
+            else:
+                plan, after, remaining, page_size = decode_cursor(cursor)
+                # Defensa adicional: el SQL del cursor vuelve a validarse
+                validate_sql(plan.base_sql, strict=True, enforce_limit=False)
+            
+            size = page_size if remaining is None else min(page_size, remaining)
+            page_sql, params = build_page_sql(plan, after, size)
+            with budget.guard(conn):
+                db_cursor = conn.execute(page_sql, params)
+                columns = [col[0] for col in db_cursor.description]
+                rows = db_cursor.fetchall()
+    except SQLitePoolTimeout as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except (PaginationError, SQLValidationError) as e:
+        raise HTTPException(status_code=400, detail=f"Paginación inválida: {str(e)}")
+    
+    has_more = len(rows) > size
+    rows = rows[:size]
+    if remaining is not None:
+        remaining -= len(rows)
+        has_more = has_more and remaining > 0
+    
+    result = CachedResult(columns, rows)
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = encode_cursor(plan, dict(zip(columns, rows[-1])), remaining, page_size)
+    return result, plan.base_sql, next_cursor
+
+
+class SQLResultStream:
+    """
+    Lee un resultado SQL por chunks (cursor.fetchmany) sin materializarlo.
+    Cada método es bloqueante y se ejecuta en el pool DB; la conexión es
+    detached porque los chunks pueden leerse desde threads distintos.
+    """
+    
+    def __init__(self, sql: str, chunk_rows: int = STREAM_CHUNK_ROWS, budget: Optional[QueryBudget] = None):
+        self.sql = sql
+        self.chunk_rows = chunk_rows
+        self.budget = budget or new_query_budget()
+        self._conn = None
+        self.columns: List[str] = []
+        self._conn_ctx = None
+        self._cursor = None
+        self._cached_rows = None
+    
+    def open(self) -> List[str]:
+        """Ejecuta el SQL y retorna los nombres de columnas"""
+        self._conn_ctx = get_db_connection(detached=True)
+        try:
+            conn = self._conn_ctx.__enter__()
+            cached = result_cache.get(self.sql, get_dataset_version(conn))
+            if cached is not None:
+                # Resultado ya materializado: se sirve desde el cache
+                self.columns = list(cached.columns)
+                self._cached_rows = iter(cached.rows)
+                self.close()
+            else:
+                self._conn = conn
+                with self.budget.guard(conn):
+                    self._cursor = conn.execute(self.sql)
+                self.columns = [col[0] for col in self._cursor.description]
+        except SQLitePoolTimeout as e:
+            self._conn_ctx = None
+            raise HTTPException(status_code=503, detail=str(e))
+        except Exception:
+            self.close()
+            raise
+        return self.columns
+    
+    def fetch(self) -> List[tuple]:
+        """Retorna el siguiente chunk de filas (lista vacía al terminar)"""
+        if self._cached_rows is not None:
+            return [row for _, row in zip(range(self.chunk_rows), self._cached_rows)]
+        if self._cursor is None:
+            return []
+        with self.budget.guard(self._conn):
+            return self._cursor.fetchmany(self.chunk_rows)
+    
+    def close(self):
+        """Libera cursor y conexión"""
+        if self._cursor is not None:
+            self._cursor.close()
+            self._cursor = None
+        self._conn = None
+        if self._conn_ctx is not None:
+            ctx, self._conn_ctx = self._conn_ctx, None
+            ctx.__exit__(None, None, None)
+
+
+def json_response(payload: Dict[str, Any]) -> Response:
+    """
+    Respuesta JSON sin validación Pydantic por fila (usa orjson si está instalado).
+    """
+    if orjson is not None:
+        body = orjson.dumps(payload, option=orjson.OPT_NON_STR_KEYS, default=str)
+    else:
+        body = json.dumps(payload, ensure_ascii=False, default=str, separators=(",", ":")).encode("utf-8")
+    return Response(content=body, media_type="application/json")
 
 
 def log_query(user: str, nl: str, sql: str, exec_time_ms: float, rows_count: int, error: Optional[str] = None):
@@ -125,8 +526,12 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "query": "POST /query",
+            "query_stream": "POST /query/stream",
+            "query_page": "POST /query/page",
+            "query_explanation": "GET /query/{query_id}/explanation[/stream]",
             "health": "GET /health",
-            "schema": "GET /schema"
+            "schema": "GET /schema",
+            "cache": "GET /cache/stats"
         }
     }
 
@@ -135,21 +540,22 @@ async def root():
 async def health():
     """Health check endpoint"""
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT COUNT(*) FROM trucks")
-        count = cursor.fetchone()[0]
-        conn.close()
+        with get_db_connection() as conn:
+            count = conn.execute("SELECT COUNT(*) FROM trucks").fetchone()[0]
         
         return {
             "status": "healthy",
             "database": "connected",
-            "trucks_count": count
+            "trucks_count": count,
+            "db_pool": db_pool.status(),
+            "admission": admission.status(),
+            "llm": gemini_client.status()
         }
     except Exception as e:
         return {
             "status": "unhealthy",
-            "error": str(e)
+            "error": str(e),
+            "llm": gemini_client.status()
         }
 
 
@@ -167,17 +573,20 @@ async def get_schema():
                 "primary_key": "driver_id"
             },
             "trips": {
-                "columns": ["trip_id", "truck_id", "origin", "destination", "start_time", "end_time", "distance_km", "status"],
+                "columns": ["trip_id", "truck_id", "origin", "destination", "start_time", "end_time", "distance_km", "status",
+                            "start_time_epoch", "end_time_epoch"],
                 "primary_key": "trip_id",
                 "foreign_keys": {"truck_id": "trucks.truck_id"}
             },
             "telemetry": {
-                "columns": ["telemetry_id", "truck_id", "timestamp", "speed_kmh", "fuel_level", "engine_temp_c"],
+                "columns": ["telemetry_id", "truck_id", "timestamp", "speed_kmh", "fuel_level", "engine_temp_c",
+                            "timestamp_epoch"],
                 "primary_key": "telemetry_id",
                 "foreign_keys": {"truck_id": "trucks.truck_id"}
             },
             "alerts": {
-                "columns": ["alert_id", "truck_id", "timestamp", "alert_type", "severity", "description"],
+                "columns": ["alert_id", "truck_id", "timestamp", "alert_type", "severity", "description",
+                            "timestamp_epoch"],
                 "primary_key": "alert_id",
                 "foreign_keys": {"truck_id": "trucks.truck_id"}
             }
@@ -191,59 +600,163 @@ async def query(request: QueryRequest):
     Endpoint principal: procesa consulta en lenguaje natural.
     
     Flujo:
-    1. Recibir NL query
-    2. Llamar Gemini para generar SQL
-    3. Validar SQL
-    4. Ejecutar SQL en SQLite
-    5. Generar explicación
+    1. Recibir NL query (control de admisión)
+    2. Llamar Gemini para generar SQL (async)
+    3. Validar SQL, reescribir sobre rollups y verificar el costo del plan
+    4. Ejecutar SQL en SQLite (pool DB)
+    5. Generar explicación (async, memoizada; con explain=deferred en segundo plano)
     6. Retornar resultados + log
     """
+    try:
+        async with admission.admit():
+            return await _run_query_pipeline(request)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers=retry_after_header(e.retry_after_s)
+        )
+
+
+async def _generate_validated_sql(nl_query: str, enforce_limit: bool = True) -> str:
+    """Etapas comunes a /query y /query/stream: NL→SQL (LLM async) y validación"""
+    print(f"📝 NL Query: {nl_query}")
+    sql = await gemini_client.nl_to_sql_async(nl_query)
+    print(f"🔍 Generated SQL: {sql}")
+    
+    try:
+        sql = validate_sql(sql, strict=True, enforce_limit=enforce_limit)
+        print(f"✅ SQL validado")
+    except SQLValidationError as e:
+        gemini_client.invalidate_translation(nl_query)
+        raise HTTPException(
+            status_code=400,
+            detail=f"SQL inválido: {str(e)}"
+        )
     
+    return sql
+
+
+async def _prepare_query(
+    user: str, nl_query: str, sql: str, start_time: float, rewrite: bool = True
+) -> Tuple[str, PlanEstimate]:
+    """
+    Etapa entre validación y ejecución (pool DB): reescritura (rollups y poda
+    de particiones) y compuerta de costo, que rechaza con 400 los planes que
+    superan QUERY_PLAN_MAX_COST antes de tocar los datos.
+    """
+    try:
+        exec_sql, plan = await run_in_executor(db_executor, prepare_query, sql, rewrite)
+        if exec_sql != sql:
+            print(f"♻️  Reescrita: {exec_sql}")
+        return exec_sql, plan
+    except QueryTooExpensive as e:
+        exec_time_ms = (time.time() - start_time) * 1000
+        print(f"🚫 Plan rechazado: {e}")
+        log_query(user, nl_query, sql, exec_time_ms, 0, f"plan_rejected: {e}")
+        raise HTTPException(
+            status_code=400,
+            detail=f"{e}. Reformula la consulta con más filtros."
+        )
+
+
+async def _run_db_stage(budget: QueryBudget, func, *args):
+    """
+    Ejecuta una etapa SQLite en el pool DB. Si la request se cancela mientras
+    espera, la consulta se interrumpe para no dejar el worker ocupado.
+    """
+    try:
+        return await run_in_executor(db_executor, func, *args)
+    except asyncio.CancelledError:
+        budget.cancel()
+        raise
+
+
+def _budget_exceeded_error(
+    user: str, nl_query: str, sql: str, start_time: float, error: QueryBudgetExceeded
+) -> HTTPException:
+    """Registra la cancelación y arma el error 422 para el cliente"""
+    exec_time_ms = (time.time() - start_time) * 1000
+    print(f"⏹️  Consulta cancelada: {error}")
+    log_query(user, nl_query, sql, exec_time_ms, 0, f"budget_exceeded: {error}")
+    return HTTPException(
+        status_code=422,
+        detail=f"{error}. Reformula la consulta con más filtros o usa allow_partial."
+    )
+
+
+async def _run_query_pipeline(request: QueryRequest) -> QueryResponse:
+    """Pipeline de /query; cada etapa bloqueante corre en su propio pool"""
     start_time = time.time()
     user = request.user
     nl_query = request.nl
     
     sql = ""
-    rows = []
     explanation = ""
     error_msg = None
+    next_cursor = None
+    query_id = None
+    paginated = request.page_size is not None
     
     try:
-        # Paso 1: Generar SQL desde lenguaje natural
-        print(f"📝 NL Query: {nl_query}")
-        sql = gemini_client.nl_to_sql(nl_query)
-        print(f"🔍 Generated SQL: {sql}")
+        # Pasos 1-2: Generar SQL desde lenguaje natural y validarlo
+        sql = await _generate_validated_sql(nl_query, enforce_limit=not paginated)
         
-        # Paso 2: Validar SQL
-        try:
-            sql = validate_sql(sql, strict=True)
-            print(f"✅ SQL validado")
-        except SQLValidationError as e:
-            raise HTTPException(
-                status_code=400,
-                detail=f"SQL inválido: {str(e)}"
-            )
+        # Paso 2b: Reescribir (rollups, particiones) y estimar el costo del plan
+        # (la paginación keyset necesita el SQL validado sobre las tablas crudas)
+        exec_sql, plan = await _prepare_query(user, nl_query, sql, start_time, rewrite=not paginated)
+        warnings = plan_gate.warnings(plan)
         
-        # Paso 3: Ejecutar SQL
-        rows = execute_sql(sql)
-        print(f"📊 Resultados: {len(rows)} filas")
+        # Paso 3: Ejecutar SQL (o solo su primera página) con presupuesto
+        budget = new_query_budget()
+        try:
+            if paginated:
+                result, sql, next_cursor = await _run_db_stage(
+                    budget, fetch_page, sql, request.page_size, None, budget
+                )
+            else:
+                result = await _run_db_stage(
+                    budget, fetch_result, exec_sql, budget, request.allow_partial
+                )
+        except QueryBudgetExceeded as e:
+            raise _budget_exceeded_error(user, nl_query, sql, start_time, e)
+        rows_count = len(result.rows)
+        print(f"📊 Resultados: {rows_count} filas")
+        if result.partial:
+            print(f"⏹️  Resultado parcial: {budget.exceeded()}")
         
-        # Paso 4: Generar explicación
-        explanation = gemini_client.generate_explanation(nl_query, sql, rows)
+        # Paso 4: Explicación memoizada, generada acá o en segundo plano (query_id)
+        if request.explain == "inline":
+            explanation = await explainer.explain(nl_query, sql, result)
+        elif request.explain == "deferred":
+            explanation, query_id = explainer.defer(nl_query, sql, result)
+            explanation = explanation or ""
         
         # Calcular tiempo de ejecución
         exec_time_ms = (time.time() - start_time) * 1000
         
         # Log exitoso
-        log_query(user, nl_query, sql, exec_time_ms, len(rows))
+        log_query(
+            user, nl_query, sql, exec_time_ms, rows_count,
+            f"budget_exceeded (parcial): {budget.exceeded()}" if result.partial else None
+        )
+        
+        if request.format != "rows":
+            return _compact_query_response(
+                request, sql, result, explanation, exec_time_ms, next_cursor, warnings, query_id
+            )
         
         return QueryResponse(
             nl=nl_query,
             sql=sql,
-            rows=rows,
+            rows=result.to_dicts(),
             explanation=explanation,
             execution_time_ms=round(exec_time_ms, 2),
-            rows_count=len(rows)
+            rows_count=rows_count,
+            next_cursor=next_cursor,
+            partial=result.partial,
+            warnings=warnings,
+            query_id=query_id
         )
         
     except HTTPException:
@@ -262,6 +775,252 @@ async def query(request: QueryRequest):
         )
 
 
+def _compact_payload(format: str, result: CachedResult) -> Dict[str, Any]:
+    """Columnas + filas como arrays (compact) o un array por columna (columnar)"""
+    payload: Dict[str, Any] = {"format": format, "columns": list(result.columns)}
+    if format == "columnar":
+        payload["data"] = result.to_column_arrays()
+    else:
+        payload["rows"] = result.rows
+    return payload
+
+
+def _compact_query_response(
+    request: QueryRequest, sql: str, result: CachedResult, explanation: str,
+    exec_time_ms: float, next_cursor: Optional[str] = None, warnings: Optional[List[str]] = None,
+    query_id: Optional[str] = None
+) -> Response:
+    """
+    Respuesta de /query en formato compact/columnar: una sola cabecera de
+    columnas y filas como arrays (o un array por columna).
+    """
+    payload = {"nl": request.nl, "sql": sql}
+    payload.update(_compact_payload(request.format, result))
+    payload.update({
+        "explanation": explanation,
+        "execution_time_ms": round(exec_time_ms, 2),
+        "rows_count": len(result.rows),
+        "next_cursor": next_cursor,
+        "partial": result.partial,
+        "warnings": warnings or [],
+        "query_id": query_id
+    })
+    return json_response(payload)
+
+
+@app.post("/query/page", response_model=PageResponse)
+async def query_page(request: PageRequest):
+    """
+    Retorna la página siguiente de un /query paginado (sin LLM ni explicación).
+    El cursor indica desde qué fila retomar, así que cada página cuesta lo mismo
+    sin importar cuántas páginas se hayan leído antes.
+    """
+    start_time = time.time()
+    budget = new_query_budget()
+    
+    try:
+        async with admission.admit():
+            result, sql, next_cursor = await _run_db_stage(
+                budget, fetch_page, "", MAX_PAGE_SIZE, request.cursor, budget
+            )
+    except QueryBudgetExceeded as e:
+        raise _budget_exceeded_error("-", "(página)", "", start_time, e)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers=retry_after_header(e.retry_after_s)
+        )
+    
+    exec_time_ms = round((time.time() - start_time) * 1000, 2)
+    
+    if request.format != "rows":
+        payload = {"sql": sql}
+        payload.update(_compact_payload(request.format, result))
+        payload.update({
+            "rows_count": len(result.rows),
+            "execution_time_ms": exec_time_ms,
+            "next_cursor": next_cursor
+        })
+        return json_response(payload)
+    
+    return PageResponse(
+        sql=sql,
+        rows=result.to_dicts(),
+        rows_count=len(result.rows),
+        execution_time_ms=exec_time_ms,
+        next_cursor=next_cursor
+    )
+
+
+def _ndjson(record: Dict[str, Any]) -> bytes:
+    """Serializa un registro NDJSON (una línea por objeto)"""
+    return (json.dumps(record, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+
+
+async def _stream_query_results(
+    user: str, nl_query: str, sql: str, start_time: float,
+    warnings: Optional[List[str]] = None, exec_sql: Optional[str] = None
+) -> AsyncIterator[bytes]:
+    """
+    Genera el cuerpo NDJSON de /query/stream:
+    meta (SQL + columnas) → rows (un registro por chunk) → end | error.
+    `exec_sql` es el SQL a ejecutar si difiere del generado (ej: rollups).
+    """
+    stream = SQLResultStream(exec_sql or sql)
+    rows_count = 0
+    error_msg = None
+    
+    try:
+        columns = await run_in_executor(db_executor, stream.open)
+        yield _ndjson({
+            "type": "meta", "nl": nl_query, "sql": sql, "columns": columns, "warnings": warnings or []
+        })
+        
+        while True:
+            chunk = await run_in_executor(db_executor, stream.fetch)
+            if not chunk:
+                break
+            rows_count += len(chunk)
+            yield _ndjson({"type": "rows", "rows": [list(row) for row in chunk]})
+        
+        exec_time_ms = (time.time() - start_time) * 1000
+        yield _ndjson({
+            "type": "end",
+            "rows_count": rows_count,
+            "execution_time_ms": round(exec_time_ms, 2)
+        })
+    
+    except HTTPException as e:
+        error_msg = str(e.detail)
+        yield _ndjson({"type": "error", "detail": error_msg})
+    
+    except QueryBudgetExceeded as e:
+        # Las filas ya enviadas quedan como resultado parcial
+        error_msg = f"budget_exceeded: {e}"
+        print(f"⏹️  Stream cancelado: {e}")
+        yield _ndjson({"type": "error", "detail": str(e), "partial": True, "rows_count": rows_count})
+    
+    except asyncio.CancelledError:
+        # Cliente desconectado: interrumpir la consulta en curso
+        stream.budget.cancel()
+        error_msg = "cliente desconectado"
+        raise
+    
+    except Exception as e:
+        error_msg = str(e)
+        yield _ndjson({"type": "error", "detail": f"Error procesando query: {error_msg}"})
+    
+    finally:
+        await run_in_executor(db_executor, stream.close)
+        exec_time_ms = (time.time() - start_time) * 1000
+        log_query(user, nl_query, sql, exec_time_ms, rows_count, error_msg)
+
+
+@app.post("/query/stream")
+async def query_stream(request: QueryRequest):
+    """
+    Variante streaming de /query: retorna NDJSON (application/x-ndjson).
+    
+    El SQL generado y las columnas se envían primero y las filas en chunks
+    de STREAM_CHUNK_ROWS a medida que se leen del cursor, sin materializar
+    el resultado completo. No incluye explicación (requiere todas las filas).
+    
+    Sin el LIMIT por defecto: el stream no materializa filas, así que una
+    lectura grande (ej: telemetría completa) la acotan la compuerta de costo
+    y el presupuesto de ejecución (QueryBudget), no un tope de filas.
+    """
+    start_time = time.time()
+    
+    try:
+        async with admission.admit():
+            sql = drop_default_limit(await _generate_validated_sql(request.nl, enforce_limit=False))
+            exec_sql, plan = await _prepare_query(request.user, request.nl, sql, start_time)
+    except AdmissionRejected as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers=retry_after_header(e.retry_after_s)
+        )
+    
+    return StreamingResponse(
+        _stream_query_results(request.user, request.nl, sql, start_time, plan_gate.warnings(plan), exec_sql),
+        media_type="application/x-ndjson"
+    )
+
+
+@app.get("/query/{query_id}/explanation")
+async def query_explanation(query_id: str, wait_s: float = 0):
+    """
+    Explicación diferida de una consulta hecha con explain=deferred.
+    Con wait_s > 0 espera hasta ese tiempo (long-poll, tope EXPLANATION_MAX_WAIT_S).
+    """
+    try:
+        explanation = await explainer.wait(query_id, min(max(wait_s, 0.0), EXPLANATION_MAX_WAIT_S))
+    except ExplanationUnavailable as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error generando explicación: {e}")
+    return {
+        "query_id": query_id,
+        "status": "pending" if explanation is None else "ready",
+        "explanation": explanation
+    }
+
+
+def _sse(event: str, data: Dict[str, Any]) -> bytes:
+    """Serializa un evento server-sent events"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+async def _stream_explanation(query_id: str) -> AsyncIterator[bytes]:
+    """Comentarios keep-alive mientras se genera, después un evento explanation (o error)"""
+    while True:
+        try:
+            explanation = await explainer.wait(query_id, EXPLANATION_KEEPALIVE_S)
+        except ExplanationUnavailable as e:
+            yield _sse("error", {"query_id": query_id, "detail": str(e)})
+            return
+        except Exception as e:
+            yield _sse("error", {"query_id": query_id, "detail": f"Error generando explicación: {e}"})
+            return
+        if explanation is not None:
+            yield _sse("explanation", {"query_id": query_id, "explanation": explanation})
+            return
+        yield b": keep-alive\n\n"
+
+
+@app.get("/query/{query_id}/explanation/stream")
+async def query_explanation_stream(query_id: str):
+    """Variante server-sent events (text/event-stream) de /query/{query_id}/explanation"""
+    try:
+        await explainer.wait(query_id)
+    except ExplanationUnavailable as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception:
+        # La generación falló: el stream lo informa como evento error
+        pass
+    return StreamingResponse(
+        _stream_explanation(query_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Contadores de los caches del backend"""
+    return {
+        "results": result_cache.stats(),
+        "translations": translation_cache.stats(),
+        "plans": plan_gate.stats(),
+        "engines": engine_router.stats(),
+        "explanations": explainer.stats(),
+        "prompts": gemini_client.prompt_stats(),
+        "llm": gemini_client.transport_stats()
+    }
+
+
 @app.get("/logs")
 async def get_logs(limit: int = 50):
     """Retorna últimos logs de queries"""
@@ -284,12 +1043,19 @@ async def get_logs(limit: int = 50):
 @app.on_event("startup")
 async def startup_event():
     """Evento de inicio"""
+    # Sin bloquear: /health y las respuestas cacheadas/templates no esperan al LLM
+    gemini_client.start()
+    
     print("=" * 60)
     print("🚀 LogiQ AI API - Starting...")
     print("=" * 60)
     print(f"📁 Database: {DB_PATH}")
     print(f"📝 Logs: {LOG_PATH}")
-    print(f"🔑 Gemini Mode: {'API' if not gemini_client.use_mock else 'Mock'}")
+    print(f"🔌 Pool SQLite: {DB_POOL_SIZE} conexiones read-only")
+    print(f"🧵 LLM: máx. {LLM_MAX_CONCURRENCY} llamadas / {DB_WORKERS} workers DB (máx. {MAX_CONCURRENT_QUERIES} en curso, {MAX_QUEUED_QUERIES} en cola)")
+    print(f"🔑 Gemini Mode: {'Mock' if gemini_client.use_mock else f'API ({gemini_client.model_name})'}")
+    if not CURSOR_SECRET_CONFIGURED:
+        print("⚠️  CURSOR_SECRET no configurado: los cursores de paginación no sobreviven a un reinicio")
     print("=" * 60)
     
     # Verificar que la base de datos existe
@@ -298,11 +1064,8 @@ async def startup_event():
         print("   Ejecutar: python3 scripts/generate_data.py && python3 scripts/load_data.py")
     else:
         try:
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute("SELECT COUNT(*) FROM trucks")
-            count = cursor.fetchone()[0]
-            conn.close()
+            with get_db_connection() as conn:
+                count = conn.execute("SELECT COUNT(*) FROM trucks").fetchone()[0]
             print(f"✅ Base de datos conectada ({count} camiones)")
         except Exception as e:
             print(f"❌ Error conectando a base de datos: {e}")
@@ -310,6 +1073,14 @@ async def startup_event():
     print("=" * 60)
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Evento de cierre: libera workers, conexiones del pool y del LLM"""
+    await gemini_client.aclose()
+    db_executor.shutdown(wait=False, cancel_futures=True)
+    db_pool.close()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=PORT)
@@ -0,0 +1,106 @@
+"""
+Control de concurrencia para el pipeline de /query: pools de workers
+separados (bulkheads) y control de admisión con cola acotada.
+"""
+
+import asyncio
+import math
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import Any, AsyncIterator, Callable
+
+
+class AdmissionRejected(Exception):
+    """Excepción cuando la cola de admisión está saturada"""
+
+    def __init__(self, message: str, retry_after_s: float):
+        super().__init__(message)
+        self.retry_after_s = retry_after_s
+
+
+class AdmissionController:
+    """
+    Limita las requests en ejecución y las que esperan turno.
+
+    Hasta `max_concurrent` requests se ejecutan a la vez; hasta `max_queue`
+    esperan. Con la cola llena, o si la espera supera `queue_timeout_s`,
+    la request se rechaza con AdmissionRejected (503 + Retry-After).
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int,
+        max_queue: int,
+        queue_timeout_s: float = 5.0,
+        retry_after_s: float = 1.0
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout_s = queue_timeout_s
+        self.retry_after_s = retry_after_s
+
+        self._semaphore = asyncio.Semaphore(max_concurrent)
+        self._waiting = 0
+        self._running = 0
+        self.rejected = 0
+
+    def _reject(self, reason: str) -> AdmissionRejected:
+        self.rejected += 1
+        return AdmissionRejected(reason, self.retry_after_s)
+
+    @asynccontextmanager
+    async def admit(self) -> AsyncIterator[None]:
+        """Context manager async que reserva un turno de ejecución"""
+        if self._semaphore.locked() and self._waiting >= self.max_queue:
+            raise self._reject(
+                f"Servidor saturado: {self._running} consultas en curso y "
+                f"{self._waiting} en cola"
+            )
+
+        if not self._semaphore.locked():
+            # Hay turno libre: se toma sin pasar por la cola
+            await self._semaphore.acquire()
+        else:
+            self._waiting += 1
+            try:
+                await asyncio.wait_for(self._semaphore.acquire(), timeout=self.queue_timeout_s)
+            except asyncio.TimeoutError:
+                raise self._reject(
+                    f"Tiempo de espera en cola agotado ({self.queue_timeout_s}s)"
+                )
+            finally:
+                self._waiting -= 1
+
+        self._running += 1
+        try:
+            yield
+        finally:
+            self._running -= 1
+            self._semaphore.release()
+
+    def status(self) -> dict:
+        """Estado de la admisión para /health"""
+        return {
+            "running": self._running,
+            "queued": self._waiting,
+            "max_concurrent": self.max_concurrent,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected
+        }
+
+
+def retry_after_header(retry_after_s: float) -> dict:
+    """Header Retry-After (en segundos enteros) para respuestas 503"""
+    return {"Retry-After": str(max(1, math.ceil(retry_after_s)))}
+
+
+def create_executor(max_workers: int, name: str) -> ThreadPoolExecutor:
+    """Crea un pool de threads dedicado a una etapa del pipeline"""
+    return ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"logiq-{name}")
+
+
+async def run_in_executor(executor: ThreadPoolExecutor, func: Callable, *args, **kwargs) -> Any:
+    """Ejecuta una función bloqueante en el pool indicado sin bloquear el event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, partial(func, *args, **kwargs))
@@ -0,0 +1,225 @@
+"""
+Pool de conexiones SQLite de solo lectura para el path de /query.
+Mantiene las conexiones abiertas entre requests para conservar el page cache
+y el statement cache de SQLite.
+"""
+
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+
+class SQLitePoolTimeout(Exception):
+    """Excepción cuando no hay conexiones libres en el pool"""
+    pass
+
+
+class _PooledConnection:
+    """Conexión SQLite con metadatos para el reciclado"""
+
+    def __init__(self, conn: sqlite3.Connection, inode: Optional[int]):
+        self.conn = conn
+        self.inode = inode
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+
+
+class SQLiteConnectionPool:
+    """
+    Pool de conexiones read-only (URI mode=ro) con tamaño acotado.
+
+    Cada conexión se entrega en exclusiva al thread que la pide; si el mismo
+    thread vuelve a pedir una conexión mientras tiene una tomada, recibe la
+    misma (reentrante). Las conexiones se reciclan cuando superan su edad
+    máxima, fallan el health check o el archivo de la base fue reemplazado.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        size: int = 8,
+        cache_size_kb: int = 16384,
+        mmap_size_mb: int = 256,
+        cached_statements: int = 256,
+        max_age_s: float = 3600.0,
+        health_check_interval_s: float = 30.0,
+        acquire_timeout_s: float = 10.0
+    ):
+        """
+        Inicializa el pool (las conexiones se crean bajo demanda).
+
+        Args:
+            db_path: Ruta al archivo SQLite
+            size: Máximo de conexiones abiertas simultáneamente
+            cache_size_kb: Page cache por conexión (PRAGMA cache_size)
+            mmap_size_mb: Tamaño de memory-map por conexión (PRAGMA mmap_size)
+            cached_statements: Tamaño del statement cache de sqlite3
+            max_age_s: Edad máxima de una conexión antes de reciclarla
+            health_check_interval_s: Inactividad tras la cual se verifica la conexión
+            acquire_timeout_s: Espera máxima por una conexión libre
+        """
+        if size < 1:
+            raise ValueError("El tamaño del pool debe ser >= 1")
+
+        self.db_path = db_path
+        self.size = size
+        self.cache_size_kb = cache_size_kb
+        self.mmap_size_mb = mmap_size_mb
+        self.cached_statements = cached_statements
+        self.max_age_s = max_age_s
+        self.health_check_interval_s = health_check_interval_s
+        self.acquire_timeout_s = acquire_timeout_s
+
+        # LIFO: la conexión usada más recientemente es la que tiene el cache más caliente
+        self._idle: "queue.LifoQueue[_PooledConnection]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._closed = False
+        self.stats = {"created": 0, "recycled": 0, "checkouts": 0}
+
+    def _db_inode(self) -> Optional[int]:
+        try:
+            return os.stat(self.db_path).st_ino
+        except OSError:
+            return None
+
+    def _connect(self) -> _PooledConnection:
+        """Abre una conexión read-only con los PRAGMAs de lectura ajustados"""
+        uri = f"file:{os.path.abspath(self.db_path)}?mode=ro"
+        conn = sqlite3.connect(
+            uri,
+            uri=True,
+            check_same_thread=False,
+            cached_statements=self.cached_statements
+        )
+        conn.execute(f"PRAGMA cache_size = -{int(self.cache_size_kb)}")
+        conn.execute(f"PRAGMA mmap_size = {int(self.mmap_size_mb) * 1024 * 1024}")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA query_only = 1")
+
+        with self._lock:
+            self.stats["created"] += 1
+        return _PooledConnection(conn, self._db_inode())
+
+    def _is_healthy(self, pooled: _PooledConnection) -> bool:
+        """Decide si una conexión ociosa puede reutilizarse"""
+        now = time.monotonic()
+
+        if now - pooled.created_at > self.max_age_s:
+            return False
+
+        # Archivo reemplazado (ej: recarga completa del warehouse)
+        if pooled.inode != self._db_inode():
+            return False
+
+        if now - pooled.last_used > self.health_check_interval_s:
+            try:
+                pooled.conn.execute("SELECT 1").fetchone()
+            except sqlite3.Error:
+                return False
+
+        return True
+
+    def _discard(self, pooled: _PooledConnection):
+        try:
+            pooled.conn.close()
+        except sqlite3.Error:
+            pass
+        with self._lock:
+            self.stats["recycled"] += 1
+
+    def _checkout(self) -> _PooledConnection:
+        if self._closed:
+            raise SQLitePoolTimeout("El pool de conexiones está cerrado")
+
+        if not self._slots.acquire(timeout=self.acquire_timeout_s):
+            raise SQLitePoolTimeout(
+                f"No hay conexiones libres tras {self.acquire_timeout_s}s "
+                f"(pool de {self.size})"
+            )
+
+        try:
+            while True:
+                try:
+                    pooled = self._idle.get_nowait()
+                except queue.Empty:
+                    pooled = self._connect()
+                    break
+
+                if self._is_healthy(pooled):
+                    break
+                self._discard(pooled)
+        except Exception:
+            self._slots.release()
+            raise
+
+        with self._lock:
+            self.stats["checkouts"] += 1
+        return pooled
+
+    def _checkin(self, pooled: _PooledConnection, broken: bool = False):
+        pooled.last_used = time.monotonic()
+        if broken or self._closed:
+            self._discard(pooled)
+        else:
+            self._idle.put(pooled)
+        self._slots.release()
+
+    @contextmanager
+    def connection(self, detached: bool = False) -> Iterator[sqlite3.Connection]:
+        """
+        Context manager que entrega una conexión del pool.
+
+        Args:
+            detached: Si True, la conexión no queda asociada al thread actual
+                      (para cursores que se leen desde varios threads, ej: streaming)
+
+        Ejemplo:
+            with pool.connection() as conn:
+                conn.execute("SELECT COUNT(*) FROM trucks")
+        """
+        held = None if detached else getattr(self._local, "pooled", None)
+        if held is not None:
+            # Reentrante: el thread ya tiene una conexión tomada
+            yield held.conn
+            return
+
+        pooled = self._checkout()
+        if not detached:
+            self._local.pooled = pooled
+        broken = False
+        try:
+            yield pooled.conn
+        except sqlite3.DatabaseError as e:
+            # Errores de la conexión (no de la consulta) obligan a reciclarla
+            broken = not isinstance(e, sqlite3.OperationalError)
+            raise
+        finally:
+            if not detached:
+                self._local.pooled = None
+            self._checkin(pooled, broken=broken)
+
+    def close(self):
+        """Cierra todas las conexiones ociosas; las tomadas se cierran al devolverse"""
+        self._closed = True
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                pooled.conn.close()
+            except sqlite3.Error:
+                pass
+
+    def status(self) -> dict:
+        """Estado del pool para /health"""
+        with self._lock:
+            stats = dict(self.stats)
+        stats.update({"size": self.size, "idle": self._idle.qsize()})
+        return stats
@@ -0,0 +1,320 @@
+"""
+Motores de ejecución para el SQL validado.
+SQLite (el almacén de filas) es el motor por defecto. Opcionalmente, un
+motor columnar en proceso (DuckDB, si está instalado) lee una copia de las
+mismas tablas y responde las agregaciones pesadas; un router decide, por
+consulta, cuál usar.
+"""
+
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from backend.lib.partitions import unprune_partitions
+from backend.lib.query_budget import QueryBudget, QueryBudgetExceeded
+
+# DuckDB (opcional) y pandas se importan al crear el motor columnar (ver
+# _import_columnar): con COLUMNAR_ENGINE=none el arranque no los paga
+duckdb = None
+pd = None
+
+
+def _import_columnar() -> bool:
+    """Importa duckdb y pandas la primera vez; False si duckdb no está instalado"""
+    global duckdb, pd
+    if duckdb is None:
+        try:
+            import duckdb as _duckdb  # Motor columnar en proceso (opcional)
+            import pandas as _pd
+        except ImportError:
+            return False
+        duckdb, pd = _duckdb, _pd
+    return True
+
+
+# Funciones de fecha de SQLite: con argumentos constantes se evalúan en
+# SQLite antes de mandar la consulta a otro motor
+_DATE_FUNCTIONS = r"(?:date|datetime|time|julianday|strftime|unixepoch)"
+_LITERAL = r"(?:'(?:[^']|'')*'|[-+]?\d+(?:\.\d+)?)"
+_CONSTANT_CALL = re.compile(
+    rf"(?P<str>'(?:[^']|'')*')"
+    rf"|(?P<call>\b{_DATE_FUNCTIONS}\s*\(\s*(?:{_LITERAL}(?:\s*,\s*{_LITERAL})*)?\s*\))",
+    re.IGNORECASE
+)
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+
+# Construcciones cuyo resultado difiere entre SQLite y DuckDB (o que DuckDB
+# no tiene): las consultas que las usan se quedan en SQLite
+_SQLITE_ONLY = re.compile(
+    rf"\b(?:{_DATE_FUNCTIONS}|printf|total|typeof|iif|randomblob|zeroblob)\s*\("
+    r"|\b(?:LIKE|GLOB|REGEXP|MATCH|COLLATE|ROWID)\b",
+    re.IGNORECASE
+)
+_AGGREGATE = re.compile(r"\b(?:COUNT|SUM|AVG|MIN|MAX|GROUP_CONCAT)\s*\(|\bGROUP\s+BY\b", re.IGNORECASE)
+
+# Tipos declarados en SQLite → tipos DuckDB de la copia
+_DUCKDB_TYPES = {"INTEGER": "BIGINT", "REAL": "DOUBLE", "TEXT": "VARCHAR"}
+
+
+def _sql_literal(value) -> str:
+    if value is None:
+        return "NULL"
+    if isinstance(value, str):
+        return "'" + value.replace("'", "''") + "'"
+    return repr(value)
+
+
+def fold_sqlite_constants(conn: sqlite3.Connection, sql: str) -> str:
+    """
+    Reemplaza las llamadas a funciones de fecha con argumentos constantes
+    (ej: date('now', '-30 days')) por su valor, calculado por SQLite.
+    Así otro motor ve literales con exactamente la semántica de SQLite.
+    """
+    def fold(match: re.Match) -> str:
+        if match.group("str"):
+            return match.group(0)
+        return _sql_literal(conn.execute(f"SELECT {match.group('call')}").fetchone()[0])
+
+    while True:
+        folded = _CONSTANT_CALL.sub(fold, sql)
+        if folded == sql:
+            return folded
+        sql = folded
+
+
+def sqlite_column_names(conn: sqlite3.Connection, sql: str) -> List[str]:
+    """
+    Nombres de columna que daría SQLite, sin ejecutar la consulta (LIMIT 0).
+    Otros motores nombran distinto las expresiones sin alias (ej: avg(x)).
+    """
+    cursor = conn.execute(f"SELECT * FROM ({sql.strip().rstrip(';')}) LIMIT 0")
+    return [col[0] for col in cursor.description]
+
+
+def portable_sql(conn: sqlite3.Connection, sql: str) -> Optional[str]:
+    """
+    SQL equivalente para el motor columnar, o None si la consulta usa algo
+    que solo SQLite resuelve igual (funciones de fecha sobre columnas, LIKE...).
+    """
+    folded = fold_sqlite_constants(conn, sql)
+    if _SQLITE_ONLY.search(_STRING_LITERAL.sub("''", folded)):
+        return None
+    return folded
+
+
+class SQLiteEngine:
+    """Motor por defecto: ejecuta sobre la conexión SQLite del pool"""
+
+    name = "sqlite"
+
+    def __init__(self, fetch_chunk_rows: int = 1000):
+        self.fetch_chunk_rows = fetch_chunk_rows
+
+    def execute(self, conn: sqlite3.Connection, sql: str, budget: QueryBudget,
+                allow_partial: bool = False) -> Tuple[List[str], List[tuple], bool]:
+        """
+        Returns:
+            (columnas, filas, parcial)
+
+        Raises:
+            QueryBudgetExceeded: Si la consulta agota su presupuesto (y no se
+                                 aceptan resultados parciales)
+        """
+        columns: List[str] = []
+        rows: List[tuple] = []
+        try:
+            with budget.guard(conn):
+                cursor = conn.execute(sql)
+                columns = [col[0] for col in cursor.description]
+                # fetchmany: si se corta, las filas leídas siguen disponibles
+                while True:
+                    chunk = cursor.fetchmany(self.fetch_chunk_rows)
+                    if not chunk:
+                        break
+                    rows.extend(chunk)
+        except QueryBudgetExceeded:
+            if not (allow_partial and columns):
+                raise
+            return columns, rows, True
+        return columns, rows, False
+
+
+class DuckDBEngine:
+    """
+    Motor columnar en proceso. Mantiene en memoria una copia de las tablas
+    de la base SQLite, que se rehace cuando cambia la versión del dataset.
+    La copia se construye en segundo plano: mientras no está lista para la
+    versión actual, las consultas siguen en SQLite.
+    """
+
+    name = "duckdb"
+
+    def __init__(self, db_path: str, tables: Sequence[str], threads: int = 0):
+        """
+        Args:
+            db_path: Base SQLite de la que se copian los datos
+            tables: Tablas a copiar (las que puede leer el SQL validado)
+            threads: Threads de DuckDB (0 = los que elija DuckDB)
+        """
+        if not _import_columnar():
+            raise ImportError("duckdb no está instalado: pip install duckdb")
+        self.db_path = db_path
+        self.tables = tuple(tables)
+        self.threads = threads
+        self._lock = threading.Lock()
+        self._db = None
+        self._version: Optional[int] = None
+        self._building = False
+
+    def build(self) -> int:
+        """
+        Copia las tablas de SQLite a una base DuckDB nueva y la publica.
+
+        Returns:
+            Versión del dataset copiada
+        """
+        conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+        try:
+            # Una sola transacción de lectura: la copia es consistente aunque haya una carga en curso
+            conn.execute("BEGIN")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+
+            db = duckdb.connect(":memory:")
+            if self.threads:
+                db.execute(f"SET GLOBAL threads = {int(self.threads)}")
+            # Semántica de SQLite: división entera entre enteros y NULLs primero en ASC
+            db.execute("SET GLOBAL integer_division = true")
+            db.execute("SET GLOBAL default_null_order = 'nulls_first_on_asc_last_on_desc'")
+
+            for table in self.tables:
+                info = conn.execute(f"PRAGMA table_xinfo({table})").fetchall()
+                if not info:
+                    continue
+                columns = [row[1] for row in info]
+                types = [_DUCKDB_TYPES.get((row[2] or "").upper(), "VARCHAR") for row in info]
+                db.execute(f"CREATE TABLE {table} ({', '.join(f'{c} {t}' for c, t in zip(columns, types))})")
+                cursor = conn.execute(f"SELECT {', '.join(columns)} FROM {table}")
+                while True:
+                    chunk = cursor.fetchmany(50_000)
+                    if not chunk:
+                        break
+                    # Carga vectorizada; el INSERT castea a los tipos declarados
+                    db.register("_chunk", pd.DataFrame.from_records(chunk, columns=columns))
+                    db.execute(f"INSERT INTO {table} SELECT * FROM _chunk")
+                    db.unregister("_chunk")
+        finally:
+            conn.close()
+
+        with self._lock:
+            self._db, self._version = db, version
+        return version
+
+    def _build_in_background(self):
+        try:
+            version = self.build()
+            print(f"🦆 Copia columnar lista (dataset v{version})")
+        except Exception as e:
+            print(f"⚠️  No se pudo construir la copia columnar: {e}")
+        finally:
+            with self._lock:
+                self._building = False
+
+    def snapshot(self, version: int):
+        """
+        Base DuckDB de esta versión del dataset, o None si todavía no está
+        (en ese caso se empieza a construir en segundo plano).
+        """
+        with self._lock:
+            if self._version == version:
+                return self._db
+            if not self._building:
+                self._building = True
+                threading.Thread(target=self._build_in_background, name="duckdb-snapshot", daemon=True).start()
+            return None
+
+    def execute(self, version: int, sql: str, budget: QueryBudget) -> Optional[Tuple[List[str], List[tuple]]]:
+        """
+        Returns:
+            (columnas, filas), o None si la copia de esta versión no está lista
+
+        Raises:
+            QueryBudgetExceeded: Si la consulta agota su tiempo o es cancelada
+            duckdb.Error: Si DuckDB no puede ejecutar la consulta
+        """
+        db = self.snapshot(version)
+        if db is None:
+            return None
+        cursor = db.cursor()
+        try:
+            with budget.watch(cursor.interrupt):
+                result = cursor.execute(sql)
+                columns = [col[0] for col in result.description]
+                rows = result.fetchall()
+        finally:
+            cursor.close()
+        return columns, rows
+
+
+class EngineRouter:
+    """
+    Decide el motor de cada consulta: las agregaciones cuyo plan en SQLite
+    supera `min_cost` filas van al motor columnar (si hay uno y el SQL es
+    portable); las búsquedas puntuales y todo lo demás, a SQLite. Si el
+    motor columnar falla, la consulta se reintenta en SQLite.
+    """
+
+    def __init__(self, sqlite_engine: SQLiteEngine, columnar_engine: Optional[DuckDBEngine] = None,
+                 min_cost: float = 100_000):
+        self.sqlite = sqlite_engine
+        self.columnar = columnar_engine
+        self.min_cost = min_cost
+        self._lock = threading.Lock()
+        # warming: iban al motor columnar pero su copia todavía no estaba lista
+        self.counts: Dict[str, int] = {"sqlite": 0, "columnar": 0, "warming": 0, "fallbacks": 0}
+
+    def route(self, conn: sqlite3.Connection, sql: str, plan_cost: float) -> Optional[str]:
+        """SQL para el motor columnar, o None si la consulta va a SQLite"""
+        if self.columnar is None or plan_cost < self.min_cost:
+            return None
+        if not _AGGREGATE.search(_STRING_LITERAL.sub("''", sql)):
+            return None
+        # La copia columnar tiene las tablas canónicas, no las particiones
+        return portable_sql(conn, unprune_partitions(sql))
+
+    def _count(self, key: str):
+        with self._lock:
+            self.counts[key] += 1
+
+    def execute(self, conn: sqlite3.Connection, version: int, sql: str, plan_cost: float,
+                budget: QueryBudget, allow_partial: bool = False) -> Tuple[List[str], List[tuple], bool, str]:
+        """
+        Ejecuta en el motor elegido.
+
+        Returns:
+            (columnas, filas, parcial, nombre del motor)
+        """
+        columnar_sql = self.route(conn, sql, plan_cost)
+        if columnar_sql is not None:
+            try:
+                result = self.columnar.execute(version, columnar_sql, budget)
+                if result is not None:
+                    self._count("columnar")
+                    return sqlite_column_names(conn, sql), result[1], False, self.columnar.name
+                self._count("warming")
+            except duckdb.Error as e:
+                print(f"⚠️  {self.columnar.name} no pudo ejecutar la consulta, se usa SQLite: {e}")
+                self._count("fallbacks")
+
+        columns, rows, partial = self.sqlite.execute(conn, sql, budget, allow_partial)
+        self._count("sqlite")
+        return columns, rows, partial, self.sqlite.name
+
+    def stats(self) -> dict:
+        """Contadores expuestos en /cache/stats"""
+        with self._lock:
+            return {
+                "columnar_engine": self.columnar.name if self.columnar else None,
+                "min_cost": self.min_cost,
+                **self.counts
+            }
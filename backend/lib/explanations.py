@@ -0,0 +1,228 @@
+"""
+Explicaciones de resultados memoizadas y diferidas.
+
+La explicación es una segunda llamada al LLM que el usuario lee después de
+las filas. Se memoiza por (pregunta normalizada, SQL normalizado, huella del
+resultado, modelo), así una respuesta repetida no vuelve a pagarla, y las
+llamadas idénticas en curso se comparten. En modo diferido, /query responde
+sin esperarla y la explicación se genera en segundo plano bajo un query_id
+que el cliente consulta después (long-poll o SSE).
+"""
+
+import asyncio
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from backend.lib.result_cache import CachedResult
+from backend.lib.translation_cache import normalize_question
+from backend.lib.validate_sql import normalize_sql
+
+
+# (pregunta, SQL, huella del resultado, modelo)
+ExplanationKey = Tuple[str, str, str, str]
+
+
+class ExplanationCache:
+    """LRU en memoria de explicaciones ya generadas (thread-safe)"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[ExplanationKey, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: ExplanationKey) -> Optional[str]:
+        """Explicación memoizada o None (cuenta hit/miss)"""
+        with self._lock:
+            explanation = self._entries.get(key)
+            if explanation is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return explanation
+
+    def put(self, key: ExplanationKey, explanation: str):
+        with self._lock:
+            self._entries[key] = explanation
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "max_entries": self.max_entries
+            }
+
+
+class ExplanationUnavailable(Exception):
+    """query_id desconocido o vencido (otro worker, reinicio o más viejo que el TTL)"""
+    pass
+
+
+class Explainer:
+    """
+    Genera explicaciones a través del cache y deduplica las llamadas en curso.
+    Las explicaciones diferidas son tareas del event loop del servidor,
+    registradas por query_id durante `job_ttl_s` (como máximo `max_jobs`).
+    """
+
+    def __init__(
+        self,
+        generate: Callable[[str, str, object], Awaitable[str]],
+        model: Callable[[], str],
+        fallback: Optional[Callable[[str, str, object], str]] = None,
+        cache: Optional[ExplanationCache] = None,
+        max_jobs: int = 1024,
+        job_ttl_s: float = 600.0
+    ):
+        """
+        Args:
+            generate: async (pregunta, SQL, filas como dicts) -> explicación
+            model: Modelo actual del LLM (parte de la clave: cambia al terminar
+                   la inicialización o al pasar a modo mock)
+            fallback: Explicación sin LLM si `generate` falla; no se memoiza,
+                      así la próxima vez se reintenta el LLM
+            cache: Cache de explicaciones (uno nuevo si no se provee)
+            max_jobs: Explicaciones diferidas registradas como máximo
+            job_ttl_s: Tiempo que un query_id sigue disponible
+        """
+        self.generate = generate
+        self.model = model
+        self.fallback = fallback
+        self.cache = cache if cache is not None else ExplanationCache()
+        self.max_jobs = max_jobs
+        self.job_ttl_s = job_ttl_s
+        self._inflight: Dict[ExplanationKey, asyncio.Task] = {}
+        # query_id -> (creado, tarea)
+        self._jobs: "OrderedDict[str, Tuple[float, asyncio.Task]]" = OrderedDict()
+        self.generated = 0
+        self.failures = 0
+        self.shared = 0
+        self.deferred = 0
+
+    def key(self, question: str, sql: str, result: CachedResult) -> ExplanationKey:
+        return (normalize_question(question), normalize_sql(sql), result.fingerprint, self.model())
+
+    async def explain(self, question: str, sql: str, result: CachedResult) -> str:
+        """Explicación desde el cache, desde una llamada idéntica en curso o nueva"""
+        key = self.key(question, sql, result)
+        explanation = self.cache.get(key)
+        if explanation is not None:
+            return explanation
+        return await self._explain(key, question, sql, result)
+
+    async def _explain(self, key: ExplanationKey, question: str, sql: str, result: CachedResult) -> str:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared += 1
+        else:
+            task = asyncio.get_running_loop().create_task(self._generate(key, question, sql, result))
+            self._inflight[key] = task
+        # shield: si se cancela quien espera, la llamada sigue para los demás
+        return await asyncio.shield(task)
+
+    async def _generate(self, key: ExplanationKey, question: str, sql: str, result: CachedResult) -> str:
+        rows = result.dict_view()
+        try:
+            self.generated += 1
+            try:
+                explanation = await self.generate(question, sql, rows)
+            except Exception as e:
+                self.failures += 1
+                if self.fallback is None:
+                    raise
+                print(f"⚠️  Error generando explicación: {e}")
+                return self.fallback(question, sql, rows)
+            self.cache.put(key, explanation)
+            return explanation
+        finally:
+            self._inflight.pop(key, None)
+
+    def defer(self, question: str, sql: str, result: CachedResult) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Explicación memoizada, o la inicia en segundo plano (requiere un event
+        loop en curso).
+
+        Returns:
+            (explicación, None) si ya estaba memoizada; si no, (None, query_id)
+            para consultarla con wait()
+        """
+        key = self.key(question, sql, result)
+        explanation = self.cache.get(key)
+        if explanation is not None:
+            return explanation, None
+
+        self._expire()
+        query_id = secrets.token_urlsafe(12)
+        task = asyncio.get_running_loop().create_task(self._explain(key, question, sql, result))
+        # La excepción se lee en wait(); sin esto asyncio la reporta como no recuperada
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+        self._jobs[query_id] = (time.monotonic(), task)
+        self.deferred += 1
+        while len(self._jobs) > self.max_jobs:
+            _, (_, oldest) = self._jobs.popitem(last=False)
+            oldest.cancel()
+        return None, query_id
+
+    def _expire(self):
+        """Descarta los query_id más viejos que job_ttl_s"""
+        deadline = time.monotonic() - self.job_ttl_s
+        while self._jobs:
+            query_id, (created, task) = next(iter(self._jobs.items()))
+            if created >= deadline:
+                break
+            del self._jobs[query_id]
+            task.cancel()
+
+    async def wait(self, query_id: str, timeout: float = 0.0) -> Optional[str]:
+        """
+        Espera la explicación diferida hasta `timeout` segundos.
+
+        Returns:
+            La explicación, o None si todavía se está generando
+
+        Raises:
+            ExplanationUnavailable: query_id desconocido o vencido
+            Exception: La que haya lanzado la generación
+        """
+        self._expire()
+        job = self._jobs.get(query_id)
+        if job is None:
+            raise ExplanationUnavailable(f"Explicación no disponible para query_id {query_id}")
+        task = job[1]
+        if not task.done() and timeout > 0:
+            await asyncio.wait({task}, timeout=timeout)
+        if not task.done():
+            return None
+        return task.result()
+
+    def stats(self) -> dict:
+        """Contadores para /cache/stats"""
+        stats = self.cache.stats()
+        stats.update({
+            "generated": self.generated,
+            "failures": self.failures,
+            "shared": self.shared,
+            "deferred": self.deferred,
+            "pending": sum(1 for _, task in self._jobs.values() if not task.done()),
+            "jobs": len(self._jobs)
+        })
+        return stats
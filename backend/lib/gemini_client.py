@@ -3,98 +3,178 @@ Cliente para interactuar con Gemini API y generar SQL desde lenguaje natural.
 Incluye fallback a templates si la API no está disponible.
 """
 
+import asyncio
 import os
 import re
+import threading
+import time
 from typing import Optional, Dict
 
+from backend.lib.llm_transport import DEFAULT_BASE_URL, GeminiTransport, LLMTransportError
+# SYSTEM_PROMPT: prompt completo (schema + todos los ejemplos few-shot)
+from backend.lib.prompt_builder import SYSTEM_PROMPT, PromptBuilder, estimate_tokens, question_suffix
+from backend.lib.translation_cache import TranslationCache
 
-# Prompt system con schema y ejemplos (few-shot learning)
-SYSTEM_PROMPT = """Eres un asistente experto que genera SQL seguro para una base de datos SQLite con las siguientes tablas y columnas:
 
-SCHEMA CANÓNICO:
-- trucks(truck_id TEXT, plate TEXT, model TEXT, brand TEXT, driver_id TEXT, region TEXT, status TEXT)
-- drivers(driver_id TEXT, name TEXT, license TEXT)
-- trips(trip_id TEXT, truck_id TEXT, origin TEXT, destination TEXT, start_time TEXT, end_time TEXT, distance_km REAL, status TEXT)
-- telemetry(telemetry_id TEXT, truck_id TEXT, timestamp TEXT, speed_kmh REAL, fuel_level REAL, engine_temp_c REAL)
-- alerts(alert_id TEXT, truck_id TEXT, timestamp TEXT, alert_type TEXT, severity TEXT, description TEXT)
-
-INSTRUCCIONES:
-- SOLO genera una consulta SELECT válida en SQL compatible con SQLite.
-- No incluyas comandos DDL/DML (CREATE, DROP, DELETE, UPDATE, INSERT, ALTER).
-- Añade siempre LIMIT si no está presente (máximo 1000).
-- Usa funciones de fecha de SQLite: date(), datetime(), time().
-- Para fechas relativas usa: datetime('now', '-N days/hours').
-- No expliques nada en la salida; retorna SOLO el SQL.
-- El SQL debe terminar con punto y coma (;).
-
-EJEMPLOS (few-shot):
-
-1. NL: "¿Qué camión tuvo más alertas de temperatura en la última semana?"
-SQL: SELECT truck_id, COUNT(*) as alerts FROM alerts WHERE alert_type = 'temperature' AND timestamp >= datetime('now', '-7 days') GROUP BY truck_id ORDER BY alerts DESC LIMIT 5;
-
-2. NL: "Promedio de consumo por marca de camión en los últimos 30 días"
-SQL: SELECT t.brand, AVG(tele.fuel_level) as avg_fuel_level FROM trucks t JOIN telemetry tele ON t.truck_id = tele.truck_id WHERE tele.timestamp >= datetime('now','-30 days') GROUP BY t.brand;
-
-3. NL: "¿Cuántos viajes finalizados hubo ayer?"
-SQL: SELECT COUNT(*) as trips_finished FROM trips WHERE status = 'finished' AND date(end_time) = date('now','-1 day');
-
-4. NL: "Mostrar las 10 últimas alertas críticas"
-SQL: SELECT * FROM alerts WHERE severity = 'critical' ORDER BY timestamp DESC LIMIT 10;
-
-5. NL: "Lista de camiones actualmente en mantenimiento"
-SQL: SELECT * FROM trucks WHERE status = 'maintenance';
-
-6. NL: "Top 5 rutas con más retrasos"
-SQL: WITH trip_delays AS (SELECT trip_id, origin, destination, (julianday(end_time) - julianday(start_time)) * 24 as duration_hours FROM trips WHERE status = 'finished') SELECT origin, destination, AVG(duration_hours) as avg_duration FROM trip_delays GROUP BY origin, destination ORDER BY avg_duration DESC LIMIT 5;
-
-Ahora genera SQL para la siguiente pregunta:
-"""
+# Modelo por defecto (parte de la clave del cache de traducciones)
+DEFAULT_MODEL = "gemini-2.0-flash-exp"
 
 
 class GeminiClient:
     """Cliente para generar SQL usando Gemini API"""
     
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        translation_cache: Optional[TranslationCache] = None,
+        model_name: str = DEFAULT_MODEL,
+        base_url: str = DEFAULT_BASE_URL,
+        connect_timeout_s: float = 5.0,
+        read_timeout_s: float = 30.0,
+        max_retries: int = 2,
+        max_concurrency: int = 8,
+        lazy: bool = False,
+        prompt_builder: Optional[PromptBuilder] = None
+    ):
         """
         Inicializa el cliente Gemini.
         
         Args:
             api_key: API key de Gemini (si no se provee, usa variable de entorno)
+            translation_cache: Cache persistente NL→SQL (opcional)
+            model_name: Modelo de Gemini
+            base_url: Raíz de la API REST
+            connect_timeout_s, read_timeout_s: Timeouts de cada intento
+            max_retries: Reintentos ante errores transitorios
+            max_concurrency: Llamadas al LLM en curso como máximo en el proceso
+            lazy: No crear el transporte acá sino en segundo plano con start();
+                  mientras tanto se responde desde el cache de traducciones o
+                  con templates
+            prompt_builder: Arma un prompt con las tablas y ejemplos relevantes
+                            a cada pregunta (None = SYSTEM_PROMPT completo)
         """
         self.api_key = api_key or os.getenv("GEMINI_API_KEY")
         self.use_mock = not self.api_key or self.api_key == "your_gemini_api_key_here"
+        self.translation_cache = translation_cache
+        # Con API key el modelo ya es el configurado: las traducciones cacheadas
+        # sirven aunque el transporte todavía no esté listo
+        self.model_name = "mock" if self.use_mock else model_name
+        self.transport: Optional[GeminiTransport] = None
+        self._transport_options = dict(
+            base_url=base_url,
+            connect_timeout_s=connect_timeout_s,
+            read_timeout_s=read_timeout_s,
+            max_retries=max_retries,
+            max_concurrency=max_concurrency
+        )
+        self._ready = threading.Event()
+        self._init_thread: Optional[threading.Thread] = None
+        self.init_ms: Optional[float] = None
+        # Preguntas respondidas sin el modelo porque el transporte no estaba listo
+        self.served_before_ready = 0
+        self.prompt_builder = prompt_builder
+        self.prompts_sent = 0
+        self.prompt_tokens_sent = 0
         
-        if not self.use_mock:
-            try:
-                import google.generativeai as genai
-                genai.configure(api_key=self.api_key)
-                # Usar modelo actualizado - intentar varios nombres (más recientes primero)
-                model_names = [
-                    'gemini-2.0-flash-exp',
-                    'gemini-1.5-flash-latest', 
-                    'gemini-1.5-flash',
-                    'gemini-1.5-pro-latest',
-                    'gemini-1.5-pro',
-                    'gemini-pro'
-                ]
-                for model_name in model_names:
-                    try:
-                        self.model = genai.GenerativeModel(model_name)
-                        print(f"✅ Gemini API configurada ({model_name})")
-                        break
-                    except Exception as e:
-                        print(f"⚠️  Modelo {model_name} no disponible: {str(e)[:50]}")
-                        continue
-                else:
-                    raise Exception("No se encontró un modelo válido")
-            except Exception as e:
-                print(f"⚠️  Error configurando Gemini: {e}")
-                print("📝 Usando modo mock (templates)")
-                self.use_mock = True
-        else:
+        if self.use_mock:
             print("📝 Usando modo mock (templates) - configurar GEMINI_API_KEY para usar API real")
+            self._ready.set()
+        elif not lazy:
+            self._init_transport()
+    
+    def _init_transport(self):
+        """Crea el transporte HTTP (importa httpx); si falla, queda en modo mock"""
+        start = time.perf_counter()
+        try:
+            self.transport = GeminiTransport(self.api_key, self.model_name, **self._transport_options)
+            print(f"✅ Gemini API configurada ({self.model_name})")
+        except Exception as e:
+            print(f"⚠️  Error configurando Gemini: {e}")
+            print("📝 Usando modo mock (templates)")
+            self.use_mock = True
+            self.model_name = "mock"
+        finally:
+            self.init_ms = round((time.perf_counter() - start) * 1000, 1)
+            self._ready.set()
+    
+    def start(self):
+        """
+        Inicializa el transporte en un thread en segundo plano (clientes lazy).
+        No bloquea: las preguntas que llegan antes se responden sin el modelo.
+        """
+        if self._ready.is_set() or self._init_thread is not None:
+            return
+        self._init_thread = threading.Thread(target=self._init_transport, name="llm-init", daemon=True)
+        self._init_thread.start()
+    
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Espera a que termine la inicialización; True si terminó"""
+        return self._ready.wait(timeout)
+    
+    @property
+    def ready(self) -> bool:
+        """True si el cliente ya responde con el modelo (o quedó en modo mock)"""
+        return self._ready.is_set()
+    
+    def status(self) -> dict:
+        """Estado del cliente para /health"""
+        if self.use_mock:
+            mode = "mock"
+        else:
+            mode = "api" if self.transport is not None else "starting"
+        return {
+            "mode": mode,
+            "model": self.model_name,
+            "init_ms": self.init_ms,
+            "served_before_ready": self.served_before_ready
+        }
+    
+    def _run_sync(self, coro):
+        """
+        Ejecuta una llamada async desde código sincrónico (scripts, tests).
+        Cada llamada usa su propio event loop, así que cierra sus conexiones al terminar.
+        """
+        async def run():
+            try:
+                return await coro
+            finally:
+                await self.aclose()
+        return asyncio.run(run())
+    
+    async def aclose(self):
+        """Cierra las conexiones persistentes del transporte"""
+        if self.transport is not None:
+            await self.transport.aclose()
+    
+    def transport_stats(self) -> dict:
+        """Contadores del transporte HTTP (vacío en modo mock)"""
+        return self.transport.stats() if self.transport is not None else {}
+    
+    def build_prompt(self, natural_language: str) -> str:
+        """Prompt NL→SQL: armado por pregunta si hay prompt_builder, si no el completo"""
+        if self.prompt_builder is not None:
+            return self.prompt_builder.build(natural_language).text
+        return SYSTEM_PROMPT + question_suffix(natural_language)
+    
+    def prompt_stats(self) -> dict:
+        """Tamaño de los prompts NL→SQL enviados (y caches del prompt_builder)"""
+        stats = self.prompt_builder.stats() if self.prompt_builder is not None else {
+            "full_prompt_tokens": estimate_tokens(SYSTEM_PROMPT)
+        }
+        stats.update({
+            "pruned": self.prompt_builder is not None,
+            "sent": self.prompts_sent,
+            "avg_tokens": round(self.prompt_tokens_sent / self.prompts_sent, 1) if self.prompts_sent else 0.0
+        })
+        return stats
     
     def nl_to_sql(self, natural_language: str) -> str:
+        """Versión sincrónica de nl_to_sql_async"""
+        if self.use_mock:
+            return self._mock_nl_to_sql(natural_language)
+        return self._run_sync(self.nl_to_sql_async(natural_language))
+    
+    async def nl_to_sql_async(self, natural_language: str) -> str:
         """
         Convierte lenguaje natural a SQL.
         
@@ -107,15 +187,31 @@ class GeminiClient:
         if self.use_mock:
             return self._mock_nl_to_sql(natural_language)
         
+        # Misma pregunta (normalizada) con el mismo modelo: evitar el round trip
+        if self.translation_cache is not None:
+            cached_sql = self.translation_cache.get(natural_language, self.model_name)
+            if cached_sql:
+                return cached_sql
+        
+        # Transporte todavía inicializando (o falló): templates, sin esperar
+        transport = self.transport
+        if transport is None:
+            self.served_before_ready += 1
+            return self._mock_nl_to_sql(natural_language)
+        
         try:
             # Llamar a Gemini API
-            prompt = SYSTEM_PROMPT + f"\nNL: {natural_language}\nSQL:"
-            response = self.model.generate_content(prompt)
-            sql = response.text.strip()
+            prompt = self.build_prompt(natural_language)
+            self.prompts_sent += 1
+            self.prompt_tokens_sent += estimate_tokens(prompt)
+            sql = (await transport.generate(prompt)).strip()
             
             # Limpiar respuesta (remover markdown si existe)
             sql = self._clean_sql_response(sql)
             
+            if self.translation_cache is not None and sql:
+                self.translation_cache.put(natural_language, self.model_name, sql)
+            
             return sql
             
         except Exception as e:
@@ -123,6 +219,11 @@ class GeminiClient:
             print("📝 Fallback a modo mock")
             return self._mock_nl_to_sql(natural_language)
     
+    def invalidate_translation(self, natural_language: str):
+        """Descarta la traducción cacheada de una pregunta (ej: SQL rechazado)"""
+        if self.translation_cache is not None:
+            self.translation_cache.invalidate(natural_language, self.model_name)
+    
     def _clean_sql_response(self, sql: str) -> str:
         """Limpia la respuesta de Gemini (remover markdown, etc.)"""
         # Remover bloques de código markdown
@@ -154,13 +255,13 @@ class GeminiClient:
         
         # Patrones de alertas
         if "alertas" in nl_lower and "temperatura" in nl_lower:
-            return "SELECT truck_id, COUNT(*) as alerts FROM alerts WHERE alert_type = 'temperature' AND timestamp >= datetime('now', '-7 days') GROUP BY truck_id ORDER BY alerts DESC LIMIT 5;"
+            return "SELECT truck_id, COUNT(*) as alerts FROM alerts WHERE alert_type = 'temperature' AND timestamp >= date('now', '-7 days') GROUP BY truck_id ORDER BY alerts DESC LIMIT 5;"
         
         elif "promedio" in nl_lower and ("consumo" in nl_lower or "combustible" in nl_lower):
-            return "SELECT t.brand, AVG(tele.fuel_level) as avg_fuel_level FROM trucks t JOIN telemetry tele ON t.truck_id = tele.truck_id WHERE tele.timestamp >= datetime('now','-30 days') GROUP BY t.brand;"
+            return "SELECT t.brand, AVG(tele.fuel_level) as avg_fuel_level FROM trucks t JOIN telemetry tele ON t.truck_id = tele.truck_id WHERE tele.timestamp >= date('now','-30 days') GROUP BY t.brand;"
         
         elif "viajes" in nl_lower and ("ayer" in nl_lower or "finalizados" in nl_lower):
-            return "SELECT COUNT(*) as trips_finished FROM trips WHERE status = 'finished' AND date(end_time) = date('now','-1 day');"
+            return "SELECT COUNT(*) as trips_finished FROM trips WHERE status = 'finished' AND end_time_epoch >= strftime('%s', date('now', '-1 day')) AND end_time_epoch < strftime('%s', date('now'));"
         
         elif "alertas" in nl_lower and "críticas" in nl_lower:
             return "SELECT * FROM alerts WHERE severity = 'critical' ORDER BY timestamp DESC LIMIT 10;"
@@ -169,13 +270,13 @@ class GeminiClient:
             return "SELECT * FROM trucks WHERE status = 'maintenance' LIMIT 1000;"
         
         elif "rutas" in nl_lower and "retrasos" in nl_lower:
-            return "WITH trip_delays AS (SELECT trip_id, origin, destination, (julianday(end_time) - julianday(start_time)) * 24 as duration_hours FROM trips WHERE status = 'finished') SELECT origin, destination, AVG(duration_hours) as avg_duration FROM trip_delays GROUP BY origin, destination ORDER BY avg_duration DESC LIMIT 5;"
+            return "WITH trip_delays AS (SELECT trip_id, origin, destination, (end_time_epoch - start_time_epoch) / 3600.0 as duration_hours FROM trips WHERE status = 'finished') SELECT origin, destination, AVG(duration_hours) as avg_duration FROM trip_delays GROUP BY origin, destination ORDER BY avg_duration DESC LIMIT 5;"
         
         elif "conductor" in nl_lower and "kilómetros" in nl_lower:
-            return "SELECT d.name, d.driver_id, SUM(t.distance_km) as total_km FROM drivers d JOIN trucks tr ON d.driver_id = tr.driver_id JOIN trips t ON tr.truck_id = t.truck_id WHERE t.start_time >= datetime('now', '-30 days') GROUP BY d.driver_id ORDER BY total_km DESC LIMIT 1;"
+            return "SELECT d.name, d.driver_id, SUM(t.distance_km) as total_km FROM drivers d JOIN trucks tr ON d.driver_id = tr.driver_id JOIN trips t ON tr.truck_id = t.truck_id WHERE t.start_time >= date('now', '-30 days') GROUP BY d.driver_id ORDER BY total_km DESC LIMIT 1;"
         
         elif "velocidad" in nl_lower and "excesiva" in nl_lower:
-            return "SELECT * FROM alerts WHERE alert_type = 'speed' AND timestamp >= datetime('now', '-7 days') ORDER BY timestamp DESC LIMIT 20;"
+            return "SELECT * FROM alerts WHERE alert_type = 'speed' AND timestamp_epoch >= strftime('%s', 'now', '-7 days') ORDER BY timestamp_epoch DESC LIMIT 20;"
         
         elif "combustible" in nl_lower and "bajo" in nl_lower:
             return "SELECT DISTINCT t.truck_id, t.plate, t.brand, tele.fuel_level FROM trucks t JOIN telemetry tele ON t.truck_id = tele.truck_id WHERE tele.fuel_level < 20 ORDER BY tele.fuel_level ASC LIMIT 10;"
@@ -197,6 +298,20 @@ class GeminiClient:
             return "SELECT * FROM trucks LIMIT 10;"
     
     def generate_explanation(self, nl_query: str, sql: str, rows: list) -> str:
+        """Versión sincrónica de generate_explanation_async"""
+        if self.transport is None or not rows:
+            return self.generate_explanation_offline(nl_query, sql, rows)
+        return self._run_sync(self.generate_explanation_async(nl_query, sql, rows))
+    
+    def generate_explanation_offline(self, nl_query: str, sql: str, rows: list) -> str:
+        """Explicación sin llamar al LLM (sin resultados o en modo mock)"""
+        if not rows:
+            return "❌ No se encontraron resultados para esta consulta. Intenta reformular tu pregunta o verifica que los datos existan."
+        return self._generate_smart_mock_explanation(nl_query, sql, rows, len(rows))
+    
+    async def generate_explanation_async(
+        self, nl_query: str, sql: str, rows: list, raise_errors: bool = False
+    ) -> str:
         """
         Genera explicación inteligente en lenguaje natural de los resultados.
         Analiza los datos y proporciona insights, no solo cuenta filas.
@@ -205,21 +320,26 @@ class GeminiClient:
             nl_query: Pregunta original
             sql: SQL ejecutado
             rows: Resultados obtenidos
+            raise_errors: Propagar los errores del LLM (y LLMTransportError si el
+                          cliente todavía se está inicializando) en lugar de volver a
+                          la explicación sin API (quien llama decide el fallback)
         
         Returns:
             Explicación detallada con análisis e insights
         """
-        if not rows:
-            return "❌ No se encontraron resultados para esta consulta. Intenta reformular tu pregunta o verifica que los datos existan."
+        transport = self.transport
+        if transport is None and rows and raise_errors and not self.use_mock:
+            # Inicialización lazy en curso: model_name ya es el modelo real, así que
+            # la explicación offline no debe pasar por la suya (quien llama la memoizaría)
+            raise LLMTransportError(f"Cliente LLM inicializándose ({self.model_name})")
+        if transport is None or not rows:
+            return self.generate_explanation_offline(nl_query, sql, rows)
         
         num_rows = len(rows)
         
-        if self.use_mock:
-            return self._generate_smart_mock_explanation(nl_query, sql, rows, num_rows)
-        
         try:
             # Preparar muestra de datos (máximo 5 filas para no saturar el prompt)
-            sample_rows = rows[:5] if len(rows) > 5 else rows
+            sample_rows = rows[:5]
             
             # Convertir datos a formato legible
             import json
@@ -253,8 +373,7 @@ FORMATO DE RESPUESTA:
 
 Genera la explicación:"""
             
-            response = self.model.generate_content(prompt)
-            explanation = response.text.strip()
+            explanation = (await transport.generate(prompt)).strip()
             
             # Agregar conteo de resultados al final si no está mencionado
             if str(num_rows) not in explanation and num_rows > 1:
@@ -263,6 +382,8 @@ Genera la explicación:"""
             return explanation
             
         except Exception as e:
+            if raise_errors:
+                raise
             print(f"⚠️  Error generando explicación: {e}")
             # Fallback a explicación inteligente sin API
             return self._generate_smart_mock_explanation(nl_query, sql, rows, num_rows)
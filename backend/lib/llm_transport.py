@@ -0,0 +1,191 @@
+"""
+Transporte HTTP asíncrono para la API REST de Gemini (generateContent).
+
+Un cliente httpx por event loop mantiene las conexiones abiertas entre
+llamadas; cada intento tiene timeouts explícitos de conexión y lectura, los
+errores transitorios se reintentan con backoff exponencial + jitter, y un
+semáforo acota las llamadas en curso por proceso. httpx se importa al crear
+el transporte (en segundo plano al arrancar el backend), no con el módulo.
+"""
+
+import asyncio
+import random
+from typing import Optional
+
+
+DEFAULT_BASE_URL = "https://generativelanguage.googleapis.com"
+
+# Respuestas que vale la pena reintentar (sobrecarga, rate limit, fallas del servidor)
+RETRY_STATUS = {408, 429, 500, 502, 503, 504}
+
+
+class LLMTransportError(Exception):
+    """Falla definitiva de una llamada al LLM (error no reintentable o reintentos agotados)"""
+    pass
+
+
+def _response_text(payload: dict) -> str:
+    """Texto de la primera candidata de una respuesta generateContent"""
+    try:
+        parts = payload["candidates"][0]["content"]["parts"]
+        text = "".join(part.get("text", "") for part in parts)
+    except (KeyError, IndexError, TypeError):
+        reason = (payload.get("promptFeedback") or {}).get("blockReason") if isinstance(payload, dict) else None
+        raise LLMTransportError(f"Respuesta sin texto{f' ({reason})' if reason else ''}")
+    if not text.strip():
+        raise LLMTransportError("Respuesta vacía")
+    return text
+
+
+def _retry_after_s(response) -> Optional[float]:
+    """Header Retry-After en segundos (None si no viene o es una fecha)"""
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", "")))
+    except ValueError:
+        return None
+
+
+class GeminiTransport:
+    """
+    Llamadas generateContent con conexiones persistentes, timeouts,
+    reintentos con jitter y un límite de concurrencia.
+
+    El cliente HTTP y el semáforo pertenecen a un event loop: si se usa desde
+    otro (ej: asyncio.run en scripts), se crean de nuevo para ese loop.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        base_url: str = DEFAULT_BASE_URL,
+        connect_timeout_s: float = 5.0,
+        read_timeout_s: float = 30.0,
+        max_retries: int = 2,
+        backoff_s: float = 0.5,
+        max_backoff_s: float = 8.0,
+        max_concurrency: int = 8
+    ):
+        """
+        Args:
+            api_key: API key de Gemini (header x-goog-api-key)
+            model: Modelo (ej: gemini-2.0-flash-exp)
+            base_url: Raíz de la API (un proxy o un endpoint local en tests)
+            connect_timeout_s: Timeout para establecer la conexión
+            read_timeout_s: Timeout entre bytes de la respuesta
+            max_retries: Reintentos tras el primer intento (0 = sin reintentos)
+            backoff_s: Base del backoff exponencial entre reintentos
+            max_backoff_s: Tope de cada espera (también acota Retry-After)
+            max_concurrency: Llamadas en curso como máximo en el proceso
+        """
+        try:
+            import httpx
+        except ImportError:
+            raise ImportError("GeminiTransport requiere httpx: pip install httpx")
+
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.backoff_s = backoff_s
+        self.max_backoff_s = max_backoff_s
+        self.max_concurrency = max_concurrency
+
+        self._httpx = httpx
+        self._api_key = api_key
+        self._timeout = httpx.Timeout(read_timeout_s, connect=connect_timeout_s)
+        self._path = f"/v1beta/models/{model}:generateContent"
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._client = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        self.calls = 0
+        self.retries = 0
+        self.failures = 0
+        self._in_flight = 0
+
+    def _session(self):
+        """(cliente HTTP, semáforo) del event loop actual"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._loop = loop
+            httpx = self._httpx
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self._timeout,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency
+                ),
+                headers={"x-goog-api-key": self._api_key}
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._client, self._semaphore
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        """Full jitter: uniforme entre 0 y el backoff exponencial (o lo que pida el servidor)"""
+        delay = random.uniform(0, min(self.max_backoff_s, self.backoff_s * 2 ** attempt))
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff_s))
+        return delay
+
+    async def generate(self, prompt: str) -> str:
+        """
+        Texto generado para un prompt.
+
+        Raises:
+            LLMTransportError: Error no reintentable, respuesta sin texto o
+                               reintentos agotados
+        """
+        client, semaphore = self._session()
+        body = {"contents": [{"role": "user", "parts": [{"text": prompt}]}]}
+        self.calls += 1
+
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            # El turno se toma por intento: las esperas entre reintentos no ocupan un lugar
+            async with semaphore:
+                self._in_flight += 1
+                try:
+                    response = await client.post(self._path, json=body)
+                except self._httpx.TransportError as e:
+                    # Timeouts de conexión/lectura, conexión rechazada o cortada
+                    error = f"{type(e).__name__}: {e}"
+                else:
+                    if response.status_code == 200:
+                        try:
+                            return _response_text(response.json())
+                        except (LLMTransportError, ValueError) as e:
+                            self.failures += 1
+                            raise LLMTransportError(str(e)) from e
+                    error = f"HTTP {response.status_code}: {response.text[:200]}"
+                    if response.status_code not in RETRY_STATUS:
+                        self.failures += 1
+                        raise LLMTransportError(error)
+                    retry_after = _retry_after_s(response)
+                finally:
+                    self._in_flight -= 1
+
+            if attempt < self.max_retries:
+                self.retries += 1
+                await asyncio.sleep(self._backoff(attempt, retry_after))
+
+        self.failures += 1
+        raise LLMTransportError(f"Sin respuesta tras {self.max_retries + 1} intentos: {error}")
+
+    async def aclose(self):
+        """Cierra las conexiones del cliente del event loop actual"""
+        if self._client is not None and self._loop is asyncio.get_running_loop():
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+
+    def stats(self) -> dict:
+        """Contadores para /cache/stats"""
+        return {
+            "model": self.model,
+            "calls": self.calls,
+            "retries": self.retries,
+            "failures": self.failures,
+            "in_flight": self._in_flight,
+            "max_concurrency": self.max_concurrency
+        }
@@ -0,0 +1,280 @@
+"""
+Paginación por keyset para resultados grandes de /query.
+La primera página devuelve un cursor opaco (firmado) con el SQL base, las
+columnas clave y los valores de la última fila; las páginas siguientes
+retoman desde ahí con `(k1, k2) > (?, ?)` sin volver a llamar al LLM ni
+recorrer las páginas anteriores.
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from backend.lib.validate_sql import parse_sql
+
+
+# Columnas keyset por tabla (la última es la PK y desempata)
+PAGE_KEYS = {
+    "telemetry": ("timestamp", "telemetry_id"),
+    "alerts": ("timestamp", "alert_id"),
+    "trips": ("start_time", "trip_id"),
+    "trucks": ("truck_id",),
+    "drivers": ("driver_id",),
+}
+
+# Preferencia cuando el SQL referencia varias tablas: la tabla de hechos define el
+# orden y las PK de las demás completan la clave (en un JOIN 1:N ninguna PK sola es única)
+KEY_PRIORITY = ["telemetry", "alerts", "trips", "trucks", "drivers"]
+
+# LIMIT que el prompt/validador agregan por defecto: en modo paginado (y en
+# /query/stream) no es un tope real
+DEFAULT_LIMIT = 1000
+
+MAX_PAGE_SIZE = 5000
+
+# Secreto para firmar cursores; debe ser el mismo en todos los workers. Sin
+# CURSOR_SECRET se genera uno por proceso: los cursores solo valen en el worker
+# que los firmó y hasta que se reinicia
+CURSOR_SECRET_CONFIGURED = bool(os.getenv("CURSOR_SECRET"))
+_CURSOR_SECRET = (os.getenv("CURSOR_SECRET") or "").encode("utf-8") or os.urandom(32)
+
+
+class PaginationError(Exception):
+    """Excepción para cursores inválidos o consultas no paginables"""
+    pass
+
+
+def check_cursor_secret(workers: int):
+    """
+    Con más de un worker un cursor puede llegar a otro proceso: exige un
+    CURSOR_SECRET compartido en lugar del generado por proceso.
+
+    Raises:
+        RuntimeError: Si hay más de un worker y CURSOR_SECRET no está configurado
+    """
+    if workers > 1 and not CURSOR_SECRET_CONFIGURED:
+        raise RuntimeError(
+            f"CURSOR_SECRET es obligatorio con {workers} workers: sin un secreto compartido "
+            "los cursores de paginación solo son válidos en el worker que los firmó"
+        )
+
+
+class PagePlan:
+    """SQL base sin ORDER BY/LIMIT de nivel superior + columnas keyset"""
+
+    def __init__(self, base_sql: str, keys: Sequence[str], descending: bool, cap: Optional[int]):
+        self.base_sql = base_sql
+        self.keys = tuple(keys)
+        self.descending = descending
+        self.cap = cap
+
+
+def _top_level_positions(sql: str, pattern: str) -> List[re.Match]:
+    """Matches de `pattern` fuera de paréntesis y literales de texto"""
+    depth = 0
+    in_string = False
+    top_level = []
+    matches = {m.start(): m for m in re.finditer(pattern, sql, re.IGNORECASE)}
+
+    for i, ch in enumerate(sql):
+        if ch == "'":
+            in_string = not in_string
+        elif not in_string:
+            if ch == "(":
+                depth += 1
+            elif ch == ")":
+                depth -= 1
+            elif depth == 0 and i in matches:
+                top_level.append(matches[i])
+    return top_level
+
+
+def split_order_and_limit(sql: str) -> Tuple[str, Optional[str], Optional[int]]:
+    """
+    Separa el ORDER BY y el LIMIT de nivel superior.
+
+    Returns:
+        (sql sin ORDER BY/LIMIT, texto del ORDER BY o None, valor del LIMIT o None)
+    """
+    body = sql.strip().rstrip(";").strip()
+
+    limit_value = None
+    limits = _top_level_positions(body, r"\bLIMIT\s+(\d+)(\s*(OFFSET|,)\s*\d+)?")
+    if limits:
+        match = limits[-1]
+        if match.group(2):
+            raise PaginationError("No se puede paginar una consulta con OFFSET")
+        limit_value = int(match.group(1))
+        body = (body[:match.start()] + body[match.end():]).strip()
+
+    order_by = None
+    orders = _top_level_positions(body, r"\bORDER\s+BY\b")
+    if orders:
+        match = orders[-1]
+        order_by = body[match.end():].strip()
+        body = body[:match.start()].strip()
+
+    return body, order_by, limit_value
+
+
+def drop_default_limit(sql: str) -> str:
+    """
+    Quita un `LIMIT 1000` final de nivel superior (el que el prompt pide
+    agregar siempre). Cualquier otro LIMIT es un tope pedido y se conserva.
+    """
+    body = sql.strip().rstrip(";").strip()
+    limits = _top_level_positions(body, r"\bLIMIT\s+(\d+)\s*$")
+    if limits and int(limits[-1].group(1)) == DEFAULT_LIMIT:
+        return body[:limits[-1].start()].strip() + ";"
+    return sql
+
+
+def _parse_order_terms(order_by: str) -> List[Tuple[str, bool]]:
+    """'t.timestamp DESC, id' → [('timestamp', True), ('id', False)]"""
+    terms = []
+    for term in order_by.split(","):
+        parts = term.strip().split()
+        if not parts:
+            continue
+        column = parts[0].split(".")[-1].strip('"').lower()
+        descending = len(parts) > 1 and parts[1].upper() == "DESC"
+        terms.append((column, descending))
+    return terms
+
+
+def plan_pagination(sql: str, result_columns: Sequence[str]) -> Optional[PagePlan]:
+    """
+    Decide si un SQL validado se puede paginar por keyset.
+
+    La clave tiene que identificar cada fila del resultado: el keyset de la
+    tabla de hechos más la PK de cada tabla unida, todas presentes en el
+    resultado. Retorna None si no es así (ej: agregaciones, un JOIN que no
+    trae la PK de alguna tabla, una tabla unida consigo misma) o si el
+    ORDER BY pedido no coincide con el keyset; en esos casos se ejecuta la
+    consulta normal.
+    """
+    base_sql, order_by, limit_value = split_order_and_limit(sql)
+    columns = {c.lower() for c in result_columns}
+    parsed = parse_sql(sql)
+    tables = parsed.tables
+
+    if not tables or not tables <= PAGE_KEYS.keys():
+        return None
+    # La misma tabla con dos alias: su PK aparece dos veces y la columna es ambigua
+    if any(sum(1 for alias, t in parsed.table_aliases.items() if t == table and alias != table) > 1
+           for table in tables):
+        return None
+
+    keys: List[str] = []
+    for table in KEY_PRIORITY:
+        if table in tables:
+            candidate = PAGE_KEYS[table] if not keys else PAGE_KEYS[table][-1:]
+            keys.extend(k for k in candidate if k not in keys)
+    if not all(k in columns for k in keys):
+        return None
+
+    descending = False
+    if order_by:
+        terms = _parse_order_terms(order_by)
+        directions = {d for _, d in terms}
+        # El orden pedido debe ser un prefijo del keyset con una sola dirección
+        if [c for c, _ in terms] != keys[:len(terms)] or len(directions) != 1:
+            return None
+        descending = directions.pop()
+
+    cap = limit_value if limit_value is not None and limit_value != DEFAULT_LIMIT else None
+    return PagePlan(base_sql, keys, descending, cap)
+
+
+def _after_clause(keys: Sequence[str], after: Sequence[Any], descending: bool) -> Tuple[str, list]:
+    """
+    Condición "después de `after`" en el orden de SQLite, donde NULL es el
+    menor valor (primero en ASC, último en DESC).
+
+    El row value `(k1, k2) > (?, ?)` ya excluye bien las filas con NULL en
+    orden ascendente, pero es NULL (falso) para filas que van después en
+    orden descendente o cuando el propio `after` tiene un NULL; en esos
+    casos se expande término por término.
+    """
+    key_tuple = ", ".join(f'"{k}"' for k in keys)
+    if not descending and all(value is not None for value in after):
+        placeholders = ", ".join("?" for _ in keys)
+        return f"({key_tuple}) > ({placeholders})", list(after)
+
+    terms, params = [], []
+    for i, (key, value) in enumerate(zip(keys, after)):
+        if value is None:
+            # Nada es menor que NULL; en ASC, cualquier valor no nulo va después
+            if descending:
+                continue
+            last = f'"{key}" IS NOT NULL'
+        else:
+            last = f'("{key}" < ? OR "{key}" IS NULL)' if descending else f'"{key}" > ?'
+        prefix = [f'"{k}" IS ?' for k in keys[:i]]
+        terms.append("(" + " AND ".join(prefix + [last]) + ")")
+        params.extend(after[:i])
+        if value is not None:
+            params.append(value)
+    return "(" + (" OR ".join(terms) or "0") + ")", params
+
+
+def build_page_sql(plan: PagePlan, after: Optional[Sequence[Any]], page_size: int) -> Tuple[str, list]:
+    """
+    SQL y parámetros de una página. Pide page_size + 1 filas para saber
+    si hay página siguiente sin una consulta extra.
+    """
+    direction = " DESC" if plan.descending else ""
+    order = ", ".join(f'"{k}"{direction}' for k in plan.keys)
+
+    sql = f"SELECT * FROM ({plan.base_sql}) AS page_src"
+    params: list = []
+    if after is not None:
+        condition, params = _after_clause(plan.keys, after, plan.descending)
+        sql += f" WHERE {condition}"
+    sql += f" ORDER BY {order} LIMIT ?"
+    params.append(page_size + 1)
+    return sql, params
+
+
+def _sign(payload: bytes) -> str:
+    return hmac.new(_CURSOR_SECRET, payload, hashlib.sha256).hexdigest()[:32]
+
+
+def encode_cursor(plan: PagePlan, last_row: Dict[str, Any], remaining: Optional[int], page_size: int) -> str:
+    """Cursor opaco y firmado para retomar después de `last_row`"""
+    state = {
+        "sql": plan.base_sql,
+        "keys": list(plan.keys),
+        "desc": plan.descending,
+        "after": [last_row[k] for k in plan.keys],
+        "remaining": remaining,
+        "page_size": page_size,
+    }
+    payload = json.dumps(state, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    token = base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+    return f"{token}.{_sign(payload)}"
+
+
+def decode_cursor(cursor: str) -> Tuple[PagePlan, List[Any], Optional[int], int]:
+    """
+    Valida la firma y retorna (plan, valores keyset, filas restantes, tamaño de página).
+
+    Raises:
+        PaginationError: Si el cursor está mal formado o fue alterado
+    """
+    try:
+        token, signature = cursor.rsplit(".", 1)
+        payload = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+    except (ValueError, TypeError):
+        raise PaginationError("Cursor mal formado")
+
+    if not hmac.compare_digest(signature, _sign(payload)):
+        raise PaginationError("Cursor inválido o alterado")
+
+    state = json.loads(payload)
+    plan = PagePlan(state["sql"], state["keys"], state["desc"], None)
+    return plan, state["after"], state["remaining"], state["page_size"]
@@ -0,0 +1,333 @@
+"""
+Particiones mensuales de las tablas de hechos que más crecen (telemetry y
+alerts). Cada mes se guarda en su propia tabla (ej: telemetry_2025_10) y
+una vista con el nombre canónico las une, así el SQL generado no cambia.
+Define la organización (usada por scripts/load_data.py para escribir) y
+poda las particiones que el filtro de tiempo de una consulta no puede tocar.
+"""
+
+import calendar
+import re
+import sqlite3
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+from backend.lib.rollups import mask_strings, split_top_level, unmask
+
+
+class PartitionSpec:
+    """Tabla de hechos particionada por mes"""
+
+    def __init__(self, table: str, time_column: str, epoch_column: str):
+        """
+        Args:
+            table: Nombre canónico (la vista que une las particiones)
+            time_column: Columna ISO 8601 cuyo mes (YYYY-MM) elige la partición
+            epoch_column: Columna *_epoch derivada de time_column
+        """
+        self.table = table
+        self.time_column = time_column
+        self.epoch_column = epoch_column
+
+    def partition_name(self, month: Optional[str]) -> str:
+        """'2025-10' → telemetry_2025_10; None → telemetry_default"""
+        return f"{self.table}_{month.replace('-', '_')}" if month else f"{self.table}_default"
+
+
+PARTITIONS = {
+    "telemetry": PartitionSpec("telemetry", "timestamp", "timestamp_epoch"),
+    "alerts": PartitionSpec("alerts", "timestamp", "timestamp_epoch"),
+}
+
+# Tabla canónica → {mes 'YYYY-MM' (None = partición default): tabla física}
+PartitionLayout = Dict[str, Dict[Optional[str], str]]
+
+# Margen de los límites epoch de un mes: cubre timestamps con offset de zona horaria
+EPOCH_SLACK_S = 86400
+
+_MONTH = re.compile(r"^\d{4}-(?:0[1-9]|1[0-2])$")
+_PARTITION_SUFFIX = re.compile(r"^(\d{4})_(\d{2})$")
+
+
+def partition_month(value) -> Optional[str]:
+    """Mes (YYYY-MM) de un timestamp ISO 8601, o None si no tiene uno válido (partición default)"""
+    if not isinstance(value, str):
+        return None
+    month = value[:7]
+    return month if _MONTH.match(month) else None
+
+
+def parent_table(name: str) -> str:
+    """Tabla canónica de una partición (o el mismo nombre si no es una)"""
+    for table in PARTITIONS:
+        suffix = name[len(table) + 1:] if name.startswith(f"{table}_") else None
+        if suffix == "default" or (suffix and _PARTITION_SUFFIX.match(suffix)):
+            return table
+    return name
+
+
+def list_partitions(conn: sqlite3.Connection, spec: PartitionSpec) -> Dict[Optional[str], str]:
+    """Particiones existentes de una tabla: {mes (None = default): nombre}"""
+    partitions: Dict[Optional[str], str] = {}
+    cursor = conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name GLOB ?", (f"{spec.table}_*",)
+    )
+    for (name,) in cursor:
+        suffix = name[len(spec.table) + 1:]
+        if suffix == "default":
+            partitions[None] = name
+            continue
+        match = _PARTITION_SUFFIX.match(suffix)
+        if match and partition_month(f"{match.group(1)}-{match.group(2)}"):
+            partitions[f"{match.group(1)}-{match.group(2)}"] = name
+    return partitions
+
+
+def load_partition_layout(conn: sqlite3.Connection) -> PartitionLayout:
+    """
+    Particiones con datos de cada tabla particionada (solo las que ya son
+    una vista sobre particiones). Las vacías (normalmente la default) no se
+    leen: una consulta que queda con una sola partición se ejecuta como
+    sobre una tabla simple.
+    """
+    layout: PartitionLayout = {}
+    for table, spec in PARTITIONS.items():
+        kind = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+        if kind and kind[0] == "view":
+            layout[table] = {
+                month: name for month, name in list_partitions(conn, spec).items()
+                if conn.execute(f"SELECT 1 FROM {name} LIMIT 1").fetchone()
+            }
+    return layout
+
+
+def view_sql(table: str, partitions: List[str]) -> str:
+    """Vista con el nombre canónico sobre las particiones"""
+    union = " UNION ALL ".join(f"SELECT * FROM {name}" for name in sorted(partitions))
+    return f"CREATE VIEW {table} AS {union}"
+
+
+def month_bounds(month: str) -> Tuple[Tuple[str, str], Tuple[int, int]]:
+    """
+    Límites de los valores que puede tener una partición mensual.
+
+    Returns:
+        ((texto desde, texto hasta), (epoch desde, epoch hasta)), ambos con el
+        límite superior excluido. Todo timestamp del mes empieza con 'YYYY-MM',
+        así que queda entre 'YYYY-MM' y el mes siguiente en orden de texto.
+    """
+    year, mon = int(month[:4]), int(month[5:7])
+    start = date(year, mon, 1)
+    end = date(year + mon // 12, mon % 12 + 1, 1)
+    epochs = (calendar.timegm(start.timetuple()) - EPOCH_SLACK_S,
+              calendar.timegm(end.timetuple()) + EPOCH_SLACK_S)
+    return (start.isoformat()[:7], end.isoformat()[:7]), epochs
+
+
+# ----------------------------------------------------------------------------
+# Poda de particiones
+# ----------------------------------------------------------------------------
+
+_NOT_ALIASES = (
+    "where", "join", "inner", "left", "right", "full", "cross", "outer", "natural", "on",
+    "using", "group", "order", "limit", "having", "window", "union", "except", "intersect"
+)
+_SOURCE = re.compile(
+    rf"\b(?:FROM|JOIN)\s+(?P<table>\w+)(?:\s+(?:AS\s+)?(?!(?:{'|'.join(_NOT_ALIASES)})\b)(?P<alias>\w+))?",
+    re.IGNORECASE
+)
+# Subconsultas, CTEs y compuestas: el alcance de cada filtro no es evidente, no se podan
+_UNSUPPORTED = re.compile(r"\(\s*SELECT\b|\b(?:WITH|UNION|INTERSECT|EXCEPT)\b", re.IGNORECASE)
+_CLAUSE_END = r"\bGROUP\s+BY\b|\bORDER\s+BY\b|\bLIMIT\b|\bHAVING\b|\bWINDOW\b|;|$"
+_FROM = re.compile(rf"\bFROM\b(?P<body>.*?)(?=\bWHERE\b|{_CLAUSE_END})", re.IGNORECASE | re.DOTALL)
+_WHERE = re.compile(rf"\bWHERE\b(?P<body>.*?)(?={_CLAUSE_END})", re.IGNORECASE | re.DOTALL)
+_COMPARISON = re.compile(r"^(?P<lhs>[^<>=!]+?)\s*(?P<op>>=|<=|==|=|>|<)\s*(?P<rhs>[^<>=!]+)$", re.DOTALL)
+_BETWEEN = re.compile(r"^(?P<column>\S+)\s+BETWEEN\s+(?P<low>.+?)\s+AND\s+(?P<high>.+)$",
+                      re.IGNORECASE | re.DOTALL)
+_COLUMN = re.compile(r"^(?:(?P<qualifier>\w+)\.)?(?P<name>\w+)$")
+# Palabras permitidas en el lado constante de un límite (ej: strftime('%s', 'now', '-7 days'))
+_CONSTANT_WORDS = {"date", "datetime", "time", "julianday", "strftime", "unixepoch",
+                   "cast", "as", "integer", "real", "text", "numeric"}
+_FLIPPED = {">": "<", "<": ">", ">=": "<=", "<=": ">=", "=": "=", "==": "="}
+_PARTITION_REF = rf"(?:{'|'.join(PARTITIONS)})_(?:\d{{4}}_\d{{2}}|default)\b"
+_PRUNED = re.compile(
+    rf"\(SELECT \* FROM (?P<union>{_PARTITION_REF})(?: UNION ALL SELECT \* FROM {_PARTITION_REF})*\) AS "
+    rf"|\b(?P<single>{_PARTITION_REF}) AS "
+)
+
+
+def _may_match(low, high, op: str, value) -> bool:
+    """¿Algún valor v con low <= v < high puede cumplir `v op value`?"""
+    if op in (">", ">="):
+        return value < high
+    if op == "<=":
+        return value >= low
+    if op == "<":
+        return value > low
+    return low <= value < high
+
+
+class _Source:
+    """Una tabla particionada en el FROM/JOIN de la consulta"""
+
+    def __init__(self, match: re.Match, spec: PartitionSpec, partitions: Dict[Optional[str], str]):
+        self.span = match.span()
+        self.keyword = match.group(0).split(None, 1)[0]
+        self.spec = spec
+        self.alias = (match.group("alias") or spec.table).lower()
+        self.months = {month for month in partitions if month is not None}
+        self.partitions = partitions
+
+
+class _PartitionPruner:
+    """Poda las particiones de cada fuente según los límites de tiempo del WHERE"""
+
+    def __init__(self, conn: sqlite3.Connection, masked_sql: str, literals: List[str], layout: PartitionLayout):
+        self.conn = conn
+        self.sql = masked_sql
+        self.literals = literals
+        self.sources = [
+            _Source(match, PARTITIONS[match.group("table").lower()], layout[match.group("table").lower()])
+            for match in _SOURCE.finditer(masked_sql)
+            if match.group("table").lower() in layout
+        ]
+
+    def _resolve(self, text: str) -> Optional[Tuple[_Source, str]]:
+        """(fuente, columna) si `text` es la columna de tiempo o epoch de una fuente particionada"""
+        match = _COLUMN.match(text.strip())
+        if not match:
+            return None
+        qualifier, name = (match.group("qualifier") or "").lower(), match.group("name").lower()
+        if qualifier:
+            candidates = [s for s in self.sources if s.alias == qualifier]
+        else:
+            # Sin calificar solo si no hay ambigüedad entre dos tablas particionadas
+            candidates = self.sources if len(self.sources) == 1 else []
+        if len(candidates) != 1:
+            return None
+        source = candidates[0]
+        if name not in (source.spec.time_column, source.spec.epoch_column):
+            return None
+        return source, name
+
+    def _constant(self, text: str):
+        """Valor de una expresión constante, calculado por SQLite (None si no es constante)"""
+        if re.search(r"[<>=!]", text):
+            # Otra comparación en la expresión: cambia cómo se agrupa la condición
+            return None
+        words = re.findall(r"[A-Za-z_]\w*", re.sub(r"\x00\d+\x00", "", text))
+        if any(word.lower() not in _CONSTANT_WORDS for word in words):
+            return None
+        try:
+            return self.conn.execute(f"SELECT {unmask(text, self.literals)}").fetchone()[0]
+        except sqlite3.Error:
+            return None
+
+    def _apply(self, source: _Source, column: str, op: str, value):
+        """Descarta los meses de la fuente que no pueden cumplir `column op value`"""
+        if value is None:
+            return
+        is_epoch = column == source.spec.epoch_column
+        if is_epoch:
+            # Afinidad INTEGER: SQLite convierte el texto numérico
+            try:
+                value = float(value)
+            except (TypeError, ValueError):
+                return
+        elif not isinstance(value, str):
+            return
+
+        for month in list(source.months):
+            texts, epochs = month_bounds(month)
+            low, high = epochs if is_epoch else texts
+            if not _may_match(low, high, op, value):
+                source.months.discard(month)
+
+    def _apply_condition(self, condition: str):
+        between = _BETWEEN.match(condition)
+        if between:
+            resolved = self._resolve(between.group("column"))
+            if resolved:
+                self._apply(*resolved, ">=", self._constant(between.group("low")))
+                self._apply(*resolved, "<=", self._constant(between.group("high")))
+            return
+
+        comparison = _COMPARISON.match(condition)
+        if not comparison:
+            return
+        lhs, op, rhs = comparison.group("lhs"), comparison.group("op"), comparison.group("rhs")
+        resolved = self._resolve(lhs)
+        if resolved:
+            self._apply(*resolved, op, self._constant(rhs))
+            return
+        resolved = self._resolve(rhs)
+        if resolved:
+            self._apply(*resolved, _FLIPPED[op], self._constant(lhs))
+
+    def _conditions(self) -> List[str]:
+        """Condiciones del WHERE unidas por AND (vacío si hay un OR de primer nivel)"""
+        where = _WHERE.search(self.sql)
+        if not where or len(split_top_level(where.group("body"), r"\bOR\b")) > 1:
+            return []
+        conditions: List[str] = []
+        pending_between = False
+        for part in split_top_level(where.group("body"), r"\bAND\b"):
+            if pending_between:
+                # El AND de un BETWEEN no separa condiciones
+                conditions[-1] += f" AND {part}"
+                pending_between = False
+            else:
+                conditions.append(part)
+                pending_between = len(split_top_level(part, r"\bBETWEEN\b")) > 1
+        return conditions
+
+    def prune(self) -> Optional[str]:
+        if not self.sources or _UNSUPPORTED.search(self.sql):
+            return None
+        source_list = _FROM.search(self.sql)
+        if not source_list or len(split_top_level(source_list.group("body"), ",")) > 1:
+            # Joins con coma: las fuentes no se pueden identificar con seguridad
+            return None
+
+        for condition in self._conditions():
+            self._apply_condition(condition)
+
+        sql = self.sql
+        pruned = False
+        for source in reversed(self.sources):
+            kept = [name for month, name in source.partitions.items() if month is None or month in source.months]
+            if not kept or len(kept) == len(source.partitions):
+                continue
+            pruned = True
+            if len(kept) == 1:
+                # Una sola partición: SQLite la trata como una tabla (índices, sin co-rutina)
+                replacement = kept[0]
+            else:
+                replacement = "(" + " UNION ALL ".join(f"SELECT * FROM {name}" for name in sorted(kept)) + ")"
+            start, end = source.span
+            sql = f"{sql[:start]}{source.keyword} {replacement} AS {source.alias}{sql[end:]}"
+        return unmask(sql, self.literals) if pruned else None
+
+
+def prune_partitions(conn: sqlite3.Connection, sql: str, layout: PartitionLayout) -> Optional[str]:
+    """
+    SQL equivalente que lee solo las particiones que pueden cumplir los
+    límites de tiempo del WHERE (y tienen datos), o None si no se descarta
+    ninguna.
+
+    Se usan las condiciones de primer nivel unidas por AND que comparan la
+    columna de tiempo (o su *_epoch) con una expresión constante, por ejemplo
+    timestamp >= datetime('now', '-7 days'). La partición default (timestamps
+    nulos o no ISO) solo se descarta si está vacía. Subconsultas, CTEs, UNION y joins con
+    coma se ejecutan sin podar.
+    """
+    masked, literals = mask_strings(sql.strip())
+    return _PartitionPruner(conn, masked, literals, layout).prune()
+
+
+def unprune_partitions(sql: str) -> str:
+    """Revierte prune_partitions: vuelve a leer la vista canónica (ej: para otro motor)"""
+    masked, literals = mask_strings(sql)
+    return unmask(
+        _PRUNED.sub(lambda m: f"{parent_table(m.group('union') or m.group('single'))} AS ", masked), literals
+    )
@@ -0,0 +1,271 @@
+"""
+Prompt NL→SQL armado por pregunta.
+
+En lugar de mandar siempre el schema completo y todos los ejemplos
+few-shot, se eligen las tablas que la pregunta menciona (palabras clave y
+entidades conocidas: marcas, regiones, ciudades, tipos de alerta...) y los
+ejemplos más parecidos que solo usan esas tablas, dentro de un presupuesto
+de tokens. Los fragmentos armados (tablas + ejemplos elegidos) se cachean.
+"""
+
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Sequence, Tuple
+
+from backend.lib.translation_cache import normalize_question
+from backend.lib.validate_sql import extract_tables_from_sql
+
+
+HEADER = (
+    "Eres un asistente experto que genera SQL seguro para una base de datos SQLite "
+    "con las siguientes tablas y columnas:"
+)
+
+# Orden canónico de las tablas en el prompt
+SCHEMA_LINES = {
+    "trucks": "trucks(truck_id TEXT, plate TEXT, model TEXT, brand TEXT, driver_id TEXT, region TEXT, status TEXT)",
+    "drivers": "drivers(driver_id TEXT, name TEXT, license TEXT)",
+    "trips": (
+        "trips(trip_id TEXT, truck_id TEXT, origin TEXT, destination TEXT, start_time TEXT, end_time TEXT, "
+        "distance_km REAL, status TEXT, start_time_epoch INTEGER, end_time_epoch INTEGER)"
+    ),
+    "telemetry": (
+        "telemetry(telemetry_id TEXT, truck_id TEXT, timestamp TEXT, speed_kmh REAL, fuel_level REAL, "
+        "engine_temp_c REAL, timestamp_epoch INTEGER)"
+    ),
+    "alerts": (
+        "alerts(alert_id TEXT, truck_id TEXT, timestamp TEXT, alert_type TEXT, severity TEXT, description TEXT, "
+        "timestamp_epoch INTEGER)"
+    ),
+}
+ALL_TABLES = tuple(SCHEMA_LINES)
+
+# Tabla que une a las demás (trips/telemetry/alerts.truck_id y trucks.driver_id)
+HUB_TABLE = "trucks"
+
+INSTRUCTIONS = (
+    "SOLO genera una consulta SELECT válida en SQL compatible con SQLite.",
+    "No incluyas comandos DDL/DML (CREATE, DROP, DELETE, UPDATE, INSERT, ALTER).",
+    "Añade siempre LIMIT si no está presente (máximo 1000).",
+    "Usa funciones de fecha de SQLite: date(), datetime(), time(), strftime().",
+    "Las columnas de tiempo TEXT son ISO8601 UTC; las columnas *_epoch tienen el mismo instante en segundos Unix (indexadas).",
+    "Para períodos de días completos (última semana, últimos 30 días, este mes) compara con date(): timestamp >= date('now', '-7 days').",
+    "Para ventanas de horas o instantes exactos usa la columna *_epoch: timestamp_epoch >= strftime('%s', 'now', '-24 hours'). No compares timestamp con datetime().",
+    "Para duraciones resta columnas *_epoch: (end_time_epoch - start_time_epoch) / 3600.0 as duration_hours. No uses julianday().",
+    "Nunca apliques funciones a una columna en el WHERE (ej: date(end_time) = ...); usa rangos sobre la columna.",
+    "No expliques nada en la salida; retorna SOLO el SQL.",
+    "El SQL debe terminar con punto y coma (;).",
+)
+
+# Ejemplos few-shot (NL, SQL)
+EXAMPLES = (
+    (
+        "¿Qué camión tuvo más alertas de temperatura en la última semana?",
+        "SELECT truck_id, COUNT(*) as alerts FROM alerts WHERE alert_type = 'temperature' AND timestamp >= date('now', '-7 days') GROUP BY truck_id ORDER BY alerts DESC LIMIT 5;",
+    ),
+    (
+        "Promedio de consumo por marca de camión en los últimos 30 días",
+        "SELECT t.brand, AVG(tele.fuel_level) as avg_fuel_level FROM trucks t JOIN telemetry tele ON t.truck_id = tele.truck_id WHERE tele.timestamp >= date('now','-30 days') GROUP BY t.brand;",
+    ),
+    (
+        "¿Cuántos viajes finalizados hubo ayer?",
+        "SELECT COUNT(*) as trips_finished FROM trips WHERE status = 'finished' AND end_time_epoch >= strftime('%s', date('now', '-1 day')) AND end_time_epoch < strftime('%s', date('now'));",
+    ),
+    (
+        "Mostrar las 10 últimas alertas críticas",
+        "SELECT * FROM alerts WHERE severity = 'critical' ORDER BY timestamp DESC LIMIT 10;",
+    ),
+    (
+        "Lista de camiones actualmente en mantenimiento",
+        "SELECT * FROM trucks WHERE status = 'maintenance';",
+    ),
+    (
+        "Top 5 rutas con más retrasos",
+        "WITH trip_delays AS (SELECT trip_id, origin, destination, (end_time_epoch - start_time_epoch) / 3600.0 as duration_hours FROM trips WHERE status = 'finished') SELECT origin, destination, AVG(duration_hours) as avg_duration FROM trip_delays GROUP BY origin, destination ORDER BY avg_duration DESC LIMIT 5;",
+    ),
+)
+ALL_EXAMPLES = tuple(range(len(EXAMPLES)))
+
+FOOTER = "Ahora genera SQL para la siguiente pregunta:"
+
+# Palabras clave y entidades por tabla, normalizadas como normalize_question
+# (minúsculas, sin acentos). Las de 4+ letras también matchean como prefijo
+# (camion → camiones); las más cortas y las de varias palabras, completas.
+TABLE_KEYWORDS: Dict[str, Tuple[str, ...]] = {
+    "trucks": (
+        "camion", "truck", "flota", "unidad", "vehiculo", "patente", "placa", "plate", "marca", "brand",
+        "modelo", "region", "mantenimiento", "activo", "inactivo",
+        # Marcas, modelos y regiones del dataset
+        "scania", "volvo", "mercedes", "man", "iveco", "daf",
+        "r450", "fh16", "actros", "tgx", "s way", "xf",
+        "norte", "sur", "oeste", "centro",
+    ),
+    "drivers": ("conductor", "chofer", "driver", "licencia", "license", "nombre"),
+    "trips": (
+        "viaje", "trip", "ruta", "route", "origen", "origin", "destino", "destination", "distancia",
+        "distance", "kilometr", "recorr", "retras", "demora", "duracion", "finalizad", "cancelad",
+        "programad", "en curso",
+        # Ciudades del dataset (origen/destino)
+        "buenos aires", "cordoba", "rosario", "mendoza", "tucuman", "la plata", "mar del plata", "salta",
+        "santa fe", "san juan",
+    ),
+    "telemetry": ("telemetr", "lectura", "sensor", "consumo", "nivel"),
+    "alerts": (
+        "alerta", "alert", "alarma", "incidente", "critic", "severidad", "severity", "gravedad",
+        "freno", "brake", "neumatico", "presion",
+    ),
+}
+
+# Medidas de telemetría que también son tipos de alerta (temperature, speed,
+# fuel, engine): apuntan a telemetry solo si la pregunta no habla de alertas
+TELEMETRY_MEASURES = ("velocidad", "speed", "combustible", "fuel", "temperatura", "temp", "motor", "engine")
+
+# Palabras frecuentes que no distinguen un ejemplo de otro
+_STOPWORDS = frozenset((
+    "cual", "cuales", "cuanto", "cuantos", "cuantas", "mostrar", "muestra", "lista", "listar", "hubo",
+    "tiene", "tuvo", "tienen", "para", "entre", "sobre", "desde", "cada", "todos", "todas", "esta", "este",
+))
+
+
+def estimate_tokens(text: str) -> int:
+    """Tokens aproximados (~4 caracteres por token, sin depender de un tokenizer)"""
+    return (len(text) + 3) // 4
+
+
+def _matches(keyword: str, text: str, words: FrozenSet[str]) -> bool:
+    if " " in keyword:
+        return f" {keyword} " in f" {text} "
+    if len(keyword) < 4:
+        return keyword in words
+    return any(word.startswith(keyword) for word in words)
+
+
+def _stems(text: str) -> FrozenSet[str]:
+    """Raíces (5 letras) de las palabras con contenido: alertas ~ alerta, camiones ~ camion"""
+    return frozenset(word[:5] for word in text.split() if len(word) >= 4 and word not in _STOPWORDS)
+
+
+@lru_cache(maxsize=None)
+def _example_info(index: int) -> Tuple[FrozenSet[str], FrozenSet[str]]:
+    """(tablas, raíces de la pregunta) de un ejemplo"""
+    nl, sql = EXAMPLES[index]
+    return frozenset(extract_tables_from_sql(sql)), _stems(normalize_question(nl))
+
+
+@lru_cache(maxsize=256)
+def render_prompt(tables: Tuple[str, ...], examples: Tuple[int, ...]) -> str:
+    """Prompt (sin la pregunta) con esas tablas y esos ejemplos, en ese orden"""
+    parts = [HEADER, "", "SCHEMA CANÓNICO:"]
+    parts.extend(f"- {SCHEMA_LINES[table]}" for table in tables)
+    parts.extend(["", "INSTRUCCIONES:"])
+    parts.extend(f"- {line}" for line in INSTRUCTIONS)
+    if examples:
+        parts.extend(["", "EJEMPLOS (few-shot):"])
+        for number, index in enumerate(examples, 1):
+            nl, sql = EXAMPLES[index]
+            parts.extend(["", f'{number}. NL: "{nl}"', f"SQL: {sql}"])
+    parts.extend(["", FOOTER, ""])
+    return "\n".join(parts)
+
+
+def question_suffix(question: str) -> str:
+    return f"\nNL: {question}\nSQL:"
+
+
+# Prompt completo (todas las tablas y ejemplos)
+SYSTEM_PROMPT = render_prompt(ALL_TABLES, ALL_EXAMPLES)
+
+
+class BuiltPrompt:
+    """Prompt armado para una pregunta, con lo que se eligió"""
+
+    __slots__ = ("text", "tables", "examples", "tokens", "over_budget")
+
+    def __init__(self, text: str, tables: Tuple[str, ...], examples: Tuple[int, ...], over_budget: bool):
+        self.text = text
+        self.tables = tables
+        self.examples = examples
+        self.tokens = estimate_tokens(text)
+        # True si ni el schema + instrucciones entran en el presupuesto
+        self.over_budget = over_budget
+
+
+class PromptBuilder:
+    """
+    Arma el prompt NL→SQL con las tablas y ejemplos relevantes a la pregunta.
+
+    - Tablas: las que matchean palabras clave o entidades del dataset; si hay
+      más de una se agrega trucks (la tabla que las une). Si ninguna matchea,
+      el schema completo.
+    - Ejemplos: los que solo usan tablas elegidas, por raíces en común con
+      la pregunta (después por tablas en común), hasta max_examples.
+    - Presupuesto: se agregan ejemplos mientras el prompt completo (con la
+      pregunta) entre en max_tokens; schema e instrucciones van siempre.
+    """
+
+    def __init__(self, max_tokens: int = 700, max_examples: int = 3, cache_size: int = 1024):
+        """
+        Args:
+            max_tokens: Presupuesto del prompt completo (tokens estimados)
+            max_examples: Ejemplos few-shot como máximo
+            cache_size: Preguntas normalizadas con su selección cacheada
+        """
+        self.max_tokens = max_tokens
+        self.max_examples = max_examples
+        self._plan = lru_cache(maxsize=cache_size)(self._plan_uncached)
+
+    def select_tables(self, question: str) -> Tuple[str, ...]:
+        """Tablas relevantes para la pregunta, en orden canónico"""
+        text = normalize_question(question)
+        words = frozenset(text.split())
+        selected = {
+            table for table, keywords in TABLE_KEYWORDS.items()
+            if any(_matches(keyword, text, words) for keyword in keywords)
+        }
+        if "alerts" not in selected and any(_matches(m, text, words) for m in TELEMETRY_MEASURES):
+            selected.add("telemetry")
+        if not selected:
+            return ALL_TABLES
+        if len(selected) > 1:
+            selected.add(HUB_TABLE)
+        return tuple(table for table in ALL_TABLES if table in selected)
+
+    def rank_examples(self, question: str, tables: Sequence[str]) -> List[int]:
+        """Ejemplos que solo usan `tables`, del más al menos parecido a la pregunta"""
+        available = frozenset(tables)
+        stems = _stems(normalize_question(question))
+        scored = []
+        for index in ALL_EXAMPLES:
+            example_tables, example_stems = _example_info(index)
+            if not example_tables <= available:
+                continue
+            scored.append((-len(stems & example_stems), -len(example_tables), index))
+        return [index for _, _, index in sorted(scored)]
+
+    def _plan_uncached(self, normalized: str, question_tokens: int) -> Tuple[Tuple[str, ...], Tuple[int, ...], bool]:
+        tables = self.select_tables(normalized)
+        examples: Tuple[int, ...] = ()
+        over_budget = estimate_tokens(render_prompt(tables, examples)) + question_tokens > self.max_tokens
+        if not over_budget:
+            for index in self.rank_examples(normalized, tables)[:self.max_examples]:
+                candidate = examples + (index,)
+                if estimate_tokens(render_prompt(tables, candidate)) + question_tokens <= self.max_tokens:
+                    examples = candidate
+        return tables, examples, over_budget
+
+    def build(self, question: str) -> BuiltPrompt:
+        """Prompt para una pregunta (la selección se cachea por pregunta normalizada)"""
+        suffix = question_suffix(question)
+        tables, examples, over_budget = self._plan(normalize_question(question), estimate_tokens(suffix))
+        return BuiltPrompt(render_prompt(tables, examples) + suffix, tables, examples, over_budget)
+
+    def stats(self) -> dict:
+        """Contadores de los caches de selección y de fragmentos"""
+        plans = self._plan.cache_info()
+        fragments = render_prompt.cache_info()
+        return {
+            "plans": {"entries": plans.currsize, "hits": plans.hits, "misses": plans.misses},
+            "fragments": {"entries": fragments.currsize, "hits": fragments.hits, "misses": fragments.misses},
+            "max_tokens": self.max_tokens,
+            "max_examples": self.max_examples,
+            "full_prompt_tokens": estimate_tokens(SYSTEM_PROMPT)
+        }
@@ -0,0 +1,144 @@
+"""
+Presupuestos de ejecución por consulta.
+Usa el progress handler de SQLite para cortar consultas que superan un
+tiempo de pared o un número de instrucciones de la VM, y permite
+cancelarlas cooperativamente desde otro thread.
+"""
+
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, Optional
+
+
+class QueryBudgetExceeded(Exception):
+    """Excepción cuando una consulta agota su presupuesto o es cancelada"""
+
+    def __init__(self, reason: str, elapsed_s: float, steps: int):
+        super().__init__(
+            f"Presupuesto de ejecución excedido: {reason} "
+            f"({elapsed_s:.2f}s, ~{steps} pasos de VM)"
+        )
+        self.reason = reason
+        self.elapsed_s = elapsed_s
+        self.steps = steps
+
+
+class QueryBudget:
+    """
+    Presupuesto de una consulta (puede abarcar varias llamadas, ej: streaming).
+
+    Solo cuenta el tiempo pasado dentro de `guard()`, es decir, trabajando
+    en SQLite; la espera de un cliente lento no consume presupuesto.
+    """
+
+    def __init__(self, max_seconds: float, max_steps: int, granularity: int = 10000):
+        """
+        Args:
+            max_seconds: Tiempo máximo de ejecución en SQLite (0 = sin límite)
+            max_steps: Máximo de instrucciones de la VM (0 = sin límite)
+            granularity: Cada cuántas instrucciones se invoca el progress handler
+        """
+        self.max_seconds = max_seconds
+        self.max_steps = max_steps
+        self.granularity = granularity
+
+        self.steps = 0
+        self.elapsed_s = 0.0
+        self.reason: Optional[str] = None
+        self._started: Optional[float] = None
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Pide cancelar la consulta en curso (seguro desde cualquier thread)"""
+        self._cancelled.set()
+
+    def _current_elapsed(self) -> float:
+        if self._started is None:
+            return self.elapsed_s
+        return self.elapsed_s + (time.monotonic() - self._started)
+
+    def _progress(self) -> int:
+        """Progress handler: un valor distinto de 0 interrumpe la consulta"""
+        self.steps += self.granularity
+
+        if self._cancelled.is_set():
+            self.reason = "consulta cancelada"
+        elif self.max_steps and self.steps > self.max_steps:
+            self.reason = f"más de {self.max_steps} pasos de VM"
+        elif self.max_seconds and self._current_elapsed() > self.max_seconds:
+            self.reason = f"más de {self.max_seconds}s de ejecución"
+        else:
+            return 0
+        return 1
+
+    def exceeded(self) -> QueryBudgetExceeded:
+        return QueryBudgetExceeded(self.reason or "consulta interrumpida", self._current_elapsed(), self.steps)
+
+    @contextmanager
+    def guard(self, conn: sqlite3.Connection) -> Iterator[None]:
+        """
+        Aplica el presupuesto a las operaciones hechas sobre `conn` dentro del bloque.
+
+        Raises:
+            QueryBudgetExceeded: Si SQLite fue interrumpido por el presupuesto
+        """
+        if self._cancelled.is_set():
+            self.reason = "consulta cancelada"
+            raise self.exceeded()
+
+        self._started = time.monotonic()
+        conn.set_progress_handler(self._progress, self.granularity)
+        try:
+            yield
+        except sqlite3.OperationalError as e:
+            if self.reason is not None:
+                raise self.exceeded() from e
+            raise
+        finally:
+            conn.set_progress_handler(None, self.granularity)
+            self.elapsed_s = self._current_elapsed()
+            self._started = None
+
+    @contextmanager
+    def watch(self, interrupt: Callable[[], None], poll_s: float = 0.05) -> Iterator[None]:
+        """
+        Variante de `guard()` para motores sin progress handler (ej: DuckDB):
+        un thread vigila el tiempo y la cancelación y llama a `interrupt()`.
+        No cuenta pasos de VM.
+
+        Raises:
+            QueryBudgetExceeded: Si la consulta se interrumpió por el presupuesto
+        """
+        if self._cancelled.is_set():
+            self.reason = "consulta cancelada"
+            raise self.exceeded()
+
+        done = threading.Event()
+
+        def watcher():
+            while not done.wait(poll_s):
+                if self._cancelled.is_set():
+                    self.reason = "consulta cancelada"
+                elif self.max_seconds and self._current_elapsed() > self.max_seconds:
+                    self.reason = f"más de {self.max_seconds}s de ejecución"
+                else:
+                    continue
+                interrupt()
+                return
+
+        self._started = time.monotonic()
+        thread = threading.Thread(target=watcher, name="query-budget-watch", daemon=True)
+        thread.start()
+        try:
+            yield
+        except Exception as e:
+            if self.reason is not None:
+                raise self.exceeded() from e
+            raise
+        finally:
+            done.set()
+            thread.join()
+            self.elapsed_s = self._current_elapsed()
+            self._started = None
@@ -0,0 +1,338 @@
+"""
+Inspección de planes de ejecución (EXPLAIN QUERY PLAN) antes de ejecutar.
+Estima el costo de un SQL validado a partir del plan de SQLite y de las
+estadísticas de las tablas (sqlite_stat1 si existe, si no MAX(rowid)),
+para rechazar consultas demasiado costosas y advertir sobre las pesadas.
+"""
+
+import math
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from backend.lib.partitions import parent_table
+from backend.lib.validate_sql import normalize_sql
+
+
+# Tablas de hechos: un full scan sobre ellas (o sobre sus particiones) crece con el volumen de datos
+LARGE_TABLES = ("telemetry", "alerts")
+
+# Filas asumidas por búsqueda de igualdad en un índice sin estadísticas
+DEFAULT_EQ_ROWS = 10
+
+# Palabras que pueden seguir a una tabla en FROM/JOIN y no son alias
+_NOT_ALIASES = {
+    "where", "join", "inner", "left", "right", "full", "cross", "outer", "natural",
+    "on", "using", "group", "order", "limit", "having", "union", "except",
+    "intersect", "window", "as", "select", "from"
+}
+
+_SOURCE_PATTERN = re.compile(
+    r"(?:\bFROM|\bJOIN|,)\s+([A-Za-z_]\w*)(?:\s+(?:AS\s+)?([A-Za-z_]\w*))?",
+    re.IGNORECASE
+)
+_LOOP_PATTERN = re.compile(r"^(SCAN|SEARCH) (\S+)(?: USING (.*))?$")
+_INDEX_PATTERN = re.compile(r"INDEX(?: (\w+))?(?: \((.*)\))?")
+
+
+class QueryTooExpensive(Exception):
+    """Excepción cuando el plan estimado supera el costo máximo permitido"""
+
+    def __init__(self, estimate: "PlanEstimate", max_cost: float):
+        reasons = "; ".join(estimate.findings()) or "plan costoso"
+        super().__init__(
+            f"Consulta demasiado costosa: ~{estimate.cost:,.0f} filas a recorrer "
+            f"(máximo {max_cost:,.0f}). {reasons}"
+        )
+        self.estimate = estimate
+        self.max_cost = max_cost
+
+
+class PlanEstimate:
+    """Resultado de inspeccionar un plan: costo estimado + hallazgos"""
+
+    __slots__ = ("cost", "full_scans", "nested_scans", "temp_btrees", "details")
+
+    def __init__(self):
+        self.cost = 0.0
+        # (tabla, filas estimadas) de los full scans sobre LARGE_TABLES
+        self.full_scans: List[Tuple[str, int]] = []
+        # Tablas recorridas completas dentro de otro loop
+        self.nested_scans: List[str] = []
+        # Motivo de cada B-tree temporal (ORDER BY, GROUP BY, DISTINCT...)
+        self.temp_btrees: List[str] = []
+        # Líneas del plan, tal como las reporta SQLite
+        self.details: List[str] = []
+
+    def findings(self) -> List[str]:
+        """Descripción legible de lo que encarece el plan"""
+        findings = [f"full scan de {table} (~{rows:,} filas)" for table, rows in self.full_scans]
+        findings += [f"scan anidado de {table}" for table in self.nested_scans]
+        findings += [f"B-tree temporal para {purpose}" for purpose in self.temp_btrees]
+        return findings
+
+    def to_dict(self) -> dict:
+        return {
+            "cost": round(self.cost),
+            "findings": self.findings(),
+            "plan": list(self.details)
+        }
+
+
+def _source_aliases(sql: str) -> Dict[str, str]:
+    """Alias (o nombre) usado en el plan → tabla, desde los FROM/JOIN del SQL"""
+    aliases = {}
+    for match in _SOURCE_PATTERN.finditer(sql):
+        table = match.group(1).lower()
+        alias = (match.group(2) or "").lower()
+        aliases.setdefault(table, table)
+        if alias and alias not in _NOT_ALIASES:
+            aliases[alias] = table
+    return aliases
+
+
+def load_table_stats(conn: sqlite3.Connection) -> Tuple[Dict[str, int], Dict[str, List[int]]]:
+    """
+    Estadísticas para el modelo de costo.
+
+    Returns:
+        (filas por tabla, stat de sqlite_stat1 por índice: [filas, filas por prefijo...])
+    """
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    )]
+
+    index_stats: Dict[str, List[int]] = {}
+    table_rows: Dict[str, int] = {}
+    has_stat1 = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'sqlite_stat1'"
+    ).fetchone()
+    if has_stat1:
+        for table, index, stat in conn.execute("SELECT tbl, idx, stat FROM sqlite_stat1"):
+            numbers = [int(n) for n in stat.split() if n.isdigit()]
+            if not numbers:
+                continue
+            table_rows[table.lower()] = numbers[0]
+            if index:
+                index_stats[index.lower()] = numbers
+
+    for table in tables:
+        if table.lower() in table_rows:
+            continue
+        # MAX(rowid) se resuelve con el B-tree, sin recorrer la tabla
+        try:
+            rows = conn.execute(f'SELECT MAX(rowid) FROM "{table}"').fetchone()[0]
+        except sqlite3.OperationalError:
+            rows = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        table_rows[table.lower()] = rows or 0
+
+    return table_rows, index_stats
+
+
+class _PlanCostModel:
+    """Recorre el árbol de EXPLAIN QUERY PLAN acumulando el costo estimado"""
+
+    def __init__(self, sql: str, plan_rows: List[tuple], table_rows: Dict[str, int],
+                 index_stats: Dict[str, List[int]]):
+        self.aliases = _source_aliases(sql)
+        self.table_rows = table_rows
+        self.index_stats = index_stats
+        # Filas de salida estimadas de subconsultas materializadas / co-rutinas
+        self.subquery_rows: Dict[str, float] = {}
+        self.children: Dict[int, List[Tuple[int, str]]] = {}
+        for node_id, parent, _, detail in plan_rows:
+            self.children.setdefault(parent, []).append((node_id, detail))
+
+        self.estimate = PlanEstimate()
+        self.estimate.details = [detail for _, _, _, detail in plan_rows]
+
+    def run(self) -> PlanEstimate:
+        self.estimate.cost, _ = self._level(0)
+        return self.estimate
+
+    def _source_rows(self, name: str) -> Tuple[Optional[str], float]:
+        """(tabla base o None, filas estimadas) de una fuente del plan"""
+        name = name.lower()
+        if name in self.subquery_rows:
+            return None, self.subquery_rows[name]
+        table = self.aliases.get(name, name)
+        if table in self.subquery_rows:
+            # Vista (ej: telemetry sobre sus particiones) recorrida con un alias
+            return None, self.subquery_rows[table]
+        return table, float(self.table_rows.get(table, DEFAULT_EQ_ROWS))
+
+    def _search_rows(self, table_rows: float, using: str) -> float:
+        """Filas visitadas por un SEARCH según el índice y las restricciones"""
+        if "PRIMARY KEY" in using:
+            return 1.0
+
+        match = _INDEX_PATTERN.search(using)
+        constraints = (match.group(2) or "") if match else ""
+        equalities = constraints.count("=?") - constraints.count(">=?") - constraints.count("<=?")
+        has_range = any(op in constraints for op in (">?", "<?", ">=?", "<=?"))
+
+        rows = table_rows
+        if equalities > 0 and match:
+            # Los índices automáticos no tienen nombre ni estadísticas
+            index = (match.group(1) or "").lower()
+            stat = self.index_stats.get(index)
+            if stat and len(stat) > equalities:
+                rows = float(stat[equalities])
+            elif index.startswith("sqlite_autoindex_"):
+                rows = 1.0
+            else:
+                rows = min(table_rows, DEFAULT_EQ_ROWS)
+        if has_range:
+            # Misma heurística que el planner de SQLite sin estadísticas
+            rows /= 4
+        return max(rows, 1.0)
+
+    def _level(self, node_id: int) -> Tuple[float, float]:
+        """(costo, filas producidas) de un nivel del plan"""
+        cost = 0.0
+        loop_rows = 1.0
+        loops = 0
+
+        for child_id, detail in self.children.get(node_id, []):
+            loop = _LOOP_PATTERN.match(detail)
+            if loop:
+                kind, name, using = loop.group(1), loop.group(2), loop.group(3) or ""
+                table, rows = self._source_rows(name)
+
+                if "AUTOMATIC" in using:
+                    # SQLite construye el índice recorriendo la tabla una vez
+                    cost += rows
+                if kind == "SEARCH":
+                    rows = self._search_rows(rows, using)
+                else:
+                    if table is not None and parent_table(table) in LARGE_TABLES:
+                        self.estimate.full_scans.append((table, int(rows)))
+                    if loops and table is not None:
+                        self.estimate.nested_scans.append(table)
+
+                loops += 1
+                loop_rows *= rows
+                cost += loop_rows
+                cost += self._level(child_id)[0]
+
+            elif detail.startswith("USE TEMP B-TREE") or "USING TEMP B-TREE" in detail:
+                purpose = detail.split(" FOR ", 1)[-1] if " FOR " in detail else "UNION"
+                self.estimate.temp_btrees.append(purpose)
+                cost += loop_rows * math.log2(max(loop_rows, 2.0))
+                cost += self._level(child_id)[0]
+
+            elif detail.startswith(("MATERIALIZE", "CO-ROUTINE")):
+                sub_cost, sub_rows = self._level(child_id)
+                self.subquery_rows[detail.split(" ", 1)[-1].lower()] = sub_rows
+                cost += sub_cost
+
+            elif detail.startswith("CORRELATED"):
+                # Se re-evalúa por cada fila del loop externo
+                cost += loop_rows * self._level(child_id)[0]
+
+            else:
+                # Subconsultas no correlacionadas, partes de un UNION, etc.
+                sub_cost, sub_rows = self._level(child_id)
+                cost += sub_cost
+                if not loops:
+                    loop_rows = max(loop_rows, sub_rows)
+
+        return cost, loop_rows
+
+
+def estimate_plan_cost(conn: sqlite3.Connection, sql: str,
+                       stats: Optional[Tuple[Dict[str, int], Dict[str, List[int]]]] = None) -> PlanEstimate:
+    """Ejecuta EXPLAIN QUERY PLAN y estima el costo del SQL (no lo ejecuta)"""
+    table_rows, index_stats = stats or load_table_stats(conn)
+    plan_rows = conn.execute(f"EXPLAIN QUERY PLAN {sql.strip().rstrip(';')}").fetchall()
+    return _PlanCostModel(sql, plan_rows, table_rows, index_stats).run()
+
+
+class QueryPlanGate:
+    """
+    Compuerta de costo entre la validación y la ejecución.
+    Los planes y las estadísticas se cachean por versión de dataset, así
+    que repetir una consulta no vuelve a pasar por EXPLAIN. Thread-safe.
+    """
+
+    def __init__(self, max_cost: float, warn_cost: float, max_entries: int = 512):
+        """
+        Args:
+            max_cost: Costo estimado (filas a recorrer) desde el que se rechaza (0 = sin límite)
+            warn_cost: Costo desde el que se reportan advertencias (0 = nunca)
+            max_entries: Planes cacheados como máximo (LRU)
+        """
+        self.max_cost = max_cost
+        self.warn_cost = warn_cost
+        self.max_entries = max_entries
+
+        self._plans: "OrderedDict[Tuple[int, str], PlanEstimate]" = OrderedDict()
+        self._stats: Dict[int, Tuple[Dict[str, int], Dict[str, List[int]]]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.rejected = 0
+
+    def inspect(self, conn: sqlite3.Connection, sql: str, dataset_version: int) -> PlanEstimate:
+        """Estimación del plan (desde el cache si ya se inspeccionó)"""
+        key = (dataset_version, normalize_sql(sql))
+        with self._lock:
+            estimate = self._plans.get(key)
+            if estimate is not None:
+                self._plans.move_to_end(key)
+                self.hits += 1
+                return estimate
+            self.misses += 1
+            stats = self._stats.get(dataset_version)
+
+        if stats is None:
+            stats = load_table_stats(conn)
+        estimate = estimate_plan_cost(conn, sql, stats)
+
+        with self._lock:
+            if dataset_version not in self._stats:
+                # Una recarga cambia volúmenes e índices: se descarta lo anterior
+                self._stats = {dataset_version: stats}
+                stale = [k for k in self._plans if k[0] != dataset_version]
+                for k in stale:
+                    del self._plans[k]
+            self._plans[key] = estimate
+            while len(self._plans) > self.max_entries:
+                self._plans.popitem(last=False)
+        return estimate
+
+    def check(self, conn: sqlite3.Connection, sql: str, dataset_version: int) -> PlanEstimate:
+        """
+        Inspecciona el plan y rechaza el SQL si supera el costo máximo.
+
+        Raises:
+            QueryTooExpensive: Si el costo estimado supera max_cost
+        """
+        estimate = self.inspect(conn, sql, dataset_version)
+        if self.max_cost and estimate.cost > self.max_cost:
+            with self._lock:
+                self.rejected += 1
+            raise QueryTooExpensive(estimate, self.max_cost)
+        return estimate
+
+    def warnings(self, estimate: PlanEstimate) -> List[str]:
+        """Advertencias para el cliente si el plan es pesado (pero permitido)"""
+        if not self.warn_cost or estimate.cost <= self.warn_cost:
+            return []
+        return [f"Consulta costosa (~{estimate.cost:,.0f} filas a recorrer)"] + estimate.findings()
+
+    def stats(self) -> dict:
+        """Contadores expuestos en /cache/stats"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._plans),
+                "hits": self.hits,
+                "misses": self.misses,
+                "rejected": self.rejected,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "max_cost": self.max_cost,
+                "warn_cost": self.warn_cost
+            }
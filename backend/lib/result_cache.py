@@ -0,0 +1,182 @@
+"""
+Cache de resultados SQL versionado por dataset.
+La clave es el SQL validado y normalizado más la versión del dataset
+(PRAGMA user_version, incrementada por scripts/load_data.py en cada carga),
+por lo que una recarga invalida automáticamente todas las entradas.
+"""
+
+import hashlib
+import marshal
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Sequence as SequenceABC
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from backend.lib.validate_sql import normalize_sql
+
+
+class DictRowsView(SequenceABC):
+    """
+    Vista de solo lectura que presenta filas compactas como dicts.
+    Los dicts se construyen al acceder, así quien solo mira unas pocas
+    filas (ej: la explicación) no paga la conversión del resultado completo.
+    """
+
+    def __init__(self, columns: Sequence[str], rows: Sequence[tuple]):
+        self._columns = tuple(columns)
+        self._rows = rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [dict(zip(self._columns, row)) for row in self._rows[index]]
+        return dict(zip(self._columns, self._rows[index]))
+
+
+class CachedResult:
+    """Resultado compacto: nombres de columnas + filas como tuplas"""
+
+    __slots__ = ("columns", "rows", "created_at", "partial", "_fingerprint")
+
+    def __init__(self, columns: Sequence[str], rows: Sequence[tuple], partial: bool = False):
+        self.columns = tuple(columns)
+        self.rows = tuple(rows)
+        self.created_at = time.monotonic()
+        # True si la consulta se cortó por presupuesto (nunca se cachea)
+        self.partial = partial
+        self._fingerprint: Optional[str] = None
+
+    @property
+    def fingerprint(self) -> str:
+        """
+        Hash del contenido (columnas, filas, parcial). Se calcula una vez por
+        resultado: las entradas del cache lo reutilizan entre requests.
+        """
+        if self._fingerprint is None:
+            content = (self.columns, self.rows, self.partial)
+            try:
+                # Valores de SQLite (int, float, str, bytes, None): marshal es ~5x más rápido
+                # que repr. La versión 2 no escribe referencias: mismo contenido, mismos bytes
+                data = marshal.dumps(content, 2)
+            except ValueError:
+                # Tipos que marshal no serializa (ej: datetime o Decimal de DuckDB)
+                data = repr(content).encode("utf-8")
+            self._fingerprint = hashlib.blake2b(data, digest_size=16).hexdigest()
+        return self._fingerprint
+
+    @property
+    def cells(self) -> int:
+        """Tamaño aproximado del resultado (celdas)"""
+        return len(self.rows) * max(1, len(self.columns))
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Convierte a la lista de dicts que espera QueryResponse"""
+        columns = self.columns
+        return [dict(zip(columns, row)) for row in self.rows]
+
+    def dict_view(self) -> DictRowsView:
+        """Filas como dicts construidos bajo demanda"""
+        return DictRowsView(self.columns, self.rows)
+
+    def to_column_arrays(self) -> List[list]:
+        """Un array por columna, en el orden de `columns`"""
+        if not self.rows:
+            return [[] for _ in self.columns]
+        return [list(values) for values in zip(*self.rows)]
+
+
+class ResultCache:
+    """
+    Cache LRU con TTL y tamaño acotado (entradas y celdas totales).
+    Thread-safe: se usa desde los workers del pool DB.
+    """
+
+    def __init__(self, max_entries: int = 256, max_cells: int = 2_000_000, ttl_s: float = 300.0):
+        self.max_entries = max_entries
+        self.max_cells = max_cells
+        self.ttl_s = ttl_s
+
+        self._entries: "OrderedDict[Tuple[int, str], CachedResult]" = OrderedDict()
+        self._cells = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(sql: str, dataset_version: int) -> Tuple[int, str]:
+        return (dataset_version, normalize_sql(sql))
+
+    def get(self, sql: str, dataset_version: int) -> Optional[CachedResult]:
+        """Retorna el resultado cacheado o None (cuenta hit/miss)"""
+        key = self.make_key(sql, dataset_version)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry.created_at > self.ttl_s:
+                self._remove(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, sql: str, dataset_version: int, columns: Sequence[str], rows: Sequence[tuple]) -> CachedResult:
+        """Guarda un resultado y retorna la entrada creada"""
+        entry = CachedResult(columns, rows)
+        if entry.cells > self.max_cells:
+            # Demasiado grande para cachear; se retorna sin guardar
+            return entry
+
+        key = self.make_key(sql, dataset_version)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = entry
+            self._cells += entry.cells
+
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._cells > self.max_cells
+            ):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+            # Entradas de versiones anteriores ya no pueden acertar
+            stale = [k for k in self._entries if k[0] != dataset_version]
+            for k in stale:
+                self._remove(k)
+                self.evictions += 1
+
+        return entry
+
+    def _remove(self, key: Tuple[int, str]):
+        entry = self._entries.pop(key)
+        self._cells -= entry.cells
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._cells = 0
+
+    def stats(self) -> dict:
+        """Contadores expuestos en /cache/stats"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "cells": self._cells,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "max_entries": self.max_entries,
+                "max_cells": self.max_cells,
+                "ttl_s": self.ttl_s
+            }
@@ -0,0 +1,408 @@
+"""
+Tablas rollup diarias (por camión y día) para los KPIs de flota.
+Define las tablas (usadas por scripts/load_data.py para mantenerlas) y
+reescribe agregaciones sobre telemetry/alerts/trips para leerlas desde
+los rollups cuando cubren las mismas filas que la tabla cruda. Conteos,
+MIN y MAX son idénticos; SUM y AVG de columnas REAL pueden diferir en los
+últimos bits porque la suma se hace en otro orden (por día y después total).
+"""
+
+import re
+from datetime import date, timedelta
+from typing import Collection, Dict, FrozenSet, Iterable, List, Optional, Sequence, Set, Tuple
+
+
+class RollupSpec:
+    """Rollup diario de una tabla de hechos"""
+
+    def __init__(self, table: str, source: str, time_column: str, dimensions: Sequence[str],
+                 count_column: str, metrics: Dict[str, str], source_columns: Sequence[str]):
+        """
+        Args:
+            table: Nombre de la tabla rollup
+            source: Tabla de hechos agregada
+            time_column: Columna cuya fecha (YYYY-MM-DD) define el día
+            dimensions: Columnas de agrupación además del día (incluye truck_id)
+            count_column: Columna con la cantidad de filas agregadas
+            metrics: Columna numérica de origen → prefijo de sus agregados
+                     (<prefijo>_n, _sum, _min, _max, _avg)
+            source_columns: Todas las columnas de la tabla de hechos
+        """
+        self.table = table
+        self.source = source
+        self.time_column = time_column
+        self.dimensions = tuple(dimensions)
+        self.count_column = count_column
+        self.metrics = dict(metrics)
+        self.source_columns = frozenset(source_columns)
+
+    def create_sql(self) -> str:
+        columns = ["day TEXT NOT NULL"]
+        columns += [f"{d} TEXT" for d in self.dimensions]
+        columns.append(f"{self.count_column} INTEGER NOT NULL")
+        for prefix in self.metrics.values():
+            columns.append(f"{prefix}_n INTEGER")
+            columns += [f"{prefix}_{agg} REAL" for agg in ("sum", "min", "max", "avg")]
+        key = ", ".join(("day",) + self.dimensions)
+        return f"CREATE TABLE IF NOT EXISTS {self.table} ({', '.join(columns)}, PRIMARY KEY ({key}))"
+
+    def refresh_sql(self, full: bool = False) -> str:
+        """INSERT ... SELECT que agrega un rango de días (o toda la tabla si full)"""
+        dims = ", ".join(self.dimensions)
+        aggregates = ["COUNT(*)"]
+        for column in self.metrics:
+            aggregates += [f"COUNT({column})", f"SUM({column})", f"MIN({column})",
+                           f"MAX({column})", f"AVG({column})"]
+        where = (f"{self.time_column} IS NOT NULL" if full
+                 else f"{self.time_column} >= ? AND {self.time_column} < ?")
+        return (
+            f"INSERT INTO {self.table} "
+            f"SELECT substr({self.time_column}, 1, 10) AS day, {dims}, {', '.join(aggregates)} "
+            f"FROM {self.source} WHERE {where} GROUP BY day, {dims}"
+        )
+
+
+ROLLUPS = {
+    "telemetry": RollupSpec(
+        "rollup_telemetry_daily", "telemetry", "timestamp",
+        dimensions=("truck_id",),
+        count_column="sample_count",
+        metrics={"fuel_level": "fuel", "speed_kmh": "speed", "engine_temp_c": "engine_temp"},
+        source_columns=("telemetry_id", "truck_id", "timestamp", "speed_kmh", "fuel_level", "engine_temp_c",
+                        "timestamp_epoch"),
+    ),
+    "alerts": RollupSpec(
+        "rollup_alerts_daily", "alerts", "timestamp",
+        dimensions=("truck_id", "alert_type", "severity"),
+        count_column="alert_count",
+        metrics={},
+        source_columns=("alert_id", "truck_id", "timestamp", "alert_type", "severity", "description",
+                        "timestamp_epoch"),
+    ),
+    "trips": RollupSpec(
+        "rollup_trips_daily", "trips", "start_time",
+        dimensions=("truck_id", "status"),
+        count_column="trip_count",
+        metrics={"distance_km": "distance"},
+        source_columns=("trip_id", "truck_id", "origin", "destination", "start_time", "end_time",
+                        "distance_km", "status", "start_time_epoch", "end_time_epoch"),
+    ),
+}
+
+ROLLUP_TABLES = {spec.table for spec in ROLLUPS.values()}
+
+# Tablas de dimensión que se pueden unir a un rollup (columnas conocidas)
+DIMENSION_COLUMNS = {
+    "trucks": {"truck_id", "plate", "model", "brand", "driver_id", "region", "status"},
+    "drivers": {"driver_id", "name", "license"},
+}
+
+
+def day_ranges(days: Iterable[str]) -> List[Tuple[str, str]]:
+    """'2025-10-21' → ('2025-10-21', '2025-10-22'): límites para filtrar por rango"""
+    ranges = []
+    for day in sorted(set(days)):
+        try:
+            next_day = (date.fromisoformat(day) + timedelta(days=1)).isoformat()
+        except (TypeError, ValueError):
+            continue
+        ranges.append((day, next_day))
+    return ranges
+
+
+def refresh_rollup(conn, spec: RollupSpec, days: Optional[Set[str]]) -> int:
+    """
+    Recalcula el rollup para los días indicados (None = reconstrucción completa).
+
+    Returns:
+        Cantidad de días recalculados (-1 si fue completa)
+    """
+    conn.execute(spec.create_sql())
+    if days is None:
+        conn.execute(f"DELETE FROM {spec.table}")
+        conn.execute(spec.refresh_sql(full=True))
+        return -1
+
+    ranges = day_ranges(days)
+    conn.executemany(f"DELETE FROM {spec.table} WHERE day = ?", [(day,) for day, _ in ranges])
+    conn.executemany(spec.refresh_sql(), ranges)
+    return len(ranges)
+
+
+def complete_rollup_sources(conn) -> FrozenSet[str]:
+    """
+    Tablas de hechos sin filas con la columna de tiempo NULL: su rollup cubre
+    todas las filas (las de tiempo NULL no tienen día y quedan afuera).
+    """
+    return frozenset(
+        source for source, spec in ROLLUPS.items()
+        if not conn.execute(
+            f"SELECT EXISTS (SELECT 1 FROM {spec.source} WHERE {spec.time_column} IS NULL)"
+        ).fetchone()[0]
+    )
+
+
+# ----------------------------------------------------------------------------
+# Reescritura de consultas
+# ----------------------------------------------------------------------------
+
+class _NoRewrite(Exception):
+    """La consulta no se puede responder desde un rollup con el mismo resultado"""
+    pass
+
+
+_QUERY_PATTERN = re.compile(
+    r"^\s*SELECT\s+(?P<select>.+?)\s+FROM\s+(?P<from>.+?)"
+    r"(?:\s+WHERE\s+(?P<where>.+?))?"
+    r"(?:\s+GROUP\s+BY\s+(?P<group>.+?))?"
+    r"(?:\s+ORDER\s+BY\s+(?P<order>.+?))?"
+    r"(?:\s+LIMIT\s+(?P<limit>\d+))?\s*;?\s*$",
+    re.IGNORECASE | re.DOTALL
+)
+_UNSUPPORTED = re.compile(
+    r"\b(DISTINCT|HAVING|UNION|INTERSECT|EXCEPT|OVER|WINDOW|BETWEEN|OR|OFFSET|CASE|LEFT|RIGHT|"
+    r"FULL|CROSS|NATURAL|USING)\b|\(\s*SELECT\b",
+    re.IGNORECASE
+)
+_SOURCE = re.compile(r"^(\w+)(?:\s+(?:AS\s+)?(\w+))?(?:\s+ON\s+(.+))?$", re.IGNORECASE | re.DOTALL)
+_TOKEN = re.compile(
+    r"(?P<agg>\b(?P<func>COUNT|SUM|AVG|MIN|MAX)\s*\(\s*(?P<arg>\*|(?:\w+\.)?\w+)\s*\))"
+    r"|(?P<date>\bdate\s*\(\s*(?P<date_arg>(?:\w+\.)?\w+)\s*\))"
+    r"|(?P<ref>\b(?:\w+\.)?\w+\b(?!\s*\())",
+    re.IGNORECASE
+)
+_TIME_BOUND = re.compile(
+    r"^(?P<lhs>date\s*\(\s*(?:\w+\.)?\w+\s*\)|(?:\w+\.)?\w+)\s*(?P<op>>=|<=|>|<|=)\s*(?P<rhs>.+)$",
+    re.IGNORECASE | re.DOTALL
+)
+_DATE_CALL = re.compile(r"^date\s*\((?:[^()]|\([^()]*\))*\)$", re.IGNORECASE)
+_DAY_LITERAL = re.compile(r"^'\d{4}-\d{2}-\d{2}'$")
+_ALIASED = re.compile(r"^.*[\w)\"]\s+(?:AS\s+)?(?:\w+|\"[^\"]+\")$", re.IGNORECASE | re.DOTALL)
+
+
+def mask_strings(sql: str) -> Tuple[str, List[str]]:
+    """Reemplaza literales '...' por marcadores para que no se analicen como SQL"""
+    literals: List[str] = []
+
+    def keep(match):
+        literals.append(match.group(0))
+        return f"\x00{len(literals) - 1}\x00"
+
+    return re.sub(r"'(?:[^']|'')*'", keep, sql), literals
+
+
+def unmask(text: str, literals: List[str]) -> str:
+    return re.sub(r"\x00(\d+)\x00", lambda m: literals[int(m.group(1))], text)
+
+
+def split_top_level(text: str, separator: str) -> List[str]:
+    """Divide por `separator` (regex) fuera de paréntesis"""
+    parts, depth, start = [], 0, 0
+    for match in re.finditer(rf"\(|\)|{separator}", text, re.IGNORECASE):
+        token = match.group(0)
+        if token == "(":
+            depth += 1
+        elif token == ")":
+            depth -= 1
+        elif depth == 0:
+            parts.append(text[start:match.start()])
+            start = match.end()
+    parts.append(text[start:])
+    return [p.strip() for p in parts]
+
+
+class _RollupRewriter:
+    """Reescribe una agregación sobre una tabla de hechos para leer su rollup"""
+
+    def __init__(self, masked_sql: str, literals: List[str], complete_sources: Collection[str] = ()):
+        self.literals = literals
+        self.complete_sources = complete_sources
+        # True si el WHERE acota la columna de tiempo (la tabla cruda tampoco ve los NULL)
+        self.time_bounded = False
+        match = _QUERY_PATTERN.match(masked_sql)
+        if not match or _UNSUPPORTED.search(masked_sql):
+            raise _NoRewrite()
+        self.clauses = match.groupdict()
+
+        # Fuentes: una sola tabla de hechos con rollup + dimensiones unidas por igualdad
+        self.sources: Dict[str, str] = {}
+        self.spec: Optional[RollupSpec] = None
+        self.fact_alias = ""
+        self.join_conditions: List[Optional[str]] = []
+        self.source_order: List[Tuple[str, str]] = []
+        for part in split_top_level(self.clauses["from"], r"\b(?:INNER\s+)?JOIN\b"):
+            if "," in part:
+                raise _NoRewrite()
+            source = _SOURCE.match(part)
+            if not source:
+                raise _NoRewrite()
+            table, alias, condition = source.group(1).lower(), source.group(2), source.group(3)
+            alias = (alias or table).lower()
+            if alias in ("on", "where") or alias in self.sources:
+                raise _NoRewrite()
+            if table in ROLLUPS:
+                if self.spec is not None:
+                    raise _NoRewrite()
+                self.spec = ROLLUPS[table]
+                self.fact_alias = alias
+            elif table not in DIMENSION_COLUMNS:
+                raise _NoRewrite()
+            self.sources[alias] = table
+            self.source_order.append((table, alias))
+            self.join_conditions.append(condition)
+        if self.spec is None:
+            raise _NoRewrite()
+        self.aggregates = 0
+
+    # -- resolución de columnas ------------------------------------------------
+
+    def _is_fact_ref(self, ref: str) -> Optional[str]:
+        """Nombre de columna si `ref` apunta a la tabla de hechos, si no None"""
+        qualifier, _, name = ref.rpartition(".")
+        name = name.lower()
+        if qualifier:
+            if qualifier.lower() != self.fact_alias:
+                return None
+            if name not in self.spec.source_columns:
+                raise _NoRewrite()
+            return name
+        if name not in self.spec.source_columns:
+            return None
+        others = [a for a, t in self.sources.items() if a != self.fact_alias and name in DIMENSION_COLUMNS[t]]
+        if others:
+            # Columna ambigua: SQLite decide (o falla); no se arriesga la reescritura
+            raise _NoRewrite()
+        return name
+
+    def _map_token(self, match: re.Match, allow_aggregates: bool) -> str:
+        alias, spec = self.fact_alias, self.spec
+
+        if match.group("agg"):
+            func, arg = match.group("func").upper(), match.group("arg")
+            if not allow_aggregates:
+                raise _NoRewrite()
+            self.aggregates += 1
+            if arg == "*":
+                if func != "COUNT":
+                    raise _NoRewrite()
+                # Sin filas SUM da NULL y COUNT da 0
+                return f"COALESCE(SUM({alias}.{spec.count_column}), 0)"
+            column = self._is_fact_ref(arg)
+            if column not in spec.metrics:
+                # Agregados sobre dimensiones cambian con el grano del rollup
+                raise _NoRewrite()
+            prefix = f"{alias}.{spec.metrics[column]}"
+            return {
+                "COUNT": f"COALESCE(SUM({prefix}_n), 0)",
+                "SUM": f"SUM({prefix}_sum)",
+                "MIN": f"MIN({prefix}_min)",
+                "MAX": f"MAX({prefix}_max)",
+                "AVG": f"(SUM({prefix}_sum) * 1.0 / SUM({prefix}_n))",
+            }[func]
+
+        if match.group("date"):
+            column = self._is_fact_ref(match.group("date_arg"))
+            if column is None:
+                return match.group(0)
+            if column != spec.time_column:
+                raise _NoRewrite()
+            return f"{alias}.day"
+
+        column = self._is_fact_ref(match.group("ref"))
+        if column is None:
+            return match.group(0)
+        if column not in spec.dimensions:
+            raise _NoRewrite()
+        return f"{alias}.{column}"
+
+    def _map(self, text: str, allow_aggregates: bool = False) -> str:
+        return _TOKEN.sub(lambda m: self._map_token(m, allow_aggregates), text)
+
+    def _map_condition(self, condition: str) -> str:
+        """Condición del WHERE; los límites de tiempo deben caer en bordes de día"""
+        bound = _TIME_BOUND.match(condition)
+        if bound:
+            lhs, op, rhs = bound.group("lhs"), bound.group("op"), bound.group("rhs").strip()
+            is_date = lhs.lower().startswith("date")
+            ref = lhs[lhs.index("(") + 1:lhs.rindex(")")].strip() if is_date else lhs
+            if self._is_fact_ref(ref) == self.spec.time_column:
+                literal = unmask(rhs, self.literals)
+                if not (_DATE_CALL.match(literal) or _DAY_LITERAL.match(literal)):
+                    raise _NoRewrite()
+                self.time_bounded = True
+                day = f"{self.fact_alias}.day"
+                rhs = self._map(rhs)
+                if is_date:
+                    return f"{day} {op} {rhs}"
+                # 'YYYY-MM-DDThh:mm:ss' vs 'YYYY-MM-DD': > y >= incluyen el día, < y <= lo excluyen
+                if op in (">", ">="):
+                    return f"{day} >= {rhs}"
+                if op in ("<", "<="):
+                    return f"{day} < {rhs}"
+                raise _NoRewrite()
+        return self._map(condition)
+
+    def _map_select(self, select: str) -> str:
+        """Mapea la lista de columnas conservando los nombres que vería el cliente"""
+        if "*" in re.sub(r"COUNT\s*\(\s*\*\s*\)", "", select, flags=re.IGNORECASE):
+            raise _NoRewrite()
+        items = []
+        for item in split_top_level(select, ","):
+            mapped = self._map(item, allow_aggregates=True)
+            bare_column = re.fullmatch(r"(?:\w+\.)?\w+", item)
+            if mapped != item and not bare_column and not _ALIASED.match(item):
+                # Sin alias SQLite nombra la columna con el texto de la expresión original
+                original = unmask(item, self.literals).replace('"', '""')
+                mapped += f' AS "{original}"'
+            items.append(mapped)
+        return ", ".join(items)
+
+    def rewrite(self) -> str:
+        clauses = self.clauses
+
+        select = self._map_select(clauses["select"])
+        if not self.aggregates and not clauses["group"]:
+            # Sin agregación el rollup no aporta nada
+            raise _NoRewrite()
+
+        sources = []
+        for (table, alias), condition in zip(self.source_order, self.join_conditions):
+            name = self.spec.table if table == self.spec.source else table
+            source = f"{name} {alias}"
+            if condition is not None:
+                source += f" ON {self._map(condition)}"
+            sources.append(source)
+
+        sql = f"SELECT {select} FROM {' JOIN '.join(sources)}"
+        if clauses["where"]:
+            conditions = split_top_level(clauses["where"], r"\bAND\b")
+            sql += " WHERE " + " AND ".join(self._map_condition(c) for c in conditions)
+        if not self.time_bounded and self.spec.source not in self.complete_sources:
+            # Las filas con tiempo NULL están en la tabla cruda pero no en el rollup
+            raise _NoRewrite()
+        if clauses["group"]:
+            sql += " GROUP BY " + self._map(clauses["group"])
+        if clauses["order"]:
+            sql += " ORDER BY " + self._map(clauses["order"], allow_aggregates=True)
+        if clauses["limit"]:
+            sql += f" LIMIT {clauses['limit']}"
+        return unmask(sql, self.literals) + ";"
+
+
+def rewrite_with_rollups(sql: str, complete_sources: Collection[str] = ()) -> Optional[str]:
+    """
+    SQL equivalente que lee los rollups diarios, o None si no aplica.
+
+    Solo se reescriben agregaciones (COUNT(*), COUNT/SUM/AVG/MIN/MAX de
+    métricas) sobre una tabla de hechos, opcionalmente unida a trucks/drivers,
+    filtradas por dimensiones del rollup y por límites de día completo
+    (ej: timestamp >= date('now', '-7 days')). Sin límite de tiempo solo se
+    reescribe si la tabla de hechos está en `complete_sources` (ver
+    complete_rollup_sources). Cualquier otra forma se ejecuta sobre la
+    tabla cruda.
+    """
+    masked, literals = mask_strings(sql.strip())
+    try:
+        return _RollupRewriter(masked, literals, complete_sources).rewrite()
+    except _NoRewrite:
+        return None
@@ -0,0 +1,149 @@
+"""
+Cache persistente de traducciones NL→SQL.
+Se guarda en un archivo SQLite local (modo WAL) para sobrevivir reinicios
+y compartirse entre workers de uvicorn.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Optional
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normaliza una pregunta para usarla como clave del cache:
+    minúsculas, sin acentos, sin puntuación y con espacios colapsados.
+    """
+    text = unicodedata.normalize("NFKD", question.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"[^\w\s<>=%]", " ", text)
+    return " ".join(text.split())
+
+
+class TranslationCache:
+    """
+    Cache LRU persistente de SQL generado, con clave (pregunta normalizada, modelo).
+    Las entradas generadas con otro modelo no se reutilizan.
+    """
+
+    def __init__(self, path: str, max_entries: int = 5000):
+        """
+        Args:
+            path: Archivo SQLite del cache (se crea si no existe)
+            max_entries: Máximo de traducciones guardadas
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                question_key TEXT NOT NULL,
+                model TEXT NOT NULL,
+                question TEXT,
+                sql TEXT NOT NULL,
+                created_at REAL,
+                last_used REAL,
+                hits INTEGER DEFAULT 0,
+                PRIMARY KEY (question_key, model)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations(last_used)")
+        conn.commit()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            self._local.conn = conn
+        return conn
+
+    def get(self, question: str, model: str) -> Optional[str]:
+        """Retorna el SQL cacheado para la pregunta y modelo, o None"""
+        key = normalize_question(question)
+        try:
+            conn = self._conn()
+            row = conn.execute(
+                "SELECT sql FROM translations WHERE question_key = ? AND model = ?",
+                (key, model)
+            ).fetchone()
+            if row is not None:
+                conn.execute(
+                    "UPDATE translations SET last_used = ?, hits = hits + 1 "
+                    "WHERE question_key = ? AND model = ?",
+                    (time.time(), key, model)
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  Error leyendo cache de traducciones: {e}")
+            row = None
+
+        with self._lock:
+            if row is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return row[0] if row else None
+
+    def put(self, question: str, model: str, sql: str):
+        """Guarda una traducción y aplica la política LRU"""
+        key = normalize_question(question)
+        now = time.time()
+        try:
+            conn = self._conn()
+            conn.execute(
+                "INSERT INTO translations (question_key, model, question, sql, created_at, last_used) "
+                "VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(question_key, model) DO UPDATE SET "
+                "sql = excluded.sql, question = excluded.question, last_used = excluded.last_used",
+                (key, model, question, sql, now, now)
+            )
+            conn.execute(
+                "DELETE FROM translations WHERE rowid IN ("
+                "SELECT rowid FROM translations ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  Error escribiendo cache de traducciones: {e}")
+
+    def invalidate(self, question: str, model: str):
+        """Elimina una traducción (ej: el SQL cacheado no pasó la validación)"""
+        try:
+            conn = self._conn()
+            conn.execute(
+                "DELETE FROM translations WHERE question_key = ? AND model = ?",
+                (normalize_question(question), model)
+            )
+            conn.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  Error invalidando cache de traducciones: {e}")
+
+    def stats(self) -> dict:
+        """Contadores del proceso actual y tamaño del cache persistente"""
+        try:
+            entries = self._conn().execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+        except sqlite3.Error:
+            entries = None
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0,
+                "max_entries": self.max_entries,
+                "path": self.path
+            }
@@ -1,69 +1,399 @@
 """
 Validador de SQL para prevenir queries peligrosas y asegurar
 que solo se ejecuten consultas SELECT seguras.
+
+El SQL se tokeniza una sola vez (literales, identificadores citados y
+comentarios incluidos) y de los tokens sale una estructura liviana con las
+tablas, columnas, CTEs y el LIMIT de nivel superior. Todas las reglas se
+evalúan sobre esa estructura, que se memoiza por statement.
 """
 
 import re
-from typing import List, Set
+from functools import lru_cache
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
 
 
 # Tablas permitidas en el schema canónico
 ALLOWED_TABLES = {"trucks", "drivers", "trips", "telemetry", "alerts"}
 
-# Tokens prohibidos (comandos peligrosos)
-BANNED_TOKENS = [
-    ";DROP", ";DELETE", ";UPDATE", ";INSERT", ";ALTER", ";EXEC",
-    "DROP ", "DELETE ", "UPDATE ", "INSERT ", "ALTER ", "EXEC ",
-    "PRAGMA", "ATTACH", "DETACH", "CREATE ", "TRUNCATE",
-    "--", "/*", "*/", "UNION ALL", "UNION SELECT"
-]
+# Tokens prohibidos fuera de literales (comandos peligrosos y comentarios).
+# Se buscan en un set: sumar reglas no agrega pasadas sobre el SQL.
+BANNED_TOKENS = {
+    "DROP", "DELETE", "UPDATE", "INSERT", "ALTER", "EXEC",
+    "PRAGMA", "ATTACH", "DETACH", "CREATE", "TRUNCATE",
+    "--", "/*", "*/",
+}
+
+# Pares de palabras consecutivas prohibidos
+BANNED_SEQUENCES = {("UNION", "ALL"), ("UNION", "SELECT")}
 
 # Columnas permitidas por tabla (para validación adicional)
 ALLOWED_COLUMNS = {
     "trucks": {"truck_id", "plate", "model", "brand", "driver_id", "region", "status"},
     "drivers": {"driver_id", "name", "license"},
-    "trips": {"trip_id", "truck_id", "origin", "destination", "start_time", "end_time", "distance_km", "status"},
-    "telemetry": {"telemetry_id", "truck_id", "timestamp", "speed_kmh", "fuel_level", "engine_temp_c"},
-    "alerts": {"alert_id", "truck_id", "timestamp", "alert_type", "severity", "description"}
+    "trips": {"trip_id", "truck_id", "origin", "destination", "start_time", "end_time", "distance_km", "status",
+              "start_time_epoch", "end_time_epoch"},
+    "telemetry": {"telemetry_id", "truck_id", "timestamp", "speed_kmh", "fuel_level", "engine_temp_c",
+                  "timestamp_epoch"},
+    "alerts": {"alert_id", "truck_id", "timestamp", "alert_type", "severity", "description", "timestamp_epoch"}
+}
+
+MAX_LIMIT = 10000
+DEFAULT_LIMIT = 1000
+
+# Palabras clave de SQLite: nunca son columnas
+KEYWORDS = {
+    "ABORT", "ACTION", "ADD", "AFTER", "ALL", "ALTER", "ALWAYS", "ANALYZE", "AND", "AS", "ASC", "ATTACH",
+    "AUTOINCREMENT", "BEFORE", "BEGIN", "BETWEEN", "BY", "CASCADE", "CASE", "CAST", "CHECK", "COLLATE",
+    "COLUMN", "COMMIT", "CONFLICT", "CONSTRAINT", "CREATE", "CROSS", "CURRENT", "CURRENT_DATE",
+    "CURRENT_TIME", "CURRENT_TIMESTAMP", "DATABASE", "DEFAULT", "DEFERRABLE", "DEFERRED", "DELETE", "DESC",
+    "DETACH", "DISTINCT", "DO", "DROP", "EACH", "ELSE", "END", "ESCAPE", "EXCEPT", "EXCLUDE", "EXCLUSIVE",
+    "EXISTS", "EXPLAIN", "FAIL", "FALSE", "FILTER", "FIRST", "FOLLOWING", "FOR", "FOREIGN", "FROM", "FULL",
+    "GENERATED", "GLOB", "GROUP", "GROUPS", "HAVING", "IF", "IGNORE", "IMMEDIATE", "IN", "INDEX", "INDEXED",
+    "INITIALLY", "INNER", "INSERT", "INSTEAD", "INTERSECT", "INTO", "IS", "ISNULL", "JOIN", "KEY", "LAST",
+    "LEFT", "LIKE", "LIMIT", "MATCH", "MATERIALIZED", "NATURAL", "NO", "NOT", "NOTHING", "NOTNULL", "NULL",
+    "NULLS", "OF", "OFFSET", "ON", "OR", "ORDER", "OTHERS", "OUTER", "OVER", "PARTITION", "PLAN", "PRAGMA",
+    "PRECEDING", "PRIMARY", "QUERY", "RAISE", "RANGE", "RECURSIVE", "REFERENCES", "REGEXP", "REINDEX",
+    "RELEASE", "RENAME", "REPLACE", "RESTRICT", "RETURNING", "RIGHT", "ROLLBACK", "ROW", "ROWS",
+    "SAVEPOINT", "SELECT", "SET", "TABLE", "TEMP", "TEMPORARY", "THEN", "TIES", "TO", "TRANSACTION",
+    "TRIGGER", "TRUE", "UNBOUNDED", "UNION", "UNIQUE", "UPDATE", "USING", "VACUUM", "VALUES", "VIEW",
+    "VIRTUAL", "WHEN", "WHERE", "WINDOW", "WITH", "WITHOUT",
 }
 
+# Palabras clave con las que termina un valor (lo que sigue es un alias)
+_VALUE_KEYWORDS = {"END", "NULL", "TRUE", "FALSE", "CURRENT_DATE", "CURRENT_TIME", "CURRENT_TIMESTAMP"}
+
+# Cláusulas que cierran un FROM en su nivel de paréntesis
+_FROM_END = {"WHERE", "GROUP", "ORDER", "HAVING", "LIMIT", "WINDOW", "UNION", "INTERSECT", "EXCEPT",
+             "SELECT", "VALUES"}
+
+_NAME_KINDS = ("word", "quoted")
+
+# Un solo regex para todo el lexer: salta espacios y el grupo que coincide da el tipo
+_TOKEN_RE = re.compile(r"""\s*(?:
+      (?P<word>[^\W\d][\w$]*)
+    | (?P<string>'[^']*(?:''[^']*)*')
+    | (?P<number>0[xX][0-9a-fA-F]+|(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)
+    | (?P<quoted>"[^"]*(?:""[^"]*)*"|`[^`]*(?:``[^`]*)*`|\[[^\]]*\])
+    | (?P<comment>--|/\*|\*/)
+    | (?P<op>\|\||<<|>>|<=|>=|==|!=|<>|\S)
+)""", re.VERBOSE)
+
 
 class SQLValidationError(Exception):
     """Excepción para errores de validación SQL"""
     pass
 
 
+class Token:
+    """Token del lexer. `upper` solo difiere de `text` en palabras"""
+
+    __slots__ = ("kind", "text", "upper", "start", "end")
+
+    def __init__(self, kind: str, text: str, start: int, end: int):
+        self.kind = kind
+        self.text = text
+        self.upper = text.upper() if kind == "word" else text
+        self.start = start
+        self.end = end
+
+    def is_name(self) -> bool:
+        """Identificador (palabra o nombre citado)"""
+        return self.kind in _NAME_KINDS
+
+    def is_keyword(self) -> bool:
+        return self.kind == "word" and self.upper in KEYWORDS
+
+    def name(self) -> str:
+        """Identificador normalizado: sin comillas y en minúsculas"""
+        if self.kind != "quoted":
+            return self.text.lower()
+        quote = self.text[0]
+        inner = self.text[1:-1]
+        if quote != "[":
+            inner = inner.replace(quote * 2, quote)
+        return inner.lower()
+
+
+class ParsedSQL:
+    """
+    Estructura de un statement tokenizado. Se comparte desde el cache de
+    parse_sql: tratarla como de solo lectura.
+    """
+
+    __slots__ = ("body", "keyword", "multiple_statements", "banned", "tables", "ctes", "table_aliases",
+                 "columns", "aliases", "limit_clause", "limit")
+
+    def __init__(self):
+        # SQL sin espacios ni ';' finales
+        self.body = ""
+        # Primera palabra, en mayúsculas
+        self.keyword = ""
+        # ';' seguido de más SQL
+        self.multiple_statements = False
+        # Primer token prohibido encontrado fuera de literales
+        self.banned: Optional[str] = None
+        # Tablas referenciadas en FROM/JOIN (sin los nombres de CTEs)
+        self.tables: FrozenSet[str] = frozenset()
+        self.ctes: FrozenSet[str] = frozenset()
+        # alias (o nombre) → tabla o CTE
+        self.table_aliases: Dict[str, str] = {}
+        # (calificador o None, columna) de cada referencia a columna
+        self.columns: FrozenSet[Tuple[Optional[str], str]] = frozenset()
+        # Nombres definidos por la consulta: alias de columnas y subconsultas, columnas de CTEs
+        self.aliases: FrozenSet[str] = frozenset()
+        # Texto después del LIMIT de nivel superior (None si no hay) y su valor si es un entero literal
+        self.limit_clause: Optional[str] = None
+        self.limit: Optional[int] = None
+
+
+class _StatementParser:
+    """Tokeniza el SQL y recorre los tokens una vez para llenar un ParsedSQL"""
+
+    def __init__(self, sql: str):
+        self.sql = sql
+        self.tokens: List[Token] = []
+        self.end = 0
+        self.banned: Optional[str] = None
+        self.tables: Set[str] = set()
+        self.ctes: Set[str] = set()
+        self.table_aliases: Dict[str, str] = {}
+        self.columns: Set[Tuple[Optional[str], str]] = set()
+        self.aliases: Set[str] = set()
+
+    def _token(self, i: int) -> Optional[Token]:
+        return self.tokens[i] if 0 <= i < self.end else None
+
+    def _is(self, i: int, text: str) -> bool:
+        token = self._token(i)
+        return token is not None and token.upper == text
+
+    def parse(self) -> ParsedSQL:
+        tokens = self.tokens
+        parsed = ParsedSQL()
+
+        # Lexer: una sola pasada sobre el texto, que ya detecta los tokens prohibidos
+        prev = None
+        for match in _TOKEN_RE.finditer(self.sql):
+            kind = match.lastgroup
+            token = Token(kind, match.group(kind), match.start(kind), match.end(kind))
+            if self.banned is None:
+                if token.kind in ("word", "comment") and token.upper in BANNED_TOKENS:
+                    self.banned = token.upper
+                elif prev is not None and (prev.upper, token.upper) in BANNED_SEQUENCES:
+                    self.banned = f"{prev.upper} {token.upper}"
+            tokens.append(token)
+            prev = token
+
+        # Los ';' finales no cuentan como otro statement
+        self.end = len(tokens)
+        while self.end and tokens[self.end - 1].text == ";":
+            self.end -= 1
+        if not self.end:
+            return parsed
+        parsed.body = self.sql[tokens[0].start:tokens[self.end - 1].end]
+        parsed.keyword = tokens[0].upper
+
+        depth = 0
+        from_depths: Set[int] = set()   # niveles de paréntesis dentro de un FROM
+        with_depths: Set[int] = set()   # niveles con una lista de CTEs abierta
+        expect_table = False
+        limit_at = None
+        n = self.end
+        i = 0
+        while i < n:
+            token = tokens[i]
+            upper = token.upper
+
+            if upper == ";":
+                parsed.multiple_statements = True
+            elif upper == "(":
+                depth += 1
+                expect_table = False
+            elif upper == ")":
+                from_depths.discard(depth)
+                depth -= 1
+                if depth in with_depths:
+                    if i + 1 < n and tokens[i + 1].text == ",":
+                        i = self._cte(i + 2)
+                        continue
+                    with_depths.discard(depth)
+            elif upper == ",":
+                expect_table = depth in from_depths
+            elif token.kind in _NAME_KINDS:
+                if expect_table:
+                    i = self._table(i)
+                    expect_table = False
+                    continue
+                prev = tokens[i - 1] if i else None
+                after = tokens[i + 1].text if i + 1 < n else ""
+                if upper not in KEYWORDS or token.kind != "word" or after == "." or (prev and prev.upper == "AS"):
+                    i = self._name(i, token, prev, after)
+                elif upper == "WITH":
+                    with_depths.add(depth)
+                    i = self._cte(i + 1 + self._is(i + 1, "RECURSIVE"))
+                    continue
+                elif upper == "FROM":
+                    from_depths.add(depth)
+                    expect_table = True
+                elif upper == "JOIN":
+                    expect_table = True
+                elif upper in _FROM_END:
+                    from_depths.discard(depth)
+                    if upper == "LIMIT" and depth == 0:
+                        limit_at = i
+            i += 1
+
+        if limit_at is not None:
+            self._limit(parsed, limit_at)
+        parsed.banned = self.banned
+        parsed.tables = frozenset(self.tables)
+        parsed.ctes = frozenset(self.ctes)
+        parsed.table_aliases = self.table_aliases
+        parsed.columns = frozenset(self.columns)
+        parsed.aliases = frozenset(self.aliases)
+        return parsed
+
+    def _name(self, i: int, token: Token, prev: Optional[Token], after: str) -> int:
+        """
+        Clasifica un identificador fuera de FROM (`prev` y `after` son sus
+        vecinos): alias, columna calificada, función o columna.
+        Retorna el índice del último token consumido.
+        """
+        if prev is not None and prev.upper == "AS":
+            self.aliases.add(token.name())
+            return i
+        if after == "." and i + 2 < self.end:
+            column = self.tokens[i + 2]
+            self.columns.add((token.name(), "*" if column.text == "*" else column.name()))
+            return i + 2
+        if after == "(":
+            return i
+        if prev is not None and prev.upper in ("COLLATE", "OVER", "WINDOW"):
+            # Collation o nombre de ventana
+            self.aliases.add(token.name())
+        elif prev is not None and (
+            prev.kind in ("quoted", "string", "number") or prev.text == ")"
+            or (prev.kind == "word" and (prev.upper in _VALUE_KEYWORDS or prev.upper not in KEYWORDS))
+        ):
+            # Un nombre justo después de un valor es un alias implícito
+            self.aliases.add(token.name())
+        else:
+            self.columns.add((None, token.name()))
+        return i
+
+    def _table(self, i: int) -> int:
+        """Tabla de un FROM/JOIN (con esquema y alias opcionales). Retorna el índice siguiente"""
+        name = self.tokens[i].name()
+        i += 1
+        if self._is(i, ".") and self._token(i + 1) is not None:
+            name = f"{name}.{self.tokens[i + 1].name()}"
+            i += 2
+        if name not in self.ctes:
+            self.tables.add(name)
+
+        alias = name
+        token = self._token(i)
+        if token is not None and token.upper == "AS" and self._token(i + 1) is not None:
+            alias = self.tokens[i + 1].name()
+            i += 2
+        elif token is not None and token.is_name() and not token.is_keyword():
+            alias = token.name()
+            i += 1
+        self.table_aliases[name] = name
+        self.table_aliases[alias] = name
+        return i
+
+    def _cte(self, i: int) -> int:
+        """`nombre [(columnas)] AS [NOT] [MATERIALIZED]`. Retorna el índice del '(' del cuerpo"""
+        token = self._token(i)
+        if token is None or not token.is_name():
+            return i
+        self.ctes.add(token.name())
+        i += 1
+        if self._is(i, "("):
+            i += 1
+            while self._token(i) is not None and not self._is(i, ")"):
+                if self.tokens[i].is_name():
+                    self.aliases.add(self.tokens[i].name())
+                i += 1
+            i += 1
+        for word in ("AS", "NOT", "MATERIALIZED"):
+            if self._is(i, word):
+                i += 1
+        return i
+
+    def _limit(self, parsed: ParsedSQL, i: int):
+        """Valor del LIMIT de nivel superior: `n`, `n OFFSET m` o `m, n`"""
+        expr = self.tokens[i + 1:self.end]
+        parsed.limit_clause = self.sql[expr[0].start:expr[-1].end] if expr else ""
+        texts = [t.upper for t in expr]
+        if len(texts) == 1:
+            value = texts[0]
+        elif len(texts) == 3 and texts[1] == "OFFSET":
+            value = texts[0]
+        elif len(texts) == 3 and texts[1] == ",":
+            value = texts[2]
+        else:
+            return
+        if all(t.kind == "number" for t in expr[::2]) and value.isdigit():
+            parsed.limit = int(value)
+
+
+@lru_cache(maxsize=2048)
+def parse_sql(sql: str) -> ParsedSQL:
+    """Tokeniza y analiza un statement (memoizado por texto del SQL)"""
+    return _StatementParser(sql).parse()
+
+
 def extract_tables_from_sql(sql: str) -> Set[str]:
     """
-    Extrae nombres de tablas referenciadas en el SQL.
-    Busca patrones como FROM table, JOIN table, etc.
+    Extrae nombres de tablas referenciadas en el SQL (FROM, JOIN y listas
+    con coma). Los nombres de CTEs no cuentan como tablas.
     """
-    sql_upper = sql.upper()
-    tables = set()
-    
-    # Patrones para encontrar tablas
-    patterns = [
-        r'FROM\s+(\w+)',
-        r'JOIN\s+(\w+)',
-        r'INTO\s+(\w+)',
-        r'UPDATE\s+(\w+)',
-        r'TABLE\s+(\w+)'
-    ]
-    
-    for pattern in patterns:
-        matches = re.findall(pattern, sql_upper)
-        tables.update([m.lower() for m in matches])
-    
-    return tables
+    return set(parse_sql(sql).tables)
+
+
+def normalize_sql(sql: str) -> str:
+    """
+    Forma canónica de un SQL ya validado, usada como clave de caches.
+    Colapsa espacios fuera de literales y quita el ';' final.
+    """
+    parts = re.split(r"('(?:[^']|'')*')", sql.strip().rstrip(';').strip())
+    for i in range(0, len(parts), 2):
+        # Índices pares: fuera de literales de texto
+        parts[i] = re.sub(r'\s+', ' ', parts[i])
+    return ''.join(parts).strip()
 
 
-def validate_sql(sql: str, strict: bool = True) -> str:
+def _invalid_columns(parsed: ParsedSQL) -> Set[str]:
+    """Referencias a columnas que no existen en las tablas consultadas ni en la consulta"""
+    known = set(parsed.aliases)
+    for table in parsed.tables:
+        known |= ALLOWED_COLUMNS.get(table, set())
+
+    invalid = set()
+    for qualifier, column in parsed.columns:
+        if column == "*":
+            continue
+        source = parsed.table_aliases.get(qualifier) if qualifier else None
+        # Calificada por una tabla base: la columna tiene que ser de esa tabla
+        valid = ALLOWED_COLUMNS[source] if source in ALLOWED_COLUMNS else known
+        if column not in valid:
+            invalid.add(f"{qualifier}.{column}" if qualifier else column)
+    return invalid
+
+
+def validate_sql(sql: str, strict: bool = True, enforce_limit: bool = True) -> str:
     """
     Valida y sanitiza una consulta SQL.
     
     Args:
         sql: Consulta SQL a validar
-        strict: Si True, aplica validaciones estrictas
+        strict: Si True, aplica validaciones estrictas (al menos una tabla y
+                solo columnas del schema)
+        enforce_limit: Si False (modo paginado), no agrega ni acota LIMIT;
+                       cada página se acota por separado
     
     Returns:
         SQL validado y sanitizado (con LIMIT agregado si es necesario)
@@ -76,35 +406,31 @@ def validate_sql(sql: str, strict: bool = True) -> str:
         raise SQLValidationError("SQL vacío")
     
     sql = sql.strip()
-    sql_upper = sql.upper()
+    parsed = parse_sql(sql)
     
     # 1. Verificar que sea solo SELECT o WITH
-    if not (sql_upper.startswith("SELECT") or sql_upper.startswith("WITH")):
+    if parsed.keyword not in ("SELECT", "WITH"):
         raise SQLValidationError(
             "Solo se permiten consultas SELECT o WITH. "
             f"La consulta comienza con: {sql[:20]}"
         )
     
-    # 2. Verificar tokens prohibidos
-    for banned in BANNED_TOKENS:
-        if banned.upper() in sql_upper:
-            raise SQLValidationError(
-                f"Token prohibido detectado: '{banned}'. "
-                "No se permiten comandos DML/DDL."
-            )
-    
-    # 3. Verificar múltiples statements (detectar ; seguido de más SQL)
-    # Permitir ; al final, pero no en medio
-    sql_stripped = sql.rstrip(';').strip()
-    if ';' in sql_stripped:
+    # 2. Verificar múltiples statements (';' seguido de más SQL, fuera de literales)
+    if parsed.multiple_statements:
         raise SQLValidationError(
             "No se permiten múltiples statements SQL. "
             "Detectado ';' en medio de la consulta."
         )
     
-    # 4. Extraer y validar tablas referenciadas
-    referenced_tables = extract_tables_from_sql(sql)
-    invalid_tables = referenced_tables - ALLOWED_TABLES
+    # 3. Verificar tokens prohibidos
+    if parsed.banned:
+        raise SQLValidationError(
+            f"Token prohibido detectado: '{parsed.banned}'. "
+            "No se permiten comandos DML/DDL."
+        )
+    
+    # 4. Validar tablas referenciadas (los CTEs no cuentan)
+    invalid_tables = set(parsed.tables) - ALLOWED_TABLES
     
     if invalid_tables:
         raise SQLValidationError(
@@ -113,30 +439,40 @@ def validate_sql(sql: str, strict: bool = True) -> str:
         )
     
     # 5. Verificar que al menos una tabla válida esté referenciada
-    if strict and not referenced_tables:
+    if strict and not parsed.tables:
         raise SQLValidationError(
             "No se detectaron tablas válidas en la consulta. "
             f"Tablas disponibles: {ALLOWED_TABLES}"
         )
     
-    # 6. Agregar LIMIT si no existe (prevenir queries masivas)
-    if "LIMIT" not in sql_upper:
-        sql = sql.rstrip(';').strip() + " LIMIT 1000"
-    
-    # 7. Validar que el LIMIT no sea excesivo
-    limit_match = re.search(r'LIMIT\s+(\d+)', sql_upper)
-    if limit_match:
-        limit_value = int(limit_match.group(1))
-        if limit_value > 10000:
+    # 6. Validar columnas contra el schema
+    if strict:
+        invalid_columns = _invalid_columns(parsed)
+        if invalid_columns:
+            valid = sorted(set().union(*(ALLOWED_COLUMNS[t] for t in parsed.tables)))
             raise SQLValidationError(
-                f"LIMIT demasiado alto: {limit_value}. Máximo permitido: 10000"
+                f"Columnas no permitidas: {invalid_columns}. "
+                f"Columnas válidas: {valid}"
             )
     
-    # 8. Asegurar que termina con ;
-    if not sql.endswith(';'):
-        sql += ';'
+    if not enforce_limit:
+        return parsed.body + ";"
+    
+    # 7. Agregar LIMIT de nivel superior si no existe (prevenir queries masivas)
+    if parsed.limit_clause is None:
+        return f"{parsed.body} LIMIT {DEFAULT_LIMIT};"
+    
+    # 8. Validar que el LIMIT sea un entero y no sea excesivo
+    if parsed.limit is None:
+        raise SQLValidationError(
+            f"LIMIT no soportado: '{parsed.limit_clause}'. Usar un número entero"
+        )
+    if parsed.limit > MAX_LIMIT:
+        raise SQLValidationError(
+            f"LIMIT demasiado alto: {parsed.limit}. Máximo permitido: {MAX_LIMIT}"
+        )
     
-    return sql
+    return parsed.body + ";"
 
 
 def validate_and_explain(sql: str) -> dict:
@@ -159,8 +495,8 @@ def validate_and_explain(sql: str) -> dict:
         result["sql"] = validated_sql
         
         # Agregar warnings si se hicieron modificaciones
-        if "LIMIT" not in sql.upper():
-            result["warnings"].append("Se agregó LIMIT 1000 automáticamente")
+        if parse_sql(sql.strip()).limit_clause is None:
+            result["warnings"].append(f"Se agregó LIMIT {DEFAULT_LIMIT} automáticamente")
         
     except SQLValidationError as e:
         result["errors"].append(str(e))
@@ -179,12 +515,14 @@ if __name__ == "__main__":
         ("SELECT * FROM trucks", True),
         ("SELECT truck_id, COUNT(*) FROM alerts GROUP BY truck_id", True),
         ("SELECT t.*, d.name FROM trucks t JOIN drivers d ON t.driver_id = d.driver_id", True),
+        ("WITH temp AS (SELECT * FROM trips) SELECT * FROM temp", True),
         
         # Casos inválidos
         ("DROP TABLE trucks", False),
         ("SELECT * FROM trucks; DELETE FROM trips", False),
         ("UPDATE trucks SET status = 'inactive'", False),
         ("SELECT * FROM invalid_table", False),
+        ("SELECT password FROM drivers", False),
     ]
     
     for sql, should_pass in test_cases:
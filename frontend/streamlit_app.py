@@ -186,7 +186,9 @@ if send_button and query:
                 f"{API_URL}/query",
                 json={
                     "user": USER_ID,
-                    "nl": query
+                    "nl": query,
+                    # Filas primero; la explicación se pide después por query_id
+                    "explain": "deferred"
                 },
                 timeout=30
             )
@@ -210,7 +212,11 @@ if send_button and query:
                 
                 # Explicación
                 st.subheader("💡 Explicación")
-                st.info(result['explanation'])
+                explanation_slot = st.empty()
+                if result.get('query_id'):
+                    explanation_slot.caption("⏳ Generando explicación...")
+                else:
+                    explanation_slot.info(result['explanation'])
                 
                 # SQL generado (colapsable)
                 with st.expander("🔍 Ver SQL Generado", expanded=False):
@@ -255,6 +261,21 @@ if send_button and query:
                             pass
                 else:
                     st.warning("No se encontraron resultados para esta consulta.")
+                
+                # Explicación diferida: se completa después de mostrar las filas
+                if result.get('query_id'):
+                    try:
+                        explanation = requests.get(
+                            f"{API_URL}/query/{result['query_id']}/explanation",
+                            params={"wait_s": 30},
+                            timeout=35
+                        ).json()
+                        if explanation.get('explanation'):
+                            explanation_slot.info(explanation['explanation'])
+                        else:
+                            explanation_slot.caption("La explicación no estuvo lista a tiempo.")
+                    except requests.exceptions.RequestException:
+                        explanation_slot.caption("No se pudo obtener la explicación.")
             
             else:
                 error_detail = response.json().get('detail', 'Error desconocido')
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Compara los motores de ejecución (SQLite vs DuckDB) sobre las consultas de
+ejemplo del prompt (SYSTEM_PROMPT), con los datos de data/logiq.db.
+
+Uso:
+    python scripts/benchmark_engines.py [--repeat N] [--db data/logiq.db]
+"""
+
+import argparse
+import re
+import sqlite3
+import statistics
+import sys
+import os
+import time
+
+# Agregar directorio raíz al path para imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.lib.engines import DuckDBEngine, SQLiteEngine, portable_sql
+from backend.lib.gemini_client import SYSTEM_PROMPT
+from backend.lib.query_budget import QueryBudget
+from backend.lib.rollups import ROLLUP_TABLES
+from backend.lib.validate_sql import ALLOWED_TABLES, SQLValidationError, validate_sql
+
+
+def example_queries():
+    """SQL de los ejemplos few-shot del prompt, validado como en el backend (None si no valida)"""
+    queries = []
+    for sql in re.findall(r"^SQL: (.+)$", SYSTEM_PROMPT, re.MULTILINE):
+        try:
+            queries.append(validate_sql(sql))
+        except SQLValidationError as e:
+            print(f"⚠️  Ejemplo no válido, se omite: {e}")
+            queries.append(None)
+    return queries
+
+
+def time_query(run, repeat):
+    """Mediana en ms de `repeat` ejecuciones (más el resultado de la última)"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings), result
+
+
+def _row_key(row):
+    return repr(tuple(round(v, 6) if isinstance(v, float) else v for v in row))
+
+
+def same_rows(a, b):
+    """
+    Compara filas sin importar el orden (los empates de ORDER BY pueden salir
+    en otro orden) y tolerando diferencias de redondeo en flotantes
+    """
+    if len(a) != len(b):
+        return False
+    for row_a, row_b in zip(sorted(a, key=_row_key), sorted(b, key=_row_key)):
+        for x, y in zip(row_a, row_b):
+            if isinstance(x, float) or isinstance(y, float):
+                if x is None or y is None or abs(x - y) > 1e-6 * max(1.0, abs(x)):
+                    return False
+            elif x != y:
+                return False
+    return True
+
+
+def budget():
+    """Sin límites: se mide el motor, no el presupuesto"""
+    return QueryBudget(max_seconds=0, max_steps=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de motores de ejecución")
+    parser.add_argument("--db", default="data/logiq.db", help="Base SQLite")
+    parser.add_argument("--repeat", type=int, default=20, help="Ejecuciones por consulta")
+    args = parser.parse_args()
+
+    try:
+        duck = DuckDBEngine(args.db, sorted(ALLOWED_TABLES | ROLLUP_TABLES))
+    except ImportError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    conn = sqlite3.connect(f"file:{args.db}?mode=ro", uri=True)
+    sqlite_engine = SQLiteEngine()
+
+    start = time.perf_counter()
+    version = duck.build()
+    print(f"🦆 Copia a DuckDB: {(time.perf_counter() - start) * 1000:.0f} ms\n")
+
+    queries = example_queries()
+    print(f"{'#':>2}  {'SQLite ms':>10}  {'DuckDB ms':>10}  {'x':>6}  resultado")
+    for i, sql in enumerate(queries, 1):
+        if sql is None:
+            continue
+        sqlite_ms, (_, sqlite_rows, _) = time_query(lambda: sqlite_engine.execute(conn, sql, budget()), args.repeat)
+
+        duck_sql = portable_sql(conn, sql)
+        if duck_sql is None:
+            print(f"{i:>2}  {sqlite_ms:>10.2f}  {'-':>10}  {'-':>6}  no portable (queda en SQLite)")
+            continue
+        duck_ms, (_, duck_rows) = time_query(lambda: duck.execute(version, duck_sql, budget()), args.repeat)
+        verdict = "igual" if same_rows(sqlite_rows, duck_rows) else "DISTINTO"
+        print(f"{i:>2}  {sqlite_ms:>10.2f}  {duck_ms:>10.2f}  {sqlite_ms / duck_ms:>6.1f}  {verdict}")
+
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Compara el prompt NL→SQL completo (SYSTEM_PROMPT) con el armado por
+PromptBuilder: tokens por pregunta, tablas elegidas, costo de armarlo y
+latencia de nl_to_sql contra un backend mock local (generateContent) cuyo
+tiempo de respuesta crece con el tamaño del prompt.
+
+El backend mock responde con el SQL de los templates (modo mock) para la
+pregunta; si ese SQL usa una tabla que el prompt recortado no incluyó, se
+marca la pregunta.
+
+Uso:
+    python scripts/benchmark_prompt.py [--repeat N] [--max-tokens 700] [--ms-per-1k-tokens 50]
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Agregar directorio raíz al path para imports
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.lib.gemini_client import GeminiClient
+from backend.lib.prompt_builder import (
+    EXAMPLES, SYSTEM_PROMPT, PromptBuilder, estimate_tokens, question_suffix, render_prompt
+)
+from backend.lib.validate_sql import extract_tables_from_sql
+
+# Preguntas de los ejemplos few-shot más las de los templates del modo mock
+QUESTIONS = [nl for nl, _ in EXAMPLES] + [
+    "¿Cuántos camiones Volvo hay?",
+    "Conductor con más kilómetros recorridos en el último mes",
+    "Alertas de velocidad excesiva",
+    "Camiones con combustible bajo",
+    "Viajes más largos por región",
+    "¿Cuántos conductores hay?",
+    "Velocidad promedio por camión en las últimas 24 horas",
+    "Temperatura de motor promedio de los camiones Scania",
+    "¿Cuántos viajes hay en total?",
+]
+
+# Templates del modo mock: el SQL "correcto" que devuelve el backend local
+MOCK = GeminiClient(api_key="your_gemini_api_key_here")
+
+
+class MockBackend:
+    """
+    generateContent local: responde el SQL del template para la pregunta
+    del prompt, después de `base_ms` + `ms_per_1k_tokens` por cada 1000
+    tokens del prompt (el costo de procesar la entrada).
+    """
+
+    def __init__(self, base_ms, ms_per_1k_tokens):
+        backend = self
+        self.bytes_received = 0
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers["Content-Length"]))
+                backend.bytes_received += len(raw)
+                prompt = json.loads(raw)["contents"][0]["parts"][0]["text"]
+                question = prompt.rsplit("\nNL: ", 1)[-1].rsplit("\nSQL:", 1)[0]
+                time.sleep((base_ms + ms_per_1k_tokens * estimate_tokens(prompt) / 1000) / 1000)
+                payload = {"candidates": [{"content": {"parts": [{"text": MOCK.nl_to_sql(question)}]}}]}
+                data = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def time_build(max_tokens, max_examples, repeat):
+    """µs por armado: primera vez (caches vacíos) y mediana de las siguientes"""
+    render_prompt.cache_clear()
+    builder = PromptBuilder(max_tokens, max_examples)
+    cold, warm = [], []
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        builder.build(question)
+        cold.append((time.perf_counter() - start) * 1e6)
+        for _ in range(repeat):
+            start = time.perf_counter()
+            builder.build(question)
+            warm.append((time.perf_counter() - start) * 1e6)
+    return statistics.median(cold), statistics.median(warm)
+
+
+async def time_nl_to_sql(client, repeat):
+    """Mediana en ms de nl_to_sql por pregunta (sin cache de traducciones)"""
+    timings = []
+    try:
+        for _ in range(repeat):
+            for question in QUESTIONS:
+                start = time.perf_counter()
+                await client.nl_to_sql_async(question)
+                timings.append((time.perf_counter() - start) * 1000)
+    finally:
+        await client.aclose()
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del prompt NL→SQL (completo vs recortado)")
+    parser.add_argument("--repeat", type=int, default=5, help="Repeticiones por pregunta")
+    parser.add_argument("--max-tokens", type=int, default=700, help="Presupuesto del PromptBuilder")
+    parser.add_argument("--max-examples", type=int, default=3, help="Ejemplos few-shot como máximo")
+    parser.add_argument("--base-ms", type=float, default=20, help="Latencia fija del backend mock")
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=50,
+                        help="Latencia del backend mock por cada 1000 tokens de prompt")
+    args = parser.parse_args()
+
+    builder = PromptBuilder(args.max_tokens, args.max_examples)
+
+    print(f"{'completo':>8}  {'armado':>6}  {'tablas':<32}  {'ej.':<7}  pregunta")
+    full_tokens, pruned_tokens, missing = [], [], 0
+    for question in QUESTIONS:
+        full = estimate_tokens(SYSTEM_PROMPT + question_suffix(question))
+        built = builder.build(question)
+        full_tokens.append(full)
+        pruned_tokens.append(built.tokens)
+        needed = extract_tables_from_sql(MOCK.nl_to_sql(question))
+        flag = ""
+        if not needed <= set(built.tables):
+            missing += 1
+            flag = f"  ⚠️  faltan {', '.join(sorted(needed - set(built.tables)))}"
+        if built.over_budget:
+            flag += "  ⚠️  excede el presupuesto"
+        examples = ",".join(str(i + 1) for i in built.examples) or "-"
+        print(f"{full:>8}  {built.tokens:>6}  {', '.join(built.tables):<32}  {examples:<7}  {question}{flag}")
+
+    saved = 1 - sum(pruned_tokens) / sum(full_tokens)
+    print(f"\n📏 Tokens promedio: {statistics.mean(full_tokens):.0f} completo → "
+          f"{statistics.mean(pruned_tokens):.0f} armado ({saved:.0%} menos, presupuesto {args.max_tokens})")
+    print(f"🧭 Preguntas sin todas las tablas del SQL de referencia: {missing}/{len(QUESTIONS)}")
+
+    cold_us, warm_us = time_build(args.max_tokens, args.max_examples, args.repeat)
+    print(f"🧱 Armado del prompt: {cold_us:.0f} µs sin cache, {warm_us:.1f} µs cacheado")
+
+    backend = MockBackend(args.base_ms, args.ms_per_1k_tokens)
+    try:
+        results = {}
+        for name, prompt_builder in (("completo", None), ("armado", builder)):
+            client = GeminiClient(api_key="benchmark-key", base_url=backend.url, max_retries=0,
+                                  prompt_builder=prompt_builder)
+            backend.bytes_received = 0
+            latency_ms = asyncio.run(time_nl_to_sql(client, args.repeat))
+            results[name] = (latency_ms, backend.bytes_received / (len(QUESTIONS) * args.repeat))
+    finally:
+        backend.close()
+
+    print(f"\n⏱️  nl_to_sql contra el backend mock ({args.base_ms:.0f} ms + {args.ms_per_1k_tokens:.0f} ms/1k tokens):")
+    for name, (latency_ms, request_bytes) in results.items():
+        print(f"   {name:<8}  mediana {latency_ms:6.1f} ms  request {request_bytes / 1024:5.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
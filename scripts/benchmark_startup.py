@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Mide el arranque en frío del backend, cada corrida en un proceso nuevo:
+tiempo de `import backend.app`, módulos que más pesan en ese import
+(python -X importtime) y tiempo hasta el primer /health y hasta que el
+cliente LLM pasa a usar el modelo.
+
+Uso:
+    python scripts/benchmark_startup.py [--runs N] [--top N] [--max-import-ms MS]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Módulos pesados que el import del backend no debería cargar
+DEFERRED_MODULES = ("pandas", "numpy", "duckdb", "httpx")
+
+IMPORT_SNIPPET = """
+import json, sys, time
+start = time.perf_counter()
+import backend.app
+elapsed = (time.perf_counter() - start) * 1000
+print(json.dumps({"import_ms": elapsed, "loaded": [m for m in %r if m in sys.modules]}))
+""" % (DEFERRED_MODULES,)
+
+# Sin uvicorn: TestClient corre los eventos de startup/shutdown de la app
+HEALTH_SNIPPET = """
+import json, time
+start = time.perf_counter()
+from fastapi.testclient import TestClient
+import backend.app
+with TestClient(backend.app.app) as client:
+    health = client.get("/health").json()
+    first_ms = (time.perf_counter() - start) * 1000
+    first_mode = health.get("llm", {}).get("mode")
+    backend.app.gemini_client.wait_ready(30)
+    ready_ms = (time.perf_counter() - start) * 1000
+    llm = client.get("/health").json().get("llm", {})
+print(json.dumps({"health_ms": first_ms, "first_mode": first_mode, "ready_ms": ready_ms,
+                  "mode": llm.get("mode"), "init_ms": llm.get("init_ms")}))
+"""
+
+
+def child_env(tmpdir):
+    """Entorno de los procesos hijos: API key de prueba y caches/logs descartables"""
+    env = dict(os.environ)
+    env.setdefault("GEMINI_API_KEY", "benchmark-key")
+    env["TRANSLATION_CACHE_PATH"] = os.path.join(tmpdir, "translation_cache.db")
+    env["LOG_PATH"] = os.path.join(tmpdir, "queries.log")
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    return env
+
+
+def run_child(snippet, env, *flags):
+    """Ejecuta un snippet en un intérprete nuevo; (json de la última línea de stdout, stderr)"""
+    proc = subprocess.run(
+        [sys.executable, *flags, "-c", snippet],
+        cwd=PROJECT_ROOT, env=env, capture_output=True, text=True, check=True
+    )
+    return json.loads(proc.stdout.strip().splitlines()[-1]), proc.stderr
+
+
+def heaviest_imports(stderr, top):
+    """Módulos de primer y segundo nivel con mayor tiempo acumulado en la salida de -X importtime"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth <= 2:
+            entries.append((int(cumulative) / 1000, depth, name.strip()))
+    return sorted(entries, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque del backend")
+    parser.add_argument("--runs", type=int, default=5, help="Procesos por medición")
+    parser.add_argument("--top", type=int, default=10, help="Módulos más pesados a listar")
+    parser.add_argument("--max-import-ms", type=float, default=0,
+                        help="Falla (exit 1) si la mediana del import supera este valor (0 = sin límite)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmpdir:
+        env = child_env(tmpdir)
+
+        imports = [run_child(IMPORT_SNIPPET, env)[0] for _ in range(args.runs)]
+        import_ms = statistics.median(r["import_ms"] for r in imports)
+        print(f"⏱️  import backend.app: mediana {import_ms:.0f} ms "
+              f"(mín. {min(r['import_ms'] for r in imports):.0f} ms, {args.runs} procesos)")
+        loaded = sorted({m for r in imports for m in r["loaded"]})
+        if loaded:
+            print(f"⚠️  Módulos diferidos cargados en el import: {', '.join(loaded)}")
+        else:
+            print(f"✅ Sin importar: {', '.join(DEFERRED_MODULES)}")
+
+        _, stderr = run_child(IMPORT_SNIPPET, env, "-X", "importtime")
+        print(f"\n{'ms':>8}  módulo")
+        for cumulative_ms, depth, name in heaviest_imports(stderr, args.top):
+            print(f"{cumulative_ms:>8.1f}  {'  ' * depth}{name}")
+
+        try:
+            health = [run_child(HEALTH_SNIPPET, env)[0] for _ in range(args.runs)]
+        except subprocess.CalledProcessError as e:
+            print(f"\n❌ No se pudo medir /health: {e.stderr.strip().splitlines()[-1:]}")
+        else:
+            print(f"\n🩺 Primer /health: mediana {statistics.median(r['health_ms'] for r in health):.0f} ms "
+                  f"(LLM: {health[-1]['first_mode']})")
+            print(f"🔑 LLM listo: mediana {statistics.median(r['ready_ms'] for r in health):.0f} ms "
+                  f"(modo {health[-1]['mode']}, init {health[-1]['init_ms']} ms en segundo plano)")
+
+    if args.max_import_ms and import_ms > args.max_import_ms:
+        print(f"\n❌ El import supera el límite de {args.max_import_ms:.0f} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,21 @@
 #!/usr/bin/env python3
 """
 Carga datos desde CSVs usando adapters y los inserta en SQLite.
+
+La carga es incremental: cada fuente guarda su watermark (último timestamp
+cargado) y en la siguiente corrida solo procesa y hace upsert de los
+registros nuevos o modificados. Con --full se reprocesa todo.
+
+telemetry y alerts se guardan en particiones mensuales (ej: telemetry_2025_10)
+detrás de una vista con el nombre canónico (ver backend/lib/partitions.py).
 """
 
+import argparse
+import re
 import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import Manager
+from queue import Empty
 import pandas as pd
 import os
 import sys
@@ -12,19 +24,30 @@ import sys
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from adapters import TeraAdapter, CloudfleetAdapter, ScaniaAdapter, KeeperAdapter
+from backend.lib.partitions import PARTITIONS, list_partitions, partition_month, view_sql
+from backend.lib.rollups import ROLLUPS, refresh_rollup
 
 
 DB_PATH = "data/logiq.db"
 
+# Fuentes de hechos: (adapter, archivo, tabla destino, descripción de los registros)
+SOURCES = [
+    (TeraAdapter, "data/tera_trips.csv", "trips", "viajes"),
+    (CloudfleetAdapter, "data/cloudfleet_positions.csv", "telemetry", "registros de telemetría"),
+    (ScaniaAdapter, "data/scania_metrics.csv", "telemetry", "registros de telemetría"),
+    (KeeperAdapter, "data/keeper_alerts.csv", "alerts", "alertas"),
+]
 
-def create_schema(conn):
-    """Crea el schema canónico en SQLite"""
-    print("🏗️  Creando schema canónico...")
-    
-    cursor = conn.cursor()
-    
-    # Tabla: trucks
-    cursor.execute("""
+# Filas por bloque al leer las fuentes: acota la memoria sin importar el tamaño del archivo
+CHUNKSIZE = 50_000
+
+
+# Schema canónico (DDL declarado, con claves primarias y foráneas).
+# Cada columna de tiempo ISO8601 tiene su par *_epoch (segundos Unix, INTEGER)
+# materializado por SQLite: los filtros por rango y las duraciones se hacen
+# sobre enteros indexados en lugar de parsear texto fila a fila.
+SCHEMA = {
+    "trucks": """
         CREATE TABLE IF NOT EXISTS trucks (
             truck_id TEXT PRIMARY KEY,
             plate TEXT,
@@ -34,19 +57,15 @@ def create_schema(conn):
             region TEXT,
             status TEXT
         )
-    """)
-    
-    # Tabla: drivers
-    cursor.execute("""
+    """,
+    "drivers": """
         CREATE TABLE IF NOT EXISTS drivers (
             driver_id TEXT PRIMARY KEY,
             name TEXT,
             license TEXT
         )
-    """)
-    
-    # Tabla: trips
-    cursor.execute("""
+    """,
+    "trips": """
         CREATE TABLE IF NOT EXISTS trips (
             trip_id TEXT PRIMARY KEY,
             truck_id TEXT,
@@ -56,12 +75,12 @@ def create_schema(conn):
             end_time TEXT,
             distance_km REAL,
             status TEXT,
+            start_time_epoch INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', start_time) AS INTEGER)) STORED,
+            end_time_epoch INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', end_time) AS INTEGER)) STORED,
             FOREIGN KEY (truck_id) REFERENCES trucks(truck_id)
         )
-    """)
-    
-    # Tabla: telemetry
-    cursor.execute("""
+    """,
+    "telemetry": """
         CREATE TABLE IF NOT EXISTS telemetry (
             telemetry_id TEXT PRIMARY KEY,
             truck_id TEXT,
@@ -69,12 +88,11 @@ def create_schema(conn):
             speed_kmh REAL,
             fuel_level REAL,
             engine_temp_c REAL,
+            timestamp_epoch INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', timestamp) AS INTEGER)) STORED,
             FOREIGN KEY (truck_id) REFERENCES trucks(truck_id)
         )
-    """)
-    
-    # Tabla: alerts
-    cursor.execute("""
+    """,
+    "alerts": """
         CREATE TABLE IF NOT EXISTS alerts (
             alert_id TEXT PRIMARY KEY,
             truck_id TEXT,
@@ -82,14 +100,413 @@ def create_schema(conn):
             alert_type TEXT,
             severity TEXT,
             description TEXT,
+            timestamp_epoch INTEGER GENERATED ALWAYS AS (CAST(strftime('%s', timestamp) AS INTEGER)) STORED,
             FOREIGN KEY (truck_id) REFERENCES trucks(truck_id)
         )
-    """)
+    """,
+}
+
+# Watermark por fuente para la carga incremental
+WATERMARKS_DDL = """
+    CREATE TABLE IF NOT EXISTS ingest_watermarks (
+        source TEXT PRIMARY KEY,
+        table_name TEXT,
+        watermark TEXT,
+        rows_upserted INTEGER,
+        updated_at TEXT
+    )
+"""
+
+# Índices para las consultas que realmente se ejecutan (ejemplos del prompt,
+# templates mock y paginación keyset). Se crean después de la carga masiva.
+# En las tablas particionadas se crean en cada partición (ver physical_indexes).
+INDEXES = {
+    "idx_telemetry_truck_ts": "telemetry (truck_id, timestamp)",
+    "idx_telemetry_ts": "telemetry (timestamp, telemetry_id)",
+    "idx_alerts_truck_ts": "alerts (truck_id, timestamp)",
+    "idx_alerts_ts": "alerts (timestamp, alert_id)",
+    "idx_alerts_type_ts": "alerts (alert_type, timestamp)",
+    "idx_alerts_severity_ts": "alerts (severity, timestamp)",
+    "idx_trips_status_end": "trips (status, end_time)",
+    "idx_trips_truck_start": "trips (truck_id, start_time)",
+    "idx_trips_start": "trips (start_time, trip_id)",
+    "idx_telemetry_epoch": "telemetry (timestamp_epoch)",
+    "idx_telemetry_truck_epoch": "telemetry (truck_id, timestamp_epoch)",
+    "idx_alerts_epoch": "alerts (timestamp_epoch)",
+    "idx_alerts_type_epoch": "alerts (alert_type, timestamp_epoch)",
+    "idx_trips_start_epoch": "trips (start_time_epoch)",
+    "idx_trips_status_end_epoch": "trips (status, end_time_epoch)",
+    "idx_trucks_region": "trucks (region)",
+    "idx_trucks_brand": "trucks (brand)",
+    "idx_trucks_driver": "trucks (driver_id)",
+}
+
+
+def table_ddl(table, name=None):
+    """DDL canónico de una tabla, creada con otro nombre si se indica (ej: una partición)"""
+    if name is None:
+        return SCHEMA[table]
+    return re.sub(rf"\bEXISTS {table} \(", f"EXISTS {name} (", SCHEMA[table], count=1)
+
+
+def table_columns(conn, table):
+    """Columnas de una tabla: {nombre: es_generada}"""
+    return {row[1]: row[6] != 0 for row in conn.execute(f"PRAGMA table_xinfo({table})")}
+
+
+def migrate_table(conn, table, ddl):
+    """
+    Recrea una tabla con su DDL canónico conservando los datos (SQLite no
+    permite agregar columnas generadas STORED con ALTER TABLE). Los índices
+    de la tabla vieja se descartan; build_indexes los vuelve a crear.
+    """
+    current = table_columns(conn, table)
+    conn.execute(f"ALTER TABLE {table} RENAME TO {table}_old")
+    conn.execute(ddl)
+    target = table_columns(conn, table)
+    
+    copied = ", ".join(c for c, generated in target.items() if not generated and c in current)
+    conn.execute(f"INSERT INTO {table} ({copied}) SELECT {copied} FROM {table}_old")
+    conn.execute(f"DROP TABLE {table}_old")
+
+
+def ensure_table(conn, name, ddl):
+    """Crea una tabla con su DDL canónico, recreando o migrando versiones anteriores"""
+    existing = conn.execute(
+        "SELECT sql FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone()
+    if existing and "PRIMARY KEY" not in existing[0]:
+        # Bases creadas por versiones anteriores (to_sql con replace) no tienen
+        # claves: se recrean, ya que la carga vuelve a escribir sus datos
+        print(f"♻️  Recreando {name} con el schema canónico")
+        conn.execute(f"DROP TABLE {name}")
+    elif existing:
+        # Tablas anteriores a una columna nueva del schema (ej: *_epoch)
+        probe = sqlite3.connect(":memory:")
+        probe.execute(ddl)
+        missing = set(table_columns(probe, name)) - set(table_columns(conn, name))
+        probe.close()
+        if missing:
+            print(f"♻️  Migrando {name} al schema canónico (+{', '.join(sorted(missing))})")
+            migrate_table(conn, name, ddl)
+    conn.execute(ddl)
+
+
+def ensure_partition(conn, table, month):
+    """
+    Crea la partición de un mes (None = default) si no existe.
+    
+    Returns:
+        (nombre de la partición, True si se creó)
+    """
+    name = PARTITIONS[table].partition_name(month)
+    exists = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+    ).fetchone()
+    if not exists:
+        conn.execute(table_ddl(table, name))
+    return name, not exists
+
+
+def create_partition_view(conn, table):
+    """(Re)crea la vista canónica sobre las particiones existentes"""
+    conn.execute(f"DROP VIEW IF EXISTS {table}")
+    conn.execute(view_sql(table, list(list_partitions(conn, PARTITIONS[table]).values())))
+
+
+def partition_table(conn, table):
+    """
+    Convierte una tabla de hechos sin particionar (bases anteriores) en
+    particiones mensuales, conservando los datos.
+    """
+    spec = PARTITIONS[table]
+    legacy = f"{table}_unpartitioned"
+    conn.execute(f"ALTER TABLE {table} RENAME TO {legacy}")
+    
+    current = table_columns(conn, legacy)
+    prefixes = [row[0] for row in conn.execute(f"SELECT DISTINCT substr({spec.time_column}, 1, 7) FROM {legacy}")]
+    for prefix in prefixes:
+        name, _ = ensure_partition(conn, table, partition_month(prefix))
+        copied = ", ".join(c for c, generated in table_columns(conn, name).items() if not generated and c in current)
+        conn.execute(
+            f"INSERT INTO {name} ({copied}) SELECT {copied} FROM {legacy} "
+            f"WHERE substr({spec.time_column}, 1, 7) IS ?",
+            (prefix,)
+        )
+    conn.execute(f"DROP TABLE {legacy}")
+    months = [month for month in list_partitions(conn, spec) if month is not None]
+    print(f"♻️  {table} particionada por mes ({len(months)} meses)")
+
+
+def create_partitioned(conn, table):
+    """Tabla particionada: particiones mensuales + default detrás de una vista canónica"""
+    existing = conn.execute("SELECT type, sql FROM sqlite_master WHERE name = ?", (table,)).fetchone()
+    if existing and existing[0] == "table":
+        if "PRIMARY KEY" in existing[1]:
+            partition_table(conn, table)
+        else:
+            print(f"♻️  Recreando {table} con el schema canónico")
+            conn.execute(f"DROP TABLE {table}")
+    
+    for name in list_partitions(conn, PARTITIONS[table]).values():
+        ensure_table(conn, name, table_ddl(table, name))
+    ensure_partition(conn, table, None)
+    create_partition_view(conn, table)
+
+
+def create_schema(conn):
+    """Crea el schema canónico en SQLite"""
+    print("🏗️  Creando schema canónico...")
+    
+    for table, ddl in SCHEMA.items():
+        if table in PARTITIONS:
+            create_partitioned(conn, table)
+        else:
+            ensure_table(conn, table, ddl)
+    conn.execute(WATERMARKS_DDL)
     
     conn.commit()
     print("✅ Schema creado exitosamente")
 
 
+def physical_indexes(conn):
+    """INDEXES con los de las tablas particionadas replicados en cada partición"""
+    indexes = {}
+    for name, definition in INDEXES.items():
+        table, columns = definition.split(" ", 1)
+        if table not in PARTITIONS:
+            indexes[name] = definition
+            continue
+        # idx_telemetry_ts → idx_telemetry_2025_10_ts
+        for partition in list_partitions(conn, PARTITIONS[table]).values():
+            indexes[name.replace(f"idx_{table}_", f"idx_{partition}_", 1)] = f"{partition} {columns}"
+    return indexes
+
+
+def drop_indexes(conn):
+    """Elimina los índices secundarios para que la carga masiva no los mantenga fila a fila"""
+    cursor = conn.cursor()
+    for name in physical_indexes(conn):
+        cursor.execute(f"DROP INDEX IF EXISTS {name}")
+    conn.commit()
+
+
+def build_indexes(conn, analyze=True):
+    """
+    Crea los índices secundarios y actualiza las estadísticas del planner.
+    En cargas incrementales (analyze=False) PRAGMA optimize solo re-analiza
+    las tablas cuyas estadísticas quedaron desactualizadas.
+    """
+    print("\n🗂️  Creando índices...")
+    
+    cursor = conn.cursor()
+    existing = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    indexes = physical_indexes(conn)
+    for name, definition in indexes.items():
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {definition}")
+    
+    # sqlite_stat1 mejora la elección de índices (y la compuerta de costo del backend);
+    # un índice nuevo (ej: de una partición nueva) todavía no tiene estadísticas
+    if analyze:
+        cursor.execute("ANALYZE")
+    else:
+        for table in sorted({d.split(" ", 1)[0] for n, d in indexes.items() if n not in existing}):
+            cursor.execute(f"ANALYZE {table}")
+        cursor.execute("PRAGMA optimize")
+    conn.commit()
+    print(f"✅ {len(indexes)} índices creados")
+
+
+def replace_rows(conn, table, df):
+    """
+    Reemplaza el contenido de una tabla conservando su DDL.
+    (to_sql con if_exists="replace" recrearía la tabla sin claves ni índices)
+    """
+    conn.execute(f"DELETE FROM {table}")
+    df.to_sql(table, conn, if_exists="append", index=False)
+
+
+def upsert_rows(conn, table, df, key, time_column):
+    """
+    Inserta o actualiza (por clave primaria) solo las filas del DataFrame que
+    son nuevas o difieren de las guardadas. Las filas que ya no vienen en la
+    fuente no se borran. En las tablas particionadas cada fila va a la
+    partición de su mes.
+    
+    Returns:
+        (cantidad de filas escritas, días (YYYY-MM-DD) afectados, antes y
+        después del cambio, para refrescar los rollups)
+    """
+    if table in PARTITIONS:
+        return upsert_partitioned(conn, table, df, key, time_column)
+    return upsert_table(conn, table, df, key, time_column)
+
+
+def upsert_partitioned(conn, table, df, key, time_column):
+    """
+    upsert_rows sobre una tabla particionada: cada mes se escribe en su
+    partición (creándola si hace falta). Una fila cuyo timestamp cambió de
+    mes se borra de la partición anterior.
+    """
+    upserted, days = 0, set()
+    if df.empty:
+        return upserted, days
+    
+    months = df[time_column].map(partition_month)
+    created = False
+    for month, rows in df.groupby(months.fillna(""), sort=True):
+        name, new_partition = ensure_partition(conn, table, month or None)
+        created |= new_partition
+        
+        # Claves que la partición destino no tiene: podrían estar en otra partición
+        conn.execute("DROP TABLE IF EXISTS temp._incoming_keys")
+        conn.execute("CREATE TEMP TABLE _incoming_keys (k TEXT PRIMARY KEY)")
+        conn.executemany("INSERT OR IGNORE INTO temp._incoming_keys VALUES (?)", ((k,) for k in rows[key]))
+        conn.execute(f"DELETE FROM temp._incoming_keys WHERE k IN (SELECT {key} FROM {name})")
+        if conn.execute("SELECT 1 FROM temp._incoming_keys LIMIT 1").fetchone():
+            for other in list_partitions(conn, PARTITIONS[table]).values():
+                if other == name:
+                    continue
+                moved = f"{key} IN (SELECT k FROM temp._incoming_keys)"
+                days |= {row[0] for row in conn.execute(
+                    f"SELECT DISTINCT substr({time_column}, 1, 10) FROM {other} "
+                    f"WHERE {moved} AND {time_column} IS NOT NULL"
+                )}
+                conn.execute(f"DELETE FROM {other} WHERE {moved}")
+        conn.execute("DROP TABLE temp._incoming_keys")
+        
+        count, partition_days = upsert_table(conn, name, rows, key, time_column)
+        upserted += count
+        days |= partition_days
+    
+    if created:
+        create_partition_view(conn, table)
+    return upserted, days
+
+
+def upsert_table(conn, table, df, key, time_column):
+    """upsert_rows sobre una tabla física"""
+    if df.empty:
+        return 0, set()
+    
+    columns = list(df.columns)
+    column_list = ", ".join(columns)
+    staging = f"_staging_{table}"
+    changed = f"_changed_{table}"
+    
+    # Staging con la misma afinidad de tipos que la tabla destino, para que
+    # la comparación con las filas guardadas no dé falsos cambios (70 vs 70.0)
+    conn.execute(f"DROP TABLE IF EXISTS temp.{staging}")
+    conn.execute(f"CREATE TEMP TABLE {staging} AS SELECT {column_list} FROM {table} WHERE 0")
+    rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+    conn.executemany(
+        f"INSERT INTO temp.{staging} ({column_list}) VALUES ({', '.join('?' * len(columns))})", rows
+    )
+    
+    differs = " OR ".join(f"t.{c} IS NOT s.{c}" for c in columns if c != key)
+    conn.execute(f"DROP TABLE IF EXISTS temp.{changed}")
+    conn.execute(f"""
+        CREATE TEMP TABLE {changed} AS
+        SELECT DISTINCT s.{key} AS k FROM temp.{staging} s
+        LEFT JOIN {table} t ON t.{key} = s.{key}
+        WHERE t.{key} IS NULL OR {differs}
+    """)
+    
+    days = set()
+    for source in (table, f"temp.{staging}"):
+        cursor = conn.execute(f"""
+            SELECT DISTINCT substr(x.{time_column}, 1, 10) FROM {source} x
+            WHERE x.{key} IN (SELECT k FROM temp.{changed}) AND x.{time_column} IS NOT NULL
+        """)
+        days |= {row[0] for row in cursor}
+    
+    updates = ", ".join(f"{c} = excluded.{c}" for c in columns if c != key)
+    # El WHERE es obligatorio: sin él SQLite leería ON CONFLICT como condición de join
+    conn.execute(f"""
+        INSERT INTO {table} ({column_list})
+        SELECT {column_list} FROM temp.{staging}
+        WHERE {key} IN (SELECT k FROM temp.{changed})
+        ON CONFLICT({key}) DO UPDATE SET {updates}
+    """)
+    upserted = conn.execute(f"SELECT COUNT(*) FROM temp.{changed}").fetchone()[0]
+    
+    conn.execute(f"DROP TABLE temp.{staging}")
+    conn.execute(f"DROP TABLE temp.{changed}")
+    return upserted, days
+
+
+def get_watermark(conn, source):
+    """Último watermark guardado para una fuente (None si nunca se cargó)"""
+    row = conn.execute("SELECT watermark FROM ingest_watermarks WHERE source = ?", (source,)).fetchone()
+    return row[0] if row else None
+
+
+def set_watermark(conn, source, table, watermark, rows_upserted):
+    """Guarda el watermark de una fuente (en la misma transacción que sus datos)"""
+    conn.execute(
+        """
+        INSERT INTO ingest_watermarks (source, table_name, watermark, rows_upserted, updated_at)
+        VALUES (?, ?, ?, ?, strftime('%Y-%m-%dT%H:%M:%SZ', 'now'))
+        ON CONFLICT(source) DO UPDATE SET
+            table_name = excluded.table_name, watermark = excluded.watermark,
+            rows_upserted = excluded.rows_upserted, updated_at = excluded.updated_at
+        """,
+        (source, table, watermark, rows_upserted)
+    )
+
+
+def transform_source(index, adapter_class, source_path, table_name, watermark, chunksize, queue):
+    """
+    Parte CPU de la carga de una fuente: lectura y transformación por bloques
+    desde el watermark. No toca SQLite: corre en un proceso del pool y manda
+    cada bloque por la cola al escritor.
+    
+    Returns:
+        Nuevo watermark de la fuente
+    """
+    new_watermark = watermark
+    for df, new_watermark in adapter_class().process_chunks(source_path, table_name, watermark, chunksize):
+        queue.put((index, df))
+    queue.put((index, None))  # fin de la fuente
+    return new_watermark
+
+
+def write_chunk(conn, adapter, table_name, df):
+    """
+    Escribe un bloque del delta de una fuente en su propia transacción.
+    
+    Returns:
+        (filas escritas, días afectados en la tabla destino)
+    """
+    config = adapter.incremental_config()
+    upserted, days = upsert_rows(conn, table_name, df, config["key"], config["watermark"])
+    conn.commit()
+    return upserted, days
+
+
+def load_incremental(conn, adapter, source_path, table_name, full=False, chunksize=None):
+    """
+    Procesa una fuente desde su watermark y hace upsert del delta, bloque a
+    bloque. El watermark avanza recién con todos los bloques escritos: si la
+    carga se corta, la próxima corrida relee ese tramo (el upsert es idempotente).
+    
+    Returns:
+        (filas escritas, días afectados en la tabla destino)
+    """
+    watermark = None if full else get_watermark(conn, adapter.source_name)
+    upserted, days = 0, set()
+    
+    new_watermark = watermark
+    for df, new_watermark in adapter.process_chunks(source_path, table_name, watermark, chunksize):
+        chunk_upserted, chunk_days = write_chunk(conn, adapter, table_name, df)
+        upserted += chunk_upserted
+        days |= chunk_days
+    
+    set_watermark(conn, adapter.source_name, table_name, new_watermark, upserted)
+    conn.commit()
+    return upserted, days
+
+
 def load_master_data(conn):
     """Carga datos maestros (trucks y drivers)"""
     print("\n📊 Cargando datos maestros...")
@@ -97,62 +514,125 @@ def load_master_data(conn):
     # Cargar trucks
     if os.path.exists("data/master_trucks.csv"):
         df_trucks = pd.read_csv("data/master_trucks.csv")
-        df_trucks.to_sql("trucks", conn, if_exists="replace", index=False)
+        replace_rows(conn, "trucks", df_trucks)
         print(f"✅ Cargados {len(df_trucks)} camiones")
     
     # Cargar drivers
     if os.path.exists("data/master_drivers.csv"):
         df_drivers = pd.read_csv("data/master_drivers.csv")
-        df_drivers.to_sql("drivers", conn, if_exists="replace", index=False)
+        replace_rows(conn, "drivers", df_drivers)
         print(f"✅ Cargados {len(df_drivers)} conductores")
 
 
-def load_tera_data(conn):
-    """Carga datos de Tera (trips)"""
-    print("\n📦 Procesando datos de Tera...")
+def load_sources(conn, full=False, chunksize=CHUNKSIZE):
+    """
+    Carga las fuentes de hechos una tras otra.
+    
+    Returns:
+        Días afectados por tabla destino
+    """
+    changed_days = {table: set() for _, _, table, _ in SOURCES}
     
-    adapter = TeraAdapter()
-    df = adapter.process("data/tera_trips.csv", "trips")
+    for adapter_class, source_path, table_name, label in SOURCES:
+        adapter = adapter_class()
+        print(f"\n📦 Procesando datos de {adapter.source_name}...")
+        upserted, days = load_incremental(conn, adapter, source_path, table_name, full, chunksize)
+        changed_days[table_name] |= days
+        print(f"✅ Insertados o actualizados {upserted} {label}")
     
-    # Insertar en SQLite
-    df.to_sql("trips", conn, if_exists="replace", index=False)
-    print(f"✅ Insertados {len(df)} viajes")
+    return changed_days
 
 
-def load_cloudfleet_data(conn):
-    """Carga datos de Cloudfleet (telemetry)"""
-    print("\n📡 Procesando datos de Cloudfleet...")
+def load_sources_parallel(conn, full=False, workers=None, chunksize=CHUNKSIZE):
+    """
+    Carga las fuentes de hechos con la lectura y transformación en paralelo
+    (un proceso por fuente). Este proceso es el único escritor: toma de la
+    cola cada bloque transformado a medida que llega y lo escribe en una
+    transacción, así el tiempo total se acerca al de la fuente más lenta y
+    no a la suma de todas.
     
-    adapter = CloudfleetAdapter()
-    df = adapter.process("data/cloudfleet_positions.csv", "telemetry")
+    Returns:
+        Días afectados por tabla destino
+    """
+    changed_days = {table: set() for _, _, table, _ in SOURCES}
+    adapters = [adapter_class() for adapter_class, _, _, _ in SOURCES]
+    upserted = [0] * len(SOURCES)
+    print(f"\n⚡ Procesando {len(SOURCES)} fuentes en paralelo ({workers or 'auto'} procesos)...")
+    
+    # El Manager se cierra antes que el pool: si el escritor falla, los
+    # procesos bloqueados en la cola reciben un error en lugar de colgarse
+    with ProcessPoolExecutor(max_workers=workers) as pool, Manager() as manager:
+        # Cola acotada: los procesos esperan si el escritor va más lento
+        queue = manager.Queue(maxsize=2 * len(SOURCES))
+        futures = []
+        for index, (adapter_class, source_path, table_name, _) in enumerate(SOURCES):
+            watermark = None if full else get_watermark(conn, adapters[index].source_name)
+            futures.append(pool.submit(
+                transform_source, index, adapter_class, source_path, table_name, watermark, chunksize, queue
+            ))
+        
+        pending = set(range(len(SOURCES)))
+        while pending:
+            try:
+                index, df = queue.get(timeout=1)
+            except Empty:
+                # Un proceso que falló no manda su fin de fuente: propagar su error
+                for future in futures:
+                    if future.done():
+                        future.result()
+                continue
+            
+            adapter = adapters[index]
+            _, _, table_name, label = SOURCES[index]
+            if df is None:
+                set_watermark(conn, adapter.source_name, table_name, futures[index].result(), upserted[index])
+                conn.commit()
+                pending.discard(index)
+                print(f"✅ {adapter.source_name}: insertados o actualizados {upserted[index]} {label}")
+                continue
+            
+            chunk_upserted, days = write_chunk(conn, adapter, table_name, df)
+            upserted[index] += chunk_upserted
+            changed_days[table_name] |= days
     
-    # Insertar en SQLite (append para no sobrescribir datos de Scania)
-    df.to_sql("telemetry", conn, if_exists="append", index=False)
-    print(f"✅ Insertados {len(df)} registros de telemetría")
+    return changed_days
 
 
-def load_scania_data(conn):
-    """Carga datos de Scania (telemetry)"""
-    print("\n🚛 Procesando datos de Scania...")
+def refresh_rollups(conn, changed_days):
+    """
+    Actualiza los rollups diarios (por camión/día) solo para los días que
+    cambiaron en cada tabla de hechos. Un rollup que todavía no existe (o
+    una carga completa) lo reconstruye entero.
+    """
+    print("\n📈 Actualizando rollups diarios...")
     
-    adapter = ScaniaAdapter()
-    df = adapter.process("data/scania_metrics.csv", "telemetry")
+    for source, spec in ROLLUPS.items():
+        exists = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (spec.table,)
+        ).fetchone()
+        days = changed_days.get(source, set()) if exists and changed_days is not None else None
+        refreshed = refresh_rollup(conn, spec, days)
+        conn.execute(f"ANALYZE {spec.table}")
+        if refreshed < 0:
+            print(f"✅ {spec.table}: reconstruido completo")
+        else:
+            print(f"✅ {spec.table}: {refreshed} días actualizados")
     
-    # Insertar en SQLite (append)
-    df.to_sql("telemetry", conn, if_exists="append", index=False)
-    print(f"✅ Insertados {len(df)} registros de telemetría")
+    conn.commit()
 
 
-def load_keeper_data(conn):
-    """Carga datos de Keeper (alerts)"""
-    print("\n🚨 Procesando datos de Keeper...")
-    
-    adapter = KeeperAdapter()
-    df = adapter.process("data/keeper_alerts.csv", "alerts")
-    
-    # Insertar en SQLite
-    df.to_sql("alerts", conn, if_exists="replace", index=False)
-    print(f"✅ Insertados {len(df)} alertas")
+def bump_dataset_version(conn):
+    """
+    Incrementa la versión del dataset (PRAGMA user_version).
+    El backend la usa como parte de la clave del cache de resultados,
+    así que cada carga invalida los resultados cacheados.
+    """
+    cursor = conn.cursor()
+    version = cursor.execute("PRAGMA user_version").fetchone()[0] + 1
+    cursor.execute(f"PRAGMA user_version = {int(version)}")
+    conn.commit()
+    print(f"🔖 Versión del dataset: {version}")
+    return version
 
 
 def show_summary(conn):
@@ -163,16 +643,16 @@ def show_summary(conn):
     
     cursor = conn.cursor()
     
-    tables = ["trucks", "drivers", "trips", "telemetry", "alerts"]
+    tables = ["trucks", "drivers", "trips", "telemetry", "alerts"] + [s.table for s in ROLLUPS.values()]
     for table in tables:
         cursor.execute(f"SELECT COUNT(*) FROM {table}")
         count = cursor.fetchone()[0]
-        print(f"  {table:15s}: {count:5d} registros")
+        print(f"  {table:22s}: {count:5d} registros")
     
     print("=" * 50)
 
 
-def main():
+def main(full=False, workers=None, chunksize=CHUNKSIZE):
     print("=" * 50)
     print("🔄 Carga de Datos - LogiQ AI")
     print("=" * 50)
@@ -181,17 +661,32 @@ def main():
     conn = sqlite3.connect(DB_PATH)
     
     try:
-        # Crear schema
         create_schema(conn)
         
+        # Primera carga o --full: carga masiva sin índices (se reconstruyen al final)
+        full = full or not conn.execute("SELECT 1 FROM ingest_watermarks").fetchone()
+        if full:
+            print("🧱 Carga completa (se ignoran los watermarks)")
+            drop_indexes(conn)
+        
         # Cargar datos maestros
         load_master_data(conn)
         
-        # Cargar datos de fuentes usando adapters
-        load_tera_data(conn)
-        load_cloudfleet_data(conn)
-        load_scania_data(conn)
-        load_keeper_data(conn)
+        # Cargar datos de fuentes usando adapters (cada carga informa los días que tocó)
+        workers = workers or min(len(SOURCES), os.cpu_count() or 1)
+        if workers == 1:
+            changed_days = load_sources(conn, full, chunksize)
+        else:
+            changed_days = load_sources_parallel(conn, full, workers, chunksize)
+        
+        # Índices y estadísticas sobre los datos ya cargados
+        build_indexes(conn, analyze=full)
+        
+        # Rollups diarios de KPIs (solo los días modificados)
+        refresh_rollups(conn, None if full else changed_days)
+        
+        # Invalidar caches del backend
+        bump_dataset_version(conn)
         
         # Mostrar resumen
         show_summary(conn)
@@ -210,4 +705,13 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Carga de datos LogiQ AI")
+    parser.add_argument("--full", action="store_true",
+                        help="Reprocesa todas las fuentes ignorando los watermarks")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="Procesos para leer y transformar fuentes (1 = secuencial; "
+                             "por defecto uno por fuente)")
+    parser.add_argument("--chunksize", type=int, default=CHUNKSIZE,
+                        help="Filas por bloque al leer y escribir cada fuente")
+    args = parser.parse_args()
+    main(full=args.full, workers=args.workers, chunksize=args.chunksize)
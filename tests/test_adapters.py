@@ -10,7 +10,7 @@ import os
 # Agregar directorio raíz al path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from adapters import TeraAdapter, CloudfleetAdapter, ScaniaAdapter, KeeperAdapter
+from adapters import TeraAdapter, CloudfleetAdapter, ScaniaAdapter, KeeperAdapter, ParquetAdapter, JSONLinesAdapter
 
 
 def test_tera_adapter():
@@ -119,5 +119,167 @@ def test_adapter_missing_field():
     assert pd.isna(result['fuel_level'].iloc[0]) or result['fuel_level'].iloc[0] is None
 
 
+def test_csv_adapter_chunks(tmp_path):
+    """Procesar por bloques da lo mismo que procesar el archivo completo"""
+    adapter = CloudfleetAdapter()
+    source = tmp_path / "positions.csv"
+    pd.DataFrame({
+        'position_id': [f'CF{i:03d}' for i in range(5)],
+        'truck_code': ['TRUCK_001'] * 5,
+        'recorded_at': [f'2025-10-2{i}T08:00:00Z' for i in range(5)],
+        'speed_kph': [80 + i for i in range(5)],
+        'fuel_percentage': [50] * 5
+    }).to_csv(source, index=False)
+    
+    chunks = list(adapter.process_chunks(str(source), 'telemetry', chunksize=2))
+    whole, watermark = adapter.process_incremental(str(source), 'telemetry', None)
+    
+    assert [len(df) for df, _ in chunks] == [2, 2, 1]
+    assert chunks[-1][1] == watermark == '2025-10-24T08:00:00Z'
+    pd.testing.assert_frame_equal(pd.concat([df for df, _ in chunks], ignore_index=True), whole)
+
+
+def test_timestamp_fast_path():
+    """Los timestamps canónicos no se re-formatean; solo el resto va por la ruta lenta"""
+    adapter = TeraAdapter()
+    
+    test_data = pd.DataFrame({
+        'trip_id': ['T001', 'T002', 'T003'],
+        'departure_time': ['2025-10-20T08:00:00Z', '2025-10-20 08:00:00-03:00', '2025-10-20T09:30:00Z'],
+        'arrival_time': ['2025-10-20T12:00:00Z', None, '2025-10-20T15:00:00Z'],
+    })
+    
+    result = adapter.transform(test_data, 'trips')
+    
+    assert list(result['start_time']) == ['2025-10-20T08:00:00Z', '2025-10-20T11:00:00Z', '2025-10-20T09:30:00Z']
+    assert result['end_time'].iloc[0] == '2025-10-20T12:00:00Z'
+    assert adapter.slow_path_rows == 1
+
+
+def test_timestamp_slow_path_mixed_resolutions():
+    """Fracciones de segundo y epochs numéricos pasan por la ruta lenta sin abortar la carga"""
+    adapter = TeraAdapter()
+    
+    test_data = pd.DataFrame({
+        'trip_id': ['T001', 'T002', 'T003', 'T004'],
+        'departure_time': ['2025-10-20T08:00:00Z', '2025-10-20T08:00:00.123Z', 1760947200, 'no es fecha'],
+        'arrival_time': [1760958000.5, '2025-10-20T12:00:00Z', None, '2025-10-20T12:00:00Z'],
+    })
+    
+    result = adapter.transform(test_data, 'trips')
+    
+    assert list(result['start_time']) == [
+        '2025-10-20T08:00:00Z', '2025-10-20T08:00:00Z', '2025-10-20T08:00:00Z', 'no es fecha'
+    ]
+    assert result['end_time'].iloc[0] == '2025-10-20T11:00:00Z'
+    assert adapter.slow_path_rows == 4
+
+
+def test_csv_reads_only_mapped_columns(tmp_path):
+    """Las columnas que el mapeo no usa (lat/lon, engine_rpm...) no se leen"""
+    adapter = ScaniaAdapter()
+    source = tmp_path / "metrics.csv"
+    pd.DataFrame({
+        'metric_id': ['S001'], 'vehicle_vin': ['TRUCK_001'], 'timestamp_utc': ['2025-10-20T08:00:00Z'],
+        'engine_temperature_celsius': [88], 'fuel_level_liters': [120], 'velocity_kmh': [85],
+        'engine_rpm': [1500], 'total_km': [297004]
+    }).to_csv(source, index=False)
+    
+    raw, = adapter.iter_source_data(str(source), None, adapter.source_columns('telemetry'))
+    (result, _), = adapter.process_chunks(str(source), 'telemetry')
+    
+    assert set(raw.columns) == {'metric_id', 'vehicle_vin', 'timestamp_utc',
+                                'engine_temperature_celsius', 'fuel_level_liters', 'velocity_kmh'}
+    assert result['speed_kmh'].iloc[0] == 85
+
+
+def test_parquet_adapter_projection(tmp_path):
+    """ParquetAdapter lee solo las columnas mapeadas, por bloques"""
+    pytest.importorskip("pyarrow")
+    
+    class CloudfleetParquetAdapter(ParquetAdapter):
+        def __init__(self):
+            super().__init__("mappings/cloudfleet_mapping.yaml")
+    
+    source = tmp_path / "positions.parquet"
+    pd.DataFrame({
+        'position_id': ['CF001', 'CF002', 'CF003'], 'truck_code': ['TRUCK_001'] * 3,
+        'recorded_at': ['2025-10-20T08:00:00Z', '2025-10-20T09:00:00Z', '2025-10-20T10:00:00Z'],
+        'speed_kph': [80, 90, 70], 'fuel_percentage': [75, 60, 50], 'lat': [-34.6] * 3, 'lon': [-58.4] * 3
+    }).to_parquet(source)
+    adapter = CloudfleetParquetAdapter()
+    
+    raw = list(adapter.iter_source_data(str(source), 2, adapter.source_columns('telemetry')))
+    chunks = list(adapter.process_chunks(str(source), 'telemetry', chunksize=2))
+    
+    assert [len(df) for df in raw] == [2, 1]
+    assert 'lat' not in raw[0].columns
+    assert list(pd.concat([df for df, _ in chunks])['speed_kmh']) == [80, 90, 70]
+    assert chunks[-1][1] == '2025-10-20T10:00:00Z'
+
+
+def test_arrow_ipc_adapter_projection(tmp_path):
+    """Arrow IPC (.feather) se lee con memory map, solo las columnas mapeadas y por bloques"""
+    pytest.importorskip("pyarrow")
+    
+    class KeeperArrowAdapter(ParquetAdapter):
+        def __init__(self):
+            super().__init__("mappings/keeper_mapping.yaml")
+    
+    source = tmp_path / "alerts.feather"
+    pd.DataFrame({
+        'alert_code': ['K1', 'K2', 'K3'], 'truck_identifier': ['TRUCK_001'] * 3,
+        'event_timestamp': ['2025-10-20T08:00:00Z', '2025-10-20T09:00:00.500Z', '2025-10-20T10:00:00Z'],
+        'alert_category': ['speed', 'fuel', 'engine'], 'priority_level': ['high', 'low', 'critical'],
+        'message': ['a', 'b', 'c'], 'internal_notes': ['x', 'y', 'z']
+    }).to_feather(source)
+    adapter = KeeperArrowAdapter()
+    
+    raw = list(adapter.iter_source_data(str(source), 2, adapter.source_columns('alerts')))
+    chunks = list(adapter.process_chunks(str(source), 'alerts', chunksize=2))
+    result = pd.concat([df for df, _ in chunks])
+    
+    assert [len(df) for df in raw] == [2, 1]
+    assert 'internal_notes' not in raw[0].columns
+    assert list(result['alert_id']) == ['K1', 'K2', 'K3']
+    assert result['timestamp'].iloc[1] == '2025-10-20T09:00:00Z'
+    assert chunks[-1][1] == '2025-10-20T10:00:00Z'
+
+
+def test_json_lines_adapter_nested_paths(tmp_path):
+    """JSON Lines por bloques, con campos anidados y líneas inválidas salteadas"""
+    mapping = tmp_path / "keeper_api_mapping.yaml"
+    mapping.write_text(
+        "alerts:\n"
+        "  alert_id: id\n"
+        "  truck_id: vehicle.id\n"
+        "  timestamp: event.time\n"
+        "  alert_type: event.type\n"
+        "  severity: event.severity\n"
+        "  description: event.message\n"
+        "incremental:\n"
+        "  key: alert_id\n"
+        "  watermark: timestamp\n"
+    )
+    source = tmp_path / "alerts.jsonl"
+    source.write_text(
+        '{"id": "A1", "vehicle": {"id": "TRUCK_001"}, "event": {"time": "2025-10-20T08:00:00Z", "type": "speed"}}\n'
+        '\n'
+        '{"id": "A2", "vehicle": null, "event": {"time": "2025-10-20T09:00:00Z", "severity": "high"}}\n'
+        '{"id": "A3", "vehicle": {"id": "TRUCK_002"}, "event": {"time": "2025-10-20T10:0\n'
+    )
+    adapter = JSONLinesAdapter(str(mapping))
+    
+    chunks = list(adapter.process_chunks(str(source), 'alerts', chunksize=1))
+    result = pd.concat([df for df, _ in chunks], ignore_index=True)
+    
+    assert len(chunks) == 2
+    assert list(result['alert_id']) == ['A1', 'A2']
+    assert list(result['truck_id']) == ['TRUCK_001', None]
+    assert result['severity'].iloc[1] == 'high'
+    assert chunks[-1][1] == '2025-10-20T09:00:00Z'
+    assert adapter.malformed_lines == 1
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
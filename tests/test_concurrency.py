@@ -0,0 +1,93 @@
+"""
+Tests para el control de admisión y los pools de workers
+"""
+
+import pytest
+import asyncio
+import threading
+import sys
+import os
+
+# Agregar directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.lib.concurrency import (
+    AdmissionController, AdmissionRejected, create_executor, run_in_executor, retry_after_header
+)
+
+
+def test_admission_rejects_when_queue_full():
+    """Con los turnos ocupados y la cola llena, se rechaza de inmediato"""
+
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, max_queue=1, queue_timeout_s=5)
+        release = asyncio.Event()
+
+        async def hold():
+            async with admission.admit():
+                await release.wait()
+
+        running = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+        queued = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(AdmissionRejected):
+            async with admission.admit():
+                pass
+
+        release.set()
+        await asyncio.gather(running, queued)
+        return admission.status()
+
+    status = asyncio.run(scenario())
+    assert status["rejected"] == 1
+    assert status["running"] == 0
+
+
+def test_admission_queue_timeout():
+    """Una request que espera más que queue_timeout_s se rechaza"""
+
+    async def scenario():
+        admission = AdmissionController(max_concurrent=1, max_queue=5, queue_timeout_s=0.05)
+        release = asyncio.Event()
+
+        async def hold():
+            async with admission.admit():
+                await release.wait()
+
+        running = asyncio.create_task(hold())
+        await asyncio.sleep(0.01)
+
+        with pytest.raises(AdmissionRejected) as exc_info:
+            async with admission.admit():
+                pass
+
+        release.set()
+        await running
+        return exc_info.value
+
+    error = asyncio.run(scenario())
+    assert error.retry_after_s > 0
+
+
+def test_run_in_executor_uses_dedicated_pool():
+    """Las funciones bloqueantes corren en el pool indicado"""
+    executor = create_executor(1, "test")
+
+    async def scenario():
+        return await run_in_executor(executor, lambda: threading.current_thread().name)
+
+    thread_name = asyncio.run(scenario())
+    executor.shutdown()
+    assert thread_name.startswith("logiq-test")
+
+
+def test_retry_after_header():
+    """Retry-After se expresa en segundos enteros (mínimo 1)"""
+    assert retry_after_header(0.2) == {"Retry-After": "1"}
+    assert retry_after_header(2.5) == {"Retry-After": "3"}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
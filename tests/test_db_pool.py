@@ -0,0 +1,97 @@
+"""
+Tests para el pool de conexiones SQLite
+"""
+
+import pytest
+import sqlite3
+import threading
+import sys
+import os
+
+# Agregar directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.lib.db_pool import SQLiteConnectionPool, SQLitePoolTimeout
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    """Base de datos mínima con la tabla trucks"""
+    path = str(tmp_path / "pool.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE trucks (truck_id TEXT PRIMARY KEY)")
+    conn.executemany("INSERT INTO trucks VALUES (?)", [("TRUCK_001",), ("TRUCK_002",)])
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_pool_reuses_connections(db_path):
+    """Las conexiones se mantienen abiertas entre usos"""
+    pool = SQLiteConnectionPool(db_path, size=2)
+
+    with pool.connection() as conn:
+        first = conn
+        assert conn.execute("SELECT COUNT(*) FROM trucks").fetchone()[0] == 2
+
+    with pool.connection() as conn:
+        assert conn is first
+
+    assert pool.status()["created"] == 1
+    pool.close()
+
+
+def test_pool_is_read_only(db_path):
+    """Las conexiones del pool no pueden escribir"""
+    pool = SQLiteConnectionPool(db_path, size=1)
+
+    with pytest.raises(sqlite3.OperationalError):
+        with pool.connection() as conn:
+            conn.execute("INSERT INTO trucks VALUES ('TRUCK_003')")
+
+    pool.close()
+
+
+def test_pool_reentrant_same_thread(db_path):
+    """Un thread que ya tiene conexión recibe la misma"""
+    pool = SQLiteConnectionPool(db_path, size=1, acquire_timeout_s=0.1)
+
+    with pool.connection() as outer:
+        with pool.connection() as inner:
+            assert inner is outer
+
+
+def test_pool_size_is_bounded(db_path):
+    """Con el pool agotado, otro thread espera y falla por timeout"""
+    pool = SQLiteConnectionPool(db_path, size=1, acquire_timeout_s=0.1)
+    errors = []
+
+    def worker():
+        try:
+            with pool.connection():
+                pass
+        except SQLitePoolTimeout as e:
+            errors.append(e)
+
+    with pool.connection():
+        thread = threading.Thread(target=worker)
+        thread.start()
+        thread.join()
+
+    assert len(errors) == 1
+
+
+def test_pool_recycles_old_connections(db_path):
+    """Las conexiones que superan la edad máxima se reemplazan"""
+    pool = SQLiteConnectionPool(db_path, size=1, max_age_s=0)
+
+    with pool.connection() as conn:
+        first = conn
+    with pool.connection() as conn:
+        assert conn is not first
+
+    assert pool.status()["recycled"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
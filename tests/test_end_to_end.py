@@ -4,6 +4,7 @@ Tests end-to-end del sistema completo
 
 import pytest
 import requests
+import json
 import time
 import subprocess
 import sys
@@ -200,6 +201,82 @@ def test_query_endpoint_multiple_queries(api_server):
         assert data["rows_count"] >= 0
 
 
+def test_query_endpoint_compact_formats(api_server):
+    """Test formatos compact y columnar de /query"""
+    nl = "Mostrar las 10 últimas alertas críticas"
+    
+    rows_response = requests.post(
+        f"{API_URL}/query", json={"user": "test_user", "nl": nl}, timeout=TIMEOUT
+    ).json()
+    
+    compact = requests.post(
+        f"{API_URL}/query", json={"user": "test_user", "nl": nl, "format": "compact"}, timeout=TIMEOUT
+    ).json()
+    assert compact["format"] == "compact"
+    assert compact["rows_count"] == rows_response["rows_count"]
+    assert [dict(zip(compact["columns"], row)) for row in compact["rows"]] == rows_response["rows"]
+    
+    columnar = requests.post(
+        f"{API_URL}/query", json={"user": "test_user", "nl": nl, "format": "columnar"}, timeout=TIMEOUT
+    ).json()
+    assert len(columnar["data"]) == len(columnar["columns"])
+    assert all(len(values) == columnar["rows_count"] for values in columnar["data"])
+
+
+def test_query_endpoint_pagination(api_server):
+    """Test paginación keyset con /query + /query/page"""
+    payload = {
+        "user": "test_user",
+        "nl": "Mostrar las 10 últimas alertas críticas",
+        "page_size": 3
+    }
+    
+    response = requests.post(f"{API_URL}/query", json=payload, timeout=TIMEOUT)
+    assert response.status_code == 200
+    data = response.json()
+    assert data["rows_count"] <= 3
+    
+    alert_ids = [row["alert_id"] for row in data["rows"]]
+    cursor = data["next_cursor"]
+    while cursor:
+        page = requests.post(f"{API_URL}/query/page", json={"cursor": cursor}, timeout=TIMEOUT).json()
+        alert_ids.extend(row["alert_id"] for row in page["rows"])
+        cursor = page["next_cursor"]
+    
+    assert len(alert_ids) == len(set(alert_ids))
+    assert len(alert_ids) <= 10
+
+
+def test_query_stream_endpoint(api_server):
+    """Test del endpoint /query/stream (NDJSON)"""
+    payload = {
+        "user": "test_user",
+        "nl": "Mostrar las 10 últimas alertas críticas"
+    }
+    
+    response = requests.post(
+        f"{API_URL}/query/stream",
+        json=payload,
+        timeout=TIMEOUT,
+        stream=True
+    )
+    
+    assert response.status_code == 200
+    records = [json.loads(line) for line in response.iter_lines() if line]
+    
+    # Primero SQL y columnas, al final el resumen
+    assert records[0]["type"] == "meta"
+    assert "alerts" in records[0]["sql"].lower()
+    assert records[-1]["type"] == "end"
+    
+    streamed_rows = sum(len(r["rows"]) for r in records if r["type"] == "rows")
+    assert streamed_rows == records[-1]["rows_count"]
+    
+    for record in records:
+        if record["type"] == "rows":
+            assert all(len(row) == len(records[0]["columns"]) for row in record["rows"])
+
+
 def test_logs_endpoint(api_server):
     """Test del endpoint /logs"""
     # Primero hacer una query para generar un log
@@ -0,0 +1,142 @@
+"""
+Tests para los motores de ejecución y el router SQLite / columnar
+"""
+
+import pytest
+import sqlite3
+import threading
+import time
+import sys
+import os
+
+# Agregar directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.lib.engines import (
+    DuckDBEngine, EngineRouter, SQLiteEngine, fold_sqlite_constants, portable_sql
+)
+from backend.lib.query_budget import QueryBudget, QueryBudgetExceeded
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE alerts (alert_id TEXT PRIMARY KEY, truck_id TEXT, severity TEXT, timestamp TEXT)")
+    conn.executemany(
+        "INSERT INTO alerts VALUES (?, ?, ?, ?)",
+        [(f"A{i}", f"TRUCK_00{i % 3}", "high" if i % 2 else "low", f"2025-10-{10 + i % 5}T08:00:00Z")
+         for i in range(30)]
+    )
+    return conn
+
+
+def budget():
+    return QueryBudget(max_seconds=0, max_steps=0)
+
+
+def test_fold_constant_date_calls(conn):
+    """Las funciones de fecha con argumentos constantes se reemplazan por su valor en SQLite"""
+    sql = "SELECT COUNT(*) FROM alerts WHERE timestamp >= date('2025-10-22', '-7 days') AND severity = 'date(x)'"
+    assert fold_sqlite_constants(conn, sql) == (
+        "SELECT COUNT(*) FROM alerts WHERE timestamp >= '2025-10-15' AND severity = 'date(x)'"
+    )
+
+
+@pytest.mark.parametrize("sql", [
+    # Función de fecha sobre una columna
+    "SELECT date(timestamp), COUNT(*) FROM alerts GROUP BY date(timestamp)",
+    # LIKE no distingue mayúsculas en SQLite
+    "SELECT COUNT(*) FROM alerts WHERE truck_id LIKE 'truck%'",
+])
+def test_sqlite_only_constructs_are_not_portable(conn, sql):
+    assert portable_sql(conn, sql) is None
+
+
+def test_router_keeps_sqlite_without_columnar_engine(conn):
+    router = EngineRouter(SQLiteEngine())
+    columns, rows, partial, engine = router.execute(
+        conn, 0, "SELECT severity, COUNT(*) FROM alerts GROUP BY severity", 10**9, budget()
+    )
+    assert engine == "sqlite"
+    assert columns == ["severity", "COUNT(*)"]
+    assert sorted(rows) == [("high", 15), ("low", 15)]
+    assert not partial
+
+
+def test_router_sends_only_heavy_aggregations_to_columnar(conn):
+    """Búsquedas puntuales y planes baratos quedan en SQLite"""
+    router = EngineRouter(SQLiteEngine(), columnar_engine=object(), min_cost=1000)
+    aggregation = "SELECT truck_id, COUNT(*) FROM alerts WHERE timestamp >= date('2025-10-12') GROUP BY truck_id"
+    assert router.route(conn, aggregation, 500) is None
+    assert router.route(conn, "SELECT * FROM alerts WHERE alert_id = 'A1'", 10**6) is None
+    assert router.route(conn, aggregation, 10**6) == (
+        "SELECT truck_id, COUNT(*) FROM alerts WHERE timestamp >= '2025-10-12' GROUP BY truck_id"
+    )
+
+
+def test_watch_interrupts_on_timeout():
+    """watch() llama a interrupt() al pasar max_seconds y lo reporta como presupuesto agotado"""
+    interrupted = threading.Event()
+    guarded = QueryBudget(max_seconds=0.1, max_steps=0)
+
+    with pytest.raises(QueryBudgetExceeded, match="0.1s"):
+        with guarded.watch(interrupted.set, poll_s=0.01):
+            # Simula un motor que termina con error al ser interrumpido
+            if not interrupted.wait(2):
+                pytest.fail("interrupt() no fue llamado")
+            raise RuntimeError("interrupted")
+
+
+def test_duckdb_matches_sqlite(tmp_path):
+    """La copia columnar devuelve lo mismo que SQLite, con la misma semántica"""
+    pytest.importorskip("duckdb")
+    db_path = str(tmp_path / "logiq.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE telemetry (telemetry_id TEXT PRIMARY KEY, truck_id TEXT, speed_kmh REAL, fuel_level INTEGER)")
+    conn.executemany(
+        "INSERT INTO telemetry VALUES (?, ?, ?, ?)",
+        [(f"T{i}", f"TRUCK_00{i % 4}" if i % 7 else None, 40 + i * 0.5, i % 9) for i in range(500)]
+    )
+    conn.commit()
+
+    engine = DuckDBEngine(db_path, ["telemetry"])
+    version = engine.build()
+    sql = ("SELECT truck_id, AVG(speed_kmh), SUM(fuel_level) / COUNT(*) AS int_ratio "
+           "FROM telemetry GROUP BY truck_id ORDER BY truck_id")
+
+    expected = conn.execute(sql).fetchall()
+    _, rows = engine.execute(version, sql, budget())
+
+    # NULL primero en ASC y división entera, como en SQLite
+    assert [(truck, ratio) for truck, _, ratio in rows] == [(truck, ratio) for truck, _, ratio in expected]
+    assert [avg for _, avg, _ in rows] == pytest.approx([avg for _, avg, _ in expected])
+
+
+def test_router_uses_sqlite_while_snapshot_warms(tmp_path):
+    """Mientras la copia de la versión actual no está lista, se responde desde SQLite"""
+    pytest.importorskip("duckdb")
+    db_path = str(tmp_path / "logiq.db")
+    conn = sqlite3.connect(db_path)
+    conn.execute("CREATE TABLE alerts (alert_id TEXT PRIMARY KEY, severity TEXT)")
+    conn.executemany("INSERT INTO alerts VALUES (?, ?)", [(f"A{i}", "high") for i in range(10)])
+    conn.commit()
+
+    router = EngineRouter(SQLiteEngine(), DuckDBEngine(db_path, ["alerts"]), min_cost=0)
+    sql = "SELECT severity, COUNT(*) FROM alerts GROUP BY severity"
+
+    *_, engine = router.execute(conn, 0, sql, 10, budget())
+    assert engine == "sqlite"
+    assert router.stats()["warming"] == 1
+
+    deadline = time.monotonic() + 10
+    while engine != "duckdb" and time.monotonic() < deadline:
+        time.sleep(0.05)
+        columns, rows, _, engine = router.execute(conn, 0, sql, 10, budget())
+    assert engine == "duckdb"
+    # Los nombres de columna son los de SQLite aunque responda DuckDB
+    assert columns == ["severity", "COUNT(*)"]
+    assert rows == [("high", 10)]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,172 @@
+"""
+Tests para las explicaciones memoizadas y diferidas
+"""
+
+import pytest
+import asyncio
+import sys
+import os
+
+# Agregar directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.lib.explanations import Explainer, ExplanationCache, ExplanationUnavailable
+from backend.lib.result_cache import CachedResult
+
+
+class FakeLLM:
+    """Generador de explicaciones que cuenta llamadas y puede demorar o fallar"""
+
+    def __init__(self, delay_s=0.0):
+        self.delay_s = delay_s
+        self.calls = 0
+        self.fail = False
+        self.model = "gemini-test"
+
+    async def generate(self, question, sql, rows):
+        self.calls += 1
+        await asyncio.sleep(self.delay_s)
+        if self.fail:
+            raise RuntimeError("LLM caído")
+        return f"{question}: {len(rows)} filas (llamada {self.calls})"
+
+
+def make_explainer(llm, **options):
+    return Explainer(
+        llm.generate, lambda: llm.model,
+        fallback=lambda question, sql, rows: "offline", **options
+    )
+
+
+def result(*rows):
+    return CachedResult(["truck_id", "alerts"], rows)
+
+
+def test_fingerprint_depends_on_content():
+    """Mismo contenido, misma huella; cualquier cambio la cambia"""
+    a = result(("TRUCK_001", 3), ("TRUCK_002", 1))
+    assert a.fingerprint == result(("TRUCK_001", 3), ("TRUCK_002", 1)).fingerprint
+    assert a.fingerprint != result(("TRUCK_001", 3), ("TRUCK_002", 2)).fingerprint
+    assert a.fingerprint != CachedResult(["truck_id", "total"], a.rows).fingerprint
+    assert a.fingerprint != CachedResult(a.columns, a.rows, partial=True).fingerprint
+
+
+def test_repeated_answers_are_memoized():
+    """Misma pregunta (normalizada), mismo SQL y mismo resultado: una sola llamada al LLM"""
+    llm = FakeLLM()
+    explainer = make_explainer(llm)
+    rows = result(("TRUCK_001", 3))
+
+    async def scenario():
+        first = await explainer.explain("¿Qué camión tiene más alertas?", "SELECT * FROM alerts;", rows)
+        again = await explainer.explain("que camion tiene mas alertas", "SELECT *  FROM alerts", result(("TRUCK_001", 3)))
+        changed = await explainer.explain("¿Qué camión tiene más alertas?", "SELECT * FROM alerts;", result(("TRUCK_001", 4)))
+        return first, again, changed
+
+    first, again, changed = asyncio.run(scenario())
+    assert first == again
+    assert changed != first
+    assert llm.calls == 2
+    assert explainer.stats()["hits"] == 1
+
+
+def test_model_is_part_of_the_key():
+    """Una explicación en modo mock no se sirve cuando el modelo real está listo"""
+    llm = FakeLLM()
+    llm.model = "mock"
+    explainer = make_explainer(llm)
+    rows = result(("TRUCK_001", 3))
+
+    async def scenario():
+        await explainer.explain("alertas", "SELECT 1", rows)
+        llm.model = "gemini-test"
+        await explainer.explain("alertas", "SELECT 1", rows)
+
+    asyncio.run(scenario())
+    assert llm.calls == 2
+
+
+def test_concurrent_identical_requests_share_the_call():
+    """Llamadas idénticas en curso se comparten"""
+    llm = FakeLLM(delay_s=0.05)
+    explainer = make_explainer(llm)
+
+    async def scenario():
+        return await asyncio.gather(*(
+            explainer.explain("alertas", "SELECT 1", result(("TRUCK_001", 3))) for _ in range(5)
+        ))
+
+    assert len(set(asyncio.run(scenario()))) == 1
+    assert llm.calls == 1
+    assert explainer.stats()["shared"] == 4
+
+
+def test_deferred_explanation_by_query_id():
+    """defer responde al instante con un query_id; wait entrega la explicación cuando está"""
+    llm = FakeLLM(delay_s=0.05)
+    explainer = make_explainer(llm)
+    rows = result(("TRUCK_001", 3))
+
+    async def scenario():
+        explanation, query_id = explainer.defer("alertas", "SELECT 1", rows)
+        assert explanation is None and query_id
+        assert await explainer.wait(query_id) is None
+        ready = await explainer.wait(query_id, timeout=2)
+        # Ya memoizada: la respuesta repetida la trae sin query_id
+        assert explainer.defer("alertas", "SELECT 1", rows) == (ready, None)
+        with pytest.raises(ExplanationUnavailable):
+            await explainer.wait("no-existe")
+        return ready
+
+    assert asyncio.run(scenario()) == "alertas: 1 filas (llamada 1)"
+    assert llm.calls == 1
+    assert explainer.stats()["deferred"] == 1
+
+
+def test_failures_fall_back_without_memoizing():
+    """Si el LLM falla se usa el fallback, pero la próxima vez se reintenta"""
+    llm = FakeLLM()
+    llm.fail = True
+    explainer = make_explainer(llm)
+    rows = result(("TRUCK_001", 3))
+
+    async def scenario():
+        failed = await explainer.explain("alertas", "SELECT 1", rows)
+        llm.fail = False
+        return failed, await explainer.explain("alertas", "SELECT 1", rows)
+
+    assert asyncio.run(scenario()) == ("offline", "alertas: 1 filas (llamada 2)")
+    assert explainer.stats()["failures"] == 1
+
+
+def test_jobs_expire_and_are_bounded():
+    """Los query_id vencen después de job_ttl_s y se descartan los más viejos"""
+    llm = FakeLLM(delay_s=10)
+    explainer = make_explainer(llm, max_jobs=2, job_ttl_s=0.05)
+
+    async def scenario():
+        ids = [explainer.defer(f"pregunta {i}", "SELECT 1", result(("TRUCK_001", i)))[1] for i in range(3)]
+        with pytest.raises(ExplanationUnavailable):
+            await explainer.wait(ids[0])
+        assert await explainer.wait(ids[2]) is None
+        await asyncio.sleep(0.1)
+        with pytest.raises(ExplanationUnavailable):
+            await explainer.wait(ids[2])
+
+    asyncio.run(scenario())
+    assert explainer.stats()["jobs"] == 0
+
+
+def test_cache_is_bounded():
+    """LRU: se descarta la entrada usada hace más tiempo"""
+    cache = ExplanationCache(max_entries=2)
+    cache.put(("a", "", "", ""), "A")
+    cache.put(("b", "", "", ""), "B")
+    assert cache.get(("a", "", "", "")) == "A"
+    cache.put(("c", "", "", ""), "C")
+    assert cache.get(("b", "", "", "")) is None
+    assert cache.stats()["evictions"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
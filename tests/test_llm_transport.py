@@ -0,0 +1,298 @@
+"""
+Tests para el transporte HTTP async del LLM, contra un endpoint generateContent local
+"""
+
+import pytest
+import asyncio
+import json
+import socket
+import threading
+import time
+import sys
+import os
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Agregar directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.lib.llm_transport import GeminiTransport, LLMTransportError
+from backend.lib.gemini_client import GeminiClient
+from backend.lib.result_cache import CachedResult
+
+
+class FakeGemini:
+    """
+    Servidor HTTP/1.1 (keep-alive) en 127.0.0.1. Cada request consume la
+    próxima respuesta de `script`: (status, texto, demora en segundos, headers).
+    Sin script responde 200 con `text` después de `delay_s`.
+    """
+
+    def __init__(self):
+        self.script = []
+        self.text = "SELECT * FROM trucks LIMIT 10;"
+        self.delay_s = 0.0
+        # (path, api key, prompt, puerto del cliente) de cada request
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                with fake._lock:
+                    fake.requests.append((
+                        self.path, self.headers.get("x-goog-api-key"),
+                        body["contents"][0]["parts"][0]["text"], self.client_address[1]
+                    ))
+                    fake.active += 1
+                    fake.max_active = max(fake.max_active, fake.active)
+                    status, text, delay, headers = fake.script.pop(0) if fake.script else (
+                        200, fake.text, fake.delay_s, {}
+                    )
+                try:
+                    time.sleep(delay)
+                    if status == 200:
+                        payload = {"candidates": [{"content": {"parts": [{"text": text}]}}]}
+                    else:
+                        payload = {"error": {"code": status, "message": text}}
+                    data = json.dumps(payload).encode()
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    for name, value in headers.items():
+                        self.send_header(name, value)
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # El cliente abandonó la request (timeout de lectura)
+                    self.close_connection = True
+                finally:
+                    with fake._lock:
+                        fake.active -= 1
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def fake():
+    server = FakeGemini()
+    yield server
+    server.close()
+
+
+def make_transport(url, **options):
+    defaults = dict(connect_timeout_s=1.0, read_timeout_s=1.0, max_retries=2, backoff_s=0.01, max_backoff_s=0.05)
+    defaults.update(options)
+    return GeminiTransport("test-key", "gemini-test", base_url=url, **defaults)
+
+
+def run(transport, *prompts):
+    """Llama generate para cada prompt en un mismo event loop (en paralelo)"""
+
+    async def scenario():
+        try:
+            return await asyncio.gather(*(transport.generate(p) for p in prompts))
+        finally:
+            await transport.aclose()
+
+    return asyncio.run(scenario())
+
+
+def test_generate_reuses_the_connection(fake):
+    """Llamadas sucesivas viajan por la misma conexión, con la API key en el header"""
+    transport = make_transport(fake.url)
+
+    async def scenario():
+        try:
+            return [await transport.generate(f"pregunta {i}") for i in range(3)]
+        finally:
+            await transport.aclose()
+
+    assert asyncio.run(scenario()) == ["SELECT * FROM trucks LIMIT 10;"] * 3
+    assert [r[2] for r in fake.requests] == ["pregunta 0", "pregunta 1", "pregunta 2"]
+    assert {r[0] for r in fake.requests} == {"/v1beta/models/gemini-test:generateContent"}
+    assert {r[1] for r in fake.requests} == {"test-key"}
+    assert len({r[3] for r in fake.requests}) == 1
+
+
+def test_transient_errors_are_retried(fake):
+    """503 y 429 (con Retry-After) se reintentan hasta obtener respuesta"""
+    fake.script = [(503, "overloaded", 0, {}), (429, "quota", 0, {"Retry-After": "0"})]
+    transport = make_transport(fake.url)
+
+    assert run(transport, "hola") == ["SELECT * FROM trucks LIMIT 10;"]
+    assert len(fake.requests) == 3
+    assert transport.stats()["retries"] == 2
+    assert transport.stats()["failures"] == 0
+
+
+def test_client_errors_are_not_retried(fake):
+    """Un 400 es definitivo: no se reintenta"""
+    fake.script = [(400, "API key not valid", 0, {})]
+    transport = make_transport(fake.url)
+
+    with pytest.raises(LLMTransportError) as exc_info:
+        run(transport, "hola")
+    assert "400" in str(exc_info.value)
+    assert len(fake.requests) == 1
+
+
+def test_read_timeout_then_give_up(fake):
+    """Un servidor colgado agota el timeout de lectura en cada intento"""
+    fake.delay_s = 1.0
+    transport = make_transport(fake.url, read_timeout_s=0.1, max_retries=1)
+
+    start = time.perf_counter()
+    with pytest.raises(LLMTransportError) as exc_info:
+        run(transport, "hola")
+
+    assert "ReadTimeout" in str(exc_info.value)
+    assert len(fake.requests) == 2
+    assert time.perf_counter() - start < 0.8
+
+
+def test_connection_refused():
+    """Sin servidor escuchando: falla después de los reintentos, sin colgarse"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    transport = make_transport(f"http://127.0.0.1:{port}", max_retries=2)
+
+    with pytest.raises(LLMTransportError) as exc_info:
+        run(transport, "hola")
+    assert "ConnectError" in str(exc_info.value)
+    assert transport.stats()["retries"] == 2
+    assert transport.stats()["failures"] == 1
+
+
+def test_concurrency_is_bounded(fake):
+    """Con max_concurrency=2 el servidor nunca ve más de 2 requests a la vez"""
+    fake.delay_s = 0.05
+    transport = make_transport(fake.url, max_concurrency=2)
+
+    assert len(run(transport, *[f"pregunta {i}" for i in range(6)])) == 6
+    assert fake.max_active == 2
+    assert transport.stats()["in_flight"] == 0
+
+
+def test_backoff_has_jitter_and_a_cap():
+    """Esperas aleatorias dentro del tope exponencial; Retry-After acotado por max_backoff_s"""
+    transport = make_transport("http://127.0.0.1:1", backoff_s=0.1, max_backoff_s=1.0)
+
+    delays = [transport._backoff(2, None) for _ in range(200)]
+    assert all(0 <= d <= 0.4 for d in delays)
+    assert len(set(delays)) > 1
+    assert transport._backoff(0, 30) == 1.0
+
+
+def test_gemini_client_over_transport(fake):
+    """GeminiClient usa el transporte y, si la API falla, vuelve a los templates"""
+    fake.text = "```sql\nSELECT plate FROM trucks;\n```"
+    client = GeminiClient(api_key="test-key", model_name="gemini-test", base_url=fake.url, max_retries=0)
+
+    assert client.nl_to_sql("Patentes de los camiones") == "SELECT plate FROM trucks;"
+
+    fake.script = [(500, "boom", 0, {})]
+    question = "Camiones en mantenimiento"
+    assert client.nl_to_sql(question) == client._mock_nl_to_sql(question)
+
+    fake.text = "📊 Hay 2 camiones."
+    # Las filas llegan como DictRowsView (así las pasa el backend)
+    rows = CachedResult(["truck_id"], [("TRUCK_001",), ("TRUCK_002",)]).dict_view()
+    explanation = asyncio.run(client.generate_explanation_async("¿Cuántos?", "SELECT 1", rows))
+    assert explanation == "📊 Hay 2 camiones."
+    assert client.transport_stats()["calls"] == 3
+
+
+def test_gemini_client_sends_the_pruned_prompt(fake):
+    """Con prompt_builder el prompt enviado lleva solo las tablas de la pregunta"""
+    from backend.lib.prompt_builder import SYSTEM_PROMPT, PromptBuilder
+
+    client = GeminiClient(api_key="test-key", model_name="gemini-test", base_url=fake.url,
+                          max_retries=0, prompt_builder=PromptBuilder())
+    client.nl_to_sql("Lista de camiones Volvo")
+
+    prompt = fake.requests[0][2]
+    assert "trucks(" in prompt and "alerts(" not in prompt
+    assert prompt.endswith("\nNL: Lista de camiones Volvo\nSQL:")
+    stats = client.prompt_stats()
+    assert stats["pruned"] and stats["sent"] == 1
+    assert stats["avg_tokens"] < stats["full_prompt_tokens"] == (len(SYSTEM_PROMPT) + 3) // 4
+
+
+def test_lazy_client_answers_before_the_transport_is_ready(fake, tmp_path):
+    """lazy=True: responde desde el cache o con templates hasta start(), después usa la API"""
+    from backend.lib.translation_cache import TranslationCache
+
+    cache = TranslationCache(str(tmp_path / "translations.db"))
+    cache.put("Patentes de los camiones", "gemini-test", "SELECT plate FROM trucks;")
+    client = GeminiClient(
+        api_key="test-key", translation_cache=cache, model_name="gemini-test",
+        base_url=fake.url, max_retries=0, lazy=True
+    )
+    assert client.transport is None and not client.ready
+    assert client.status()["mode"] == "starting"
+
+    async def ask(question):
+        return await client.nl_to_sql_async(question)
+
+    # Antes de estar listo: traducción cacheada o template, sin tocar la red
+    assert asyncio.run(ask("Patentes de los camiones")) == "SELECT plate FROM trucks;"
+    question = "Camiones en mantenimiento"
+    assert asyncio.run(ask(question)) == client._mock_nl_to_sql(question)
+    rows = [{"truck_id": "TRUCK_001"}]
+    assert client.generate_explanation(question, "SELECT 1", rows) == \
+        client.generate_explanation_offline(question, "SELECT 1", rows)
+    assert fake.requests == []
+    assert client.status()["served_before_ready"] == 1
+
+    client.start()
+    assert client.wait_ready(5)
+    assert client.status()["mode"] == "api"
+    assert client.nl_to_sql("Camiones en mantenimiento") == "SELECT * FROM trucks LIMIT 10;"
+    assert len(fake.requests) == 1
+
+
+def test_explanations_before_ready_are_not_memoized(fake):
+    """Mientras el cliente lazy arranca se sirve la explicación offline sin memoizarla bajo el modelo real"""
+    from backend.lib.explanations import Explainer
+
+    fake.text = "📊 Explicación del modelo."
+    client = GeminiClient(api_key="test-key", model_name="gemini-test", base_url=fake.url,
+                          max_retries=0, lazy=True)
+    explainer = Explainer(
+        lambda nl, sql, rows: client.generate_explanation_async(nl, sql, rows, raise_errors=True),
+        lambda: client.model_name,
+        fallback=client.generate_explanation_offline
+    )
+    result = CachedResult(["truck_id"], [("TRUCK_001",)])
+
+    async def explain():
+        return await explainer.explain("¿Qué camión?", "SELECT truck_id FROM trucks", result)
+
+    offline = client.generate_explanation_offline("¿Qué camión?", "SELECT truck_id FROM trucks", result.dict_view())
+    assert asyncio.run(explain()) == offline
+    assert explainer.stats()["entries"] == 0
+
+    client.start()
+    assert client.wait_ready(5)
+    assert asyncio.run(explain()) == "📊 Explicación del modelo."
+    assert asyncio.run(explain()) == "📊 Explicación del modelo."
+    assert len(fake.requests) == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
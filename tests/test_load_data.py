@@ -0,0 +1,214 @@
+"""
+Tests para el script de carga de datos
+"""
+
+import pytest
+import sqlite3
+import pandas as pd
+import sys
+import os
+
+# Agregar directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adapters import KeeperAdapter, TeraAdapter
+import scripts.load_data as load_data
+from scripts.load_data import (
+    create_schema, replace_rows, drop_indexes, build_indexes, physical_indexes, upsert_rows, load_incremental
+)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    create_schema(conn)
+    yield conn
+    conn.close()
+
+
+def table_sql(conn, table):
+    return conn.execute("SELECT sql FROM sqlite_master WHERE name = ?", (table,)).fetchone()[0]
+
+
+def test_replace_rows_keeps_declared_schema(conn):
+    """Reemplazar el contenido no pierde la clave primaria declarada"""
+    df = pd.DataFrame({"driver_id": ["DRV_001", "DRV_002"], "name": ["Ana", "Luis"], "license": ["L1", "L2"]})
+
+    replace_rows(conn, "drivers", df)
+    replace_rows(conn, "drivers", df)
+
+    assert "PRIMARY KEY" in table_sql(conn, "drivers")
+    assert conn.execute("SELECT COUNT(*) FROM drivers").fetchone()[0] == 2
+    with pytest.raises(sqlite3.IntegrityError):
+        conn.execute("INSERT INTO drivers VALUES ('DRV_001', 'Otro', 'L3')")
+
+
+def test_legacy_tables_without_keys_are_recreated():
+    """Tablas creadas por to_sql(replace) se recrean con el DDL canónico"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute('CREATE TABLE "trucks" ("truck_id" TEXT, "plate" TEXT)')
+
+    create_schema(conn)
+
+    assert "PRIMARY KEY" in table_sql(conn, "trucks")
+
+
+def test_indexes_built_after_load(conn):
+    """Los índices se crean, se usan en los filtros típicos y se pueden reconstruir"""
+    build_indexes(conn)
+    drop_indexes(conn)
+    build_indexes(conn)
+
+    names = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert set(physical_indexes(conn)) <= names
+    assert {"idx_trucks_region", "idx_trips_start", "idx_alerts_default_truck_ts"} <= names
+
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM alerts WHERE truck_id = 'TRUCK_001' AND timestamp >= '2025-10-01'"
+    ).fetchall()
+    assert any("idx_alerts_default_truck_ts" in row[3] for row in plan)
+
+
+def test_epoch_columns_migrated_and_indexed():
+    """Tablas sin columnas *_epoch ni particiones se migran conservando datos y los rangos usan índice"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE alerts (alert_id TEXT PRIMARY KEY, truck_id TEXT, timestamp TEXT, "
+                 "alert_type TEXT, severity TEXT, description TEXT)")
+    conn.executemany(
+        "INSERT INTO alerts VALUES (?, 'TRUCK_001', ?, ?, 'high', '')",
+        [(f"A{i}", f"2025-10-{i % 28 + 1:02d}T08:00:00Z", ("speed", "fuel", "temperature")[i % 3]) for i in range(300)]
+    )
+
+    create_schema(conn)
+    build_indexes(conn)
+
+    assert conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0] == 300
+    assert conn.execute("SELECT timestamp_epoch FROM alerts WHERE alert_id = 'A19'").fetchone()[0] == 1760947200
+    plan = conn.execute(
+        "EXPLAIN QUERY PLAN SELECT * FROM alerts WHERE alert_type = 'speed' "
+        "AND timestamp_epoch >= strftime('%s', '2025-10-20', '-7 days')"
+    ).fetchall()
+    assert any("idx_alerts_2025_10_type_epoch" in row[3] for row in plan)
+
+
+def alerts_frame(rows):
+    return pd.DataFrame(rows, columns=["alert_id", "truck_id", "timestamp", "alert_type", "severity", "description"])
+
+
+def test_upsert_only_writes_new_or_changed_rows(conn):
+    """Reaplicar el mismo delta no escribe nada; un cambio reporta el día viejo y el nuevo"""
+    df = alerts_frame([
+        ("A1", "TRUCK_001", "2025-10-20T08:00:00Z", "speed", "high", "x"),
+        ("A2", "TRUCK_002", "2025-10-21T09:00:00Z", "fuel", "low", None),
+    ])
+
+    assert upsert_rows(conn, "alerts", df, "alert_id", "timestamp") == (2, {"2025-10-20", "2025-10-21"})
+    assert upsert_rows(conn, "alerts", df, "alert_id", "timestamp") == (0, set())
+
+    df.loc[0, "timestamp"] = "2025-10-22T08:00:00Z"
+    assert upsert_rows(conn, "alerts", df, "alert_id", "timestamp") == (1, {"2025-10-20", "2025-10-22"})
+    assert conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0] == 2
+
+
+def test_upsert_routes_rows_to_monthly_partitions(conn):
+    """Cada fila va a la partición de su mes; si cambia de mes se mueve y la vista no la duplica"""
+    df = alerts_frame([
+        ("A1", "TRUCK_001", "2025-09-30T23:00:00Z", "speed", "high", "x"),
+        ("A2", "TRUCK_002", "2025-10-01T09:00:00Z", "fuel", "low", None),
+        ("A3", "TRUCK_002", None, "fuel", "low", None),
+    ])
+    assert upsert_rows(conn, "alerts", df, "alert_id", "timestamp")[0] == 3
+
+    def partitions():
+        names = ("alerts_2025_09", "alerts_2025_10", "alerts_default")
+        return {n: sorted(r[0] for r in conn.execute(f"SELECT alert_id FROM {n}")) for n in names}
+
+    assert partitions() == {"alerts_2025_09": ["A1"], "alerts_2025_10": ["A2"], "alerts_default": ["A3"]}
+
+    df.loc[0, "timestamp"] = "2025-10-02T08:00:00Z"
+    assert upsert_rows(conn, "alerts", df, "alert_id", "timestamp") == (1, {"2025-09-30", "2025-10-02"})
+    assert partitions() == {"alerts_2025_09": [], "alerts_2025_10": ["A1", "A2"], "alerts_default": ["A3"]}
+    assert conn.execute("SELECT COUNT(*) FROM alerts").fetchone()[0] == 3
+
+
+def test_incremental_load_resumes_from_watermark(conn, tmp_path):
+    """Una segunda corrida solo procesa registros desde el watermark (menos el lookback)"""
+    source = tmp_path / "alerts.csv"
+    rows = [
+        ("K1", "TRUCK_001", "2025-10-01T08:00:00Z", "speed", "high", "a"),
+        ("K2", "TRUCK_001", "2025-10-20T08:00:00Z", "fuel", "low", "b"),
+    ]
+    columns = ["alert_code", "truck_identifier", "event_timestamp", "alert_category", "priority_level", "message"]
+    pd.DataFrame(rows, columns=columns).to_csv(source, index=False)
+
+    adapter = KeeperAdapter()
+    assert load_incremental(conn, adapter, str(source), "alerts")[0] == 2
+
+    rows.append(("K3", "TRUCK_002", "2025-10-20T09:00:00Z", "speed", "medium", "c"))
+    pd.DataFrame(rows, columns=columns).to_csv(source, index=False)
+    delta, watermark = adapter.process_incremental(str(source), "alerts", "2025-10-20T08:00:00Z")
+
+    assert list(delta["alert_id"]) == ["K2", "K3"]
+    assert watermark == "2025-10-20T09:00:00Z"
+    assert load_incremental(conn, adapter, str(source), "alerts", chunksize=1) == (1, {"2025-10-20"})
+
+
+def test_incremental_trips_reread_on_late_arrival(conn, tmp_path):
+    """Un viaje que salió antes del lookback se relee si su llegada es reciente o todavía no está"""
+    source = tmp_path / "trips.csv"
+    columns = ["trip_id", "vehicle_id", "origin_city", "dest_city", "departure_time", "arrival_time",
+               "distance", "trip_status"]
+    rows = [
+        ("T1", "TRUCK_001", "Rosario", "Salta", "2025-10-10T06:00:00Z", "2025-10-11T06:00:00Z", 900, "finished"),
+        ("T2", "TRUCK_002", "Rosario", "Salta", "2025-10-10T06:00:00Z", None, 900, "in_progress"),
+        ("T3", "TRUCK_003", "Rosario", "Salta", "2025-10-10T06:00:00Z", "2025-10-12T06:00:00Z", 900, "in_progress"),
+        ("T4", "TRUCK_004", "Rosario", "Salta", "2025-10-20T06:00:00Z", None, 300, "in_progress"),
+    ]
+    pd.DataFrame(rows, columns=columns).to_csv(source, index=False)
+    adapter = TeraAdapter()
+    assert load_incremental(conn, adapter, str(source), "trips")[0] == 4
+
+    # Días después: T3 llega (su salida ya quedó fuera de las 48 h de lookback)
+    rows[2] = rows[2][:5] + ("2025-10-21T06:00:00Z", 900, "finished")
+    pd.DataFrame(rows, columns=columns).to_csv(source, index=False)
+    delta, _ = adapter.process_incremental(str(source), "trips", "2025-10-20T06:00:00Z")
+
+    assert sorted(delta["trip_id"]) == ["T2", "T3", "T4"]
+    assert load_incremental(conn, adapter, str(source), "trips")[0] == 1
+    assert conn.execute("SELECT status FROM trips WHERE trip_id = 'T3'").fetchone()[0] == "finished"
+
+
+def test_parallel_load_matches_sequential(tmp_path, monkeypatch):
+    """Transformar en el pool y escribir desde un único proceso da el mismo resultado"""
+    alerts = tmp_path / "alerts.csv"
+    trips = tmp_path / "trips.csv"
+    pd.DataFrame({
+        "alert_code": ["K1", "K2"], "truck_identifier": ["TRUCK_001", "TRUCK_002"],
+        "event_timestamp": ["2025-10-20T08:00:00Z", "2025-10-21T08:00:00Z"],
+        "alert_category": ["speed", "fuel"], "priority_level": ["high", "low"], "message": ["a", "b"],
+    }).to_csv(alerts, index=False)
+    pd.DataFrame({
+        "trip_id": ["T1"], "vehicle_id": ["TRUCK_001"], "origin_city": ["Rosario"], "dest_city": ["Salta"],
+        "departure_time": ["2025-10-20T06:00:00Z"], "arrival_time": [None], "distance": [900],
+        "trip_status": ["in_progress"],
+    }).to_csv(trips, index=False)
+    monkeypatch.setattr(load_data, "SOURCES", [
+        (TeraAdapter, str(trips), "trips", "viajes"),
+        (KeeperAdapter, str(alerts), "alerts", "alertas"),
+    ])
+
+    results = []
+    for load in (load_data.load_sources, lambda conn: load_data.load_sources_parallel(conn, workers=2)):
+        conn = sqlite3.connect(":memory:")
+        create_schema(conn)
+        changed_days = load(conn)
+        rows = [conn.execute(f"SELECT * FROM {t} ORDER BY 1").fetchall() for t in ("trips", "alerts")]
+        results.append((changed_days, rows))
+        conn.close()
+
+    assert results[0] == results[1]
+    assert results[0][0] == {"trips": {"2025-10-20"}, "alerts": {"2025-10-20", "2025-10-21"}}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
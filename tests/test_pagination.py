@@ -0,0 +1,182 @@
+"""
+Tests para la paginación keyset
+"""
+
+import pytest
+import sqlite3
+import sys
+import os
+
+# Agregar directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.lib.pagination import (
+    PaginationError, plan_pagination, build_page_sql, encode_cursor, decode_cursor, split_order_and_limit,
+    check_cursor_secret
+)
+
+
+TELEMETRY_COLUMNS = ["telemetry_id", "truck_id", "timestamp", "speed_kmh", "fuel_level", "engine_temp_c"]
+
+
+@pytest.fixture
+def conn():
+    """Telemetría mínima en memoria"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute(
+        "CREATE TABLE telemetry (telemetry_id TEXT PRIMARY KEY, truck_id TEXT, timestamp TEXT, "
+        "speed_kmh REAL, fuel_level REAL, engine_temp_c REAL)"
+    )
+    conn.executemany(
+        "INSERT INTO telemetry VALUES (?, 'TRUCK_001', ?, 80, 50, 90)",
+        [(f"T{i:03d}", f"2025-10-{(i % 20) + 1:02d}T00:00:00Z") for i in range(25)]
+    )
+    return conn
+
+
+def read_all_pages(conn, sql, page_size):
+    """Recorre todas las páginas como lo haría /query + /query/page"""
+    probe = conn.execute(f"SELECT * FROM ({sql.rstrip().rstrip(';')}) LIMIT 0")
+    plan = plan_pagination(sql, [c[0] for c in probe.description])
+    after, remaining, seen = None, plan.cap, []
+    while True:
+        size = page_size if remaining is None else min(page_size, remaining)
+        page_sql, params = build_page_sql(plan, after, size)
+        cursor = conn.execute(page_sql, params)
+        columns = [c[0] for c in cursor.description]
+        rows = cursor.fetchall()
+        has_more = len(rows) > size
+        rows = rows[:size]
+        seen.extend(rows)
+        if remaining is not None:
+            remaining -= len(rows)
+            has_more = has_more and remaining > 0
+        if not has_more:
+            return seen
+        token = encode_cursor(plan, dict(zip(columns, rows[-1])), remaining, page_size)
+        plan, after, remaining, page_size = decode_cursor(token)
+
+
+def test_pages_cover_full_result_without_duplicates(conn):
+    """Todas las páginas juntas equivalen al resultado completo"""
+    rows = read_all_pages(conn, "SELECT * FROM telemetry LIMIT 1000;", page_size=7)
+
+    assert len(rows) == 25
+    assert len({row[0] for row in rows}) == 25
+
+
+def test_descending_order_is_preserved(conn):
+    """ORDER BY timestamp DESC se respeta entre páginas"""
+    rows = read_all_pages(conn, "SELECT * FROM telemetry ORDER BY timestamp DESC;", page_size=4)
+    timestamps = [row[2] for row in rows]
+
+    assert timestamps == sorted(timestamps, reverse=True)
+
+
+def test_explicit_limit_caps_total_rows(conn):
+    """Un LIMIT distinto del default se respeta como tope total"""
+    rows = read_all_pages(conn, "SELECT * FROM telemetry ORDER BY timestamp LIMIT 10;", page_size=3)
+
+    assert len(rows) == 10
+
+
+@pytest.fixture
+def fleet():
+    """Camiones con varias alertas cada uno (JOIN 1:N) y algunos timestamps NULL"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE trucks (truck_id TEXT PRIMARY KEY, plate TEXT)")
+    conn.execute(
+        "CREATE TABLE alerts (alert_id TEXT PRIMARY KEY, truck_id TEXT, timestamp TEXT, alert_type TEXT)"
+    )
+    conn.executemany("INSERT INTO trucks VALUES (?, ?)", [(f"TRUCK_{i:03d}", f"AB{i:03d}CD") for i in range(5)])
+    conn.executemany(
+        "INSERT INTO alerts VALUES (?, ?, ?, 'speed')",
+        [(f"A{i:03d}", f"TRUCK_{i % 5:03d}", None if i % 7 == 0 else f"2025-10-{(i % 9) + 1:02d}T00:00:00Z")
+         for i in range(30)]
+    )
+    return conn
+
+
+def test_join_pages_on_every_primary_key(fleet):
+    """Con un JOIN 1:N la clave incluye la PK de cada tabla y no se pierden filas"""
+    sql = ("SELECT t.truck_id, t.plate, a.alert_id, a.timestamp, a.alert_type "
+           "FROM trucks t JOIN alerts a ON a.truck_id = t.truck_id;")
+    plan = plan_pagination(sql, ["truck_id", "plate", "alert_id", "timestamp", "alert_type"])
+    rows = read_all_pages(fleet, sql, page_size=4)
+
+    assert plan.keys == ("timestamp", "alert_id", "truck_id")
+    assert len(rows) == 30
+    assert len({row[2] for row in rows}) == 30
+
+
+def test_join_without_every_primary_key_is_not_paginated(fleet):
+    """Sin alert_id en el resultado, truck_id no identifica la fila: se ejecuta sin paginar"""
+    sql = "SELECT t.truck_id, t.plate, a.alert_type FROM trucks t JOIN alerts a ON a.truck_id = t.truck_id;"
+
+    assert plan_pagination(sql, ["truck_id", "plate", "alert_type"]) is None
+    assert plan_pagination(
+        "SELECT a.trip_id, b.trip_id AS other FROM trips a JOIN trips b ON a.truck_id = b.truck_id;",
+        ["trip_id", "other"]
+    ) is None
+
+
+@pytest.mark.parametrize("direction", ["", " DESC"])
+def test_null_keys_do_not_end_the_result(fleet, direction):
+    """Los timestamps NULL se paginan en el orden de SQLite en lugar de cortar el resultado"""
+    rows = read_all_pages(fleet, f"SELECT * FROM alerts ORDER BY timestamp{direction};", page_size=3)
+    expected = fleet.execute(
+        f"SELECT * FROM alerts ORDER BY timestamp{direction}, alert_id{direction}"
+    ).fetchall()
+
+    assert rows == expected
+    assert sum(1 for row in rows if row[2] is None) == 5
+
+
+def test_multiple_workers_require_a_cursor_secret(monkeypatch):
+    """Con más de un worker, sin CURSOR_SECRET compartido no se arranca"""
+    import backend.lib.pagination as pagination
+
+    monkeypatch.setattr(pagination, "CURSOR_SECRET_CONFIGURED", False)
+    check_cursor_secret(1)
+    with pytest.raises(RuntimeError):
+        check_cursor_secret(4)
+    monkeypatch.setattr(pagination, "CURSOR_SECRET_CONFIGURED", True)
+    check_cursor_secret(4)
+
+
+def test_aggregates_are_not_paginated():
+    """Sin columnas keyset en el resultado no hay paginación"""
+    sql = "SELECT truck_id, AVG(speed_kmh) AS avg_speed FROM telemetry GROUP BY truck_id;"
+
+    assert plan_pagination(sql, ["truck_id", "avg_speed"]) is None
+
+
+def test_order_not_matching_keyset_is_not_paginated():
+    """Un ORDER BY por otra columna no se puede paginar por keyset"""
+    sql = "SELECT * FROM telemetry ORDER BY fuel_level ASC;"
+
+    assert plan_pagination(sql, TELEMETRY_COLUMNS) is None
+
+
+def test_split_ignores_nested_clauses():
+    """ORDER BY/LIMIT dentro de subconsultas no se consideran"""
+    sql = "SELECT * FROM (SELECT * FROM telemetry ORDER BY speed_kmh LIMIT 5) AS x LIMIT 1000;"
+    body, order_by, limit_value = split_order_and_limit(sql)
+
+    assert body == "SELECT * FROM (SELECT * FROM telemetry ORDER BY speed_kmh LIMIT 5) AS x"
+    assert order_by is None
+    assert limit_value == 1000
+
+
+def test_tampered_cursor_is_rejected():
+    """Un cursor modificado no pasa la verificación de firma"""
+    plan = plan_pagination("SELECT * FROM telemetry;", TELEMETRY_COLUMNS)
+    token = encode_cursor(plan, {"timestamp": "2025-10-01T00:00:00Z", "telemetry_id": "T001"}, None, 10)
+    payload, signature = token.rsplit(".", 1)
+
+    with pytest.raises(PaginationError):
+        decode_cursor(payload[:-2] + "xx." + signature)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,119 @@
+"""
+Tests para las particiones mensuales y la poda por filtro de tiempo
+"""
+
+import pytest
+import sqlite3
+import pandas as pd
+import sys
+import os
+
+# Agregar directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.lib.partitions import (
+    load_partition_layout, month_bounds, partition_month, prune_partitions, unprune_partitions
+)
+from scripts.load_data import create_schema, upsert_rows
+
+
+@pytest.fixture
+def conn():
+    """Telemetría de tres meses (más una fila sin timestamp) y alertas de dos, en particiones"""
+    conn = sqlite3.connect(":memory:")
+    create_schema(conn)
+    conn.execute("INSERT INTO trucks (truck_id, brand) VALUES ('TRUCK_001', 'Volvo'), ('TRUCK_002', 'Scania')")
+    timestamps = [f"2025-{month:02d}-{day:02d}T{hour:02d}:00:00Z"
+                  for month in (8, 9, 10) for day in (1, 15, 31) for hour in (0, 23) if not (month == 9 and day == 31)]
+    telemetry = pd.DataFrame({
+        "telemetry_id": [f"T{i}" for i in range(len(timestamps) + 1)],
+        "truck_id": [f"TRUCK_00{i % 2 + 1}" for i in range(len(timestamps) + 1)],
+        "timestamp": timestamps + [None],
+        "speed_kmh": [50.0 + i for i in range(len(timestamps) + 1)],
+        "fuel_level": [20.0] * (len(timestamps) + 1),
+        "engine_temp_c": [90.0] * (len(timestamps) + 1),
+    })
+    upsert_rows(conn, "telemetry", telemetry, "telemetry_id", "timestamp")
+    alerts = pd.DataFrame({
+        "alert_id": ["A1", "A2"], "truck_id": ["TRUCK_001", "TRUCK_002"],
+        "timestamp": ["2025-09-15T08:00:00Z", "2025-10-15T08:00:00Z"],
+        "alert_type": ["speed", "fuel"], "severity": ["high", "low"], "description": ["", ""],
+    })
+    upsert_rows(conn, "alerts", alerts, "alert_id", "timestamp")
+    return conn
+
+
+def partitions_read(sql):
+    return sorted(set(part for part in sql.replace(")", " ").split() if part.startswith(("telemetry_", "alerts_"))))
+
+
+def assert_same_result(conn, sql, expected_partitions):
+    pruned = prune_partitions(conn, sql, load_partition_layout(conn))
+    assert pruned is not None
+    assert partitions_read(pruned) == expected_partitions
+    assert sorted(conn.execute(pruned).fetchall()) == sorted(conn.execute(sql).fetchall())
+
+
+def test_month_bounds_cover_every_timestamp_of_the_month():
+    texts, epochs = month_bounds("2025-12")
+    assert texts == ("2025-12", "2026-01")
+    assert texts[0] <= "2025-12-31T23:59:59Z" < texts[1]
+    assert epochs[0] < 1764547200 and 1767225599 < epochs[1]
+    assert partition_month("2025-13-01T00:00:00Z") is None
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT truck_id, AVG(speed_kmh) FROM telemetry WHERE timestamp >= '2025-10-01' GROUP BY truck_id",
+     ["telemetry_2025_10", "telemetry_default"]),
+    ("SELECT COUNT(*) FROM telemetry tele WHERE tele.timestamp_epoch >= strftime('%s', '2025-09-20') "
+     "AND tele.timestamp_epoch < strftime('%s', '2025-09-28')",
+     ["telemetry_2025_09", "telemetry_default"]),
+    ("SELECT * FROM telemetry WHERE timestamp BETWEEN '2025-08-31' AND '2025-09-01' AND speed_kmh > 0",
+     ["telemetry_2025_08", "telemetry_2025_09", "telemetry_default"]),
+    ("SELECT t.brand, COUNT(*) FROM trucks t JOIN alerts a ON t.truck_id = a.truck_id "
+     "WHERE date('2025-10-20', '-7 days') <= a.timestamp GROUP BY t.brand",
+     ["alerts_2025_10"]),
+    # Límite del último instante del mes
+    ("SELECT COUNT(*) FROM telemetry WHERE timestamp <= '2025-08-31T23:00:00Z'",
+     ["telemetry_2025_08", "telemetry_default"]),
+])
+def test_pruned_query_reads_only_matching_months(conn, sql, expected):
+    """El SQL podado lee solo los meses posibles y da el mismo resultado que la vista"""
+    assert_same_result(conn, sql, expected)
+
+
+@pytest.mark.parametrize("sql", [
+    # OR de primer nivel: el límite no restringe todas las filas
+    "SELECT * FROM telemetry WHERE timestamp >= '2025-10-01' OR speed_kmh > 100",
+    # Límite sobre una expresión de la columna, no sobre la columna
+    "SELECT * FROM telemetry WHERE date(timestamp) >= '2025-10-01'",
+    # El lado "constante" depende de otra columna
+    "SELECT * FROM telemetry t JOIN trucks k ON t.truck_id = k.truck_id WHERE t.timestamp >= k.brand",
+    # La comparación cambia de sentido con otro operador
+    "SELECT * FROM telemetry WHERE timestamp_epoch >= 1759276800 = 0",
+    # Subconsulta
+    "SELECT * FROM telemetry WHERE timestamp >= (SELECT MAX(timestamp) FROM alerts)",
+    # Sin filtro de tiempo
+    "SELECT COUNT(*) FROM telemetry WHERE truck_id = 'TRUCK_001'",
+])
+def test_queries_that_cannot_be_pruned(conn, sql):
+    assert prune_partitions(conn, sql, load_partition_layout(conn)) is None
+
+
+def test_unprune_restores_canonical_tables(conn):
+    """El motor columnar recibe el SQL sobre las tablas canónicas"""
+    sql = ("SELECT a.severity, COUNT(*) FROM alerts a JOIN telemetry ON a.truck_id = telemetry.truck_id "
+           "WHERE a.timestamp >= '2025-10-01' AND telemetry.timestamp >= '2025-10-01' GROUP BY a.severity")
+    pruned = prune_partitions(conn, sql, load_partition_layout(conn))
+
+    # alerts_default está vacía: alerts queda en una sola partición, sin subconsulta
+    assert partitions_read(pruned) == ["alerts_2025_10", "telemetry_2025_10", "telemetry_default"]
+    assert "JOIN (SELECT * FROM telemetry_2025_10 UNION ALL SELECT * FROM telemetry_default) AS telemetry" in pruned
+    assert unprune_partitions(pruned) == (
+        "SELECT a.severity, COUNT(*) FROM alerts AS a JOIN telemetry AS telemetry ON a.truck_id = telemetry.truck_id "
+        "WHERE a.timestamp >= '2025-10-01' AND telemetry.timestamp >= '2025-10-01' GROUP BY a.severity"
+    )
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
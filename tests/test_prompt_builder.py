@@ -0,0 +1,99 @@
+"""
+Tests para el prompt NL→SQL armado por pregunta (tablas y ejemplos relevantes, presupuesto de tokens)
+"""
+
+import pytest
+import sys
+import os
+
+# Agregar directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.lib.prompt_builder import (
+    ALL_EXAMPLES, ALL_TABLES, EXAMPLES, SYSTEM_PROMPT, PromptBuilder,
+    estimate_tokens, question_suffix, render_prompt
+)
+from backend.lib.validate_sql import extract_tables_from_sql
+
+
+def test_full_render_is_the_system_prompt():
+    """Con todas las tablas y ejemplos el prompt es el de siempre"""
+    assert render_prompt(ALL_TABLES, ALL_EXAMPLES) == SYSTEM_PROMPT
+    for table in ALL_TABLES:
+        assert f"- {table}(" in SYSTEM_PROMPT
+    assert SYSTEM_PROMPT.endswith("Ahora genera SQL para la siguiente pregunta:\n")
+
+
+@pytest.mark.parametrize("question,tables", [
+    ("Lista de camiones Volvo", ("trucks",)),
+    ("Viajes cancelados desde Mar del Plata", ("trips",)),
+    ("Conductores con licencia vencida", ("drivers",)),
+    # Con más de una tabla se agrega trucks, que las une
+    ("Kilómetros recorridos por conductor", ("trucks", "drivers", "trips")),
+    # Velocidad/temperatura son telemetría, salvo que se hable de alertas
+    ("Velocidad promedio de los camiones Scania", ("trucks", "telemetry")),
+    ("Alertas de velocidad excesiva", ("alerts",)),
+    ("Temperatura de motor en la última hora", ("telemetry",)),
+])
+def test_select_tables(question, tables):
+    assert PromptBuilder().select_tables(question) == tables
+
+
+def test_unknown_question_keeps_the_full_schema():
+    """Si ninguna palabra apunta a una tabla, no se recorta el schema"""
+    assert PromptBuilder().select_tables("¿Qué pasó ayer?") == ALL_TABLES
+
+
+def test_examples_cover_their_own_tables():
+    """Para cada ejemplo few-shot se eligen sus tablas y el ejemplo mismo queda primero"""
+    builder = PromptBuilder(max_tokens=10_000)
+    for index, (nl, sql) in enumerate(EXAMPLES):
+        built = builder.build(nl)
+        assert extract_tables_from_sql(sql) <= set(built.tables), nl
+        assert built.examples[0] == index, nl
+        # Solo ejemplos que usan tablas del prompt
+        for chosen in built.examples:
+            assert extract_tables_from_sql(EXAMPLES[chosen][1]) <= set(built.tables)
+
+
+def test_pruned_prompt_is_smaller_and_ends_with_the_question():
+    question = "Lista de camiones actualmente en mantenimiento"
+    built = PromptBuilder().build(question)
+    full = SYSTEM_PROMPT + question_suffix(question)
+
+    assert built.text.endswith(question_suffix(question))
+    assert built.tokens == estimate_tokens(built.text) < estimate_tokens(full)
+    assert "telemetry(" not in built.text and "trucks(" in built.text
+
+
+def test_budget_drops_examples():
+    """Los ejemplos se agregan solo mientras el prompt entra en el presupuesto"""
+    question = "¿Qué camión tuvo más alertas de temperatura en la última semana?"
+    roomy = PromptBuilder(max_tokens=10_000).build(question)
+    base = estimate_tokens(render_prompt(roomy.tables, ())) + estimate_tokens(question_suffix(question))
+
+    tight = PromptBuilder(max_tokens=base + 10).build(question)
+    assert tight.examples == () and not tight.over_budget
+    assert tight.tokens <= base + 10 < roomy.tokens
+
+    # Ni schema + instrucciones entran: se manda igual, sin ejemplos, marcado
+    tiny = PromptBuilder(max_tokens=50).build(question)
+    assert tiny.examples == () and tiny.over_budget
+    assert tiny.tables == roomy.tables
+
+
+def test_selection_and_fragments_are_cached():
+    """La misma pregunta (normalizada) reutiliza la selección y el fragmento armado"""
+    builder = PromptBuilder()
+    first = builder.build("¿Cuántos viajes finalizados hubo ayer?")
+    again = builder.build("cuantos viajes finalizados hubo ayer")
+
+    plans = builder.stats()["plans"]
+    assert (plans["entries"], plans["hits"], plans["misses"]) == (1, 1, 1)
+    assert (first.tables, first.examples) == (again.tables, again.examples)
+    assert render_prompt(first.tables, first.examples) is render_prompt(again.tables, again.examples)
+    assert builder.stats()["full_prompt_tokens"] == estimate_tokens(SYSTEM_PROMPT)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
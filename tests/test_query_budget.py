@@ -0,0 +1,93 @@
+"""
+Tests para los presupuestos de ejecución de consultas
+"""
+
+import pytest
+import sqlite3
+import threading
+import sys
+import os
+
+# Agregar directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.lib.query_budget import QueryBudget, QueryBudgetExceeded
+
+
+# Consulta que no termina nunca por sí sola
+ENDLESS_SQL = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT COUNT(*) FROM c"
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:", check_same_thread=False)
+    yield conn
+    conn.close()
+
+
+def test_step_budget_interrupts_query(conn):
+    """Superar el máximo de pasos de VM corta la consulta"""
+    budget = QueryBudget(max_seconds=0, max_steps=200_000, granularity=1000)
+
+    with pytest.raises(QueryBudgetExceeded) as exc_info:
+        with budget.guard(conn):
+            conn.execute(ENDLESS_SQL).fetchall()
+
+    assert "pasos" in str(exc_info.value)
+    assert budget.steps > 200_000
+
+
+def test_time_budget_interrupts_query(conn):
+    """Superar el tiempo máximo corta la consulta"""
+    budget = QueryBudget(max_seconds=0.05, max_steps=0)
+
+    with pytest.raises(QueryBudgetExceeded):
+        with budget.guard(conn):
+            conn.execute(ENDLESS_SQL).fetchall()
+
+    assert budget.elapsed_s >= 0.05
+
+
+def test_cancel_from_another_thread(conn):
+    """cancel() interrumpe una consulta que corre en otro thread"""
+    budget = QueryBudget(max_seconds=0, max_steps=0)
+    errors = []
+
+    def worker():
+        try:
+            with budget.guard(conn):
+                conn.execute(ENDLESS_SQL).fetchall()
+        except QueryBudgetExceeded as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    budget.cancel()
+    thread.join(timeout=5)
+
+    assert not thread.is_alive()
+    assert errors and "cancelada" in errors[0].reason
+
+
+def test_connection_usable_after_interrupt(conn):
+    """El progress handler se retira y la conexión sigue sirviendo"""
+    budget = QueryBudget(max_seconds=0, max_steps=10_000, granularity=1000)
+
+    with pytest.raises(QueryBudgetExceeded):
+        with budget.guard(conn):
+            conn.execute(ENDLESS_SQL).fetchall()
+
+    assert conn.execute("SELECT 1").fetchone() == (1,)
+
+
+def test_unrelated_errors_pass_through(conn):
+    """Errores de SQL que no son del presupuesto no se transforman"""
+    budget = QueryBudget(max_seconds=1, max_steps=1000)
+
+    with pytest.raises(sqlite3.OperationalError):
+        with budget.guard(conn):
+            conn.execute("SELECT * FROM tabla_inexistente")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
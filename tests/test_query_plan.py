@@ -0,0 +1,95 @@
+"""
+Tests para la compuerta de costo basada en EXPLAIN QUERY PLAN
+"""
+
+import pytest
+import sqlite3
+import sys
+import os
+
+# Agregar directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.lib.query_plan import QueryPlanGate, QueryTooExpensive, estimate_plan_cost
+
+
+@pytest.fixture
+def conn():
+    """Schema mínimo con una tabla de hechos grande y una dimensión chica"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE trucks (truck_id TEXT PRIMARY KEY, brand TEXT)")
+    conn.execute(
+        "CREATE TABLE telemetry (telemetry_id TEXT PRIMARY KEY, truck_id TEXT, timestamp TEXT, speed_kmh REAL)"
+    )
+    conn.executemany("INSERT INTO trucks VALUES (?, 'Volvo')", [(f"TRUCK_{i:03d}",) for i in range(20)])
+    conn.executemany(
+        "INSERT INTO telemetry VALUES (?, ?, '2025-10-01T00:00:00Z', 80)",
+        [(f"T{i:05d}", f"TRUCK_{i % 20:03d}") for i in range(5000)]
+    )
+    return conn
+
+
+def test_primary_key_lookup_is_cheap(conn):
+    """Una búsqueda por PK no reporta full scans"""
+    estimate = estimate_plan_cost(conn, "SELECT * FROM telemetry WHERE telemetry_id = 'T00001'")
+
+    assert estimate.cost <= 10
+    assert estimate.full_scans == []
+
+
+def test_full_scan_of_large_table_is_detected(conn):
+    """Un scan completo de telemetry se reporta con su tamaño"""
+    estimate = estimate_plan_cost(conn, "SELECT * FROM telemetry WHERE speed_kmh > 100 ORDER BY speed_kmh")
+
+    assert estimate.full_scans == [("telemetry", 5000)]
+    assert "ORDER BY" in estimate.temp_btrees
+    assert estimate.cost > 5000
+
+
+def test_nested_scan_multiplies_cost(conn):
+    """Un self-join sin índice cuesta del orden del producto de ambas tablas"""
+    estimate = estimate_plan_cost(conn, "SELECT * FROM telemetry a, telemetry b WHERE a.speed_kmh > b.speed_kmh")
+
+    assert estimate.nested_scans == ["telemetry"]
+    assert estimate.cost >= 5000 * 5000
+
+
+def test_gate_rejects_expensive_plans(conn):
+    """La compuerta rechaza planes sobre el máximo y cuenta el rechazo"""
+    gate = QueryPlanGate(max_cost=1_000_000, warn_cost=0)
+
+    with pytest.raises(QueryTooExpensive) as exc_info:
+        gate.check(conn, "SELECT * FROM telemetry a, telemetry b WHERE a.speed_kmh > b.speed_kmh", 1)
+
+    assert "scan anidado de telemetry" in str(exc_info.value)
+    assert gate.stats()["rejected"] == 1
+    assert gate.check(conn, "SELECT * FROM trucks", 1).cost <= 1_000_000
+
+
+def test_warnings_only_above_threshold(conn):
+    """Las advertencias se reportan solo para planes pesados"""
+    gate = QueryPlanGate(max_cost=0, warn_cost=10_000)
+
+    cheap = gate.check(conn, "SELECT * FROM trucks", 1)
+    heavy = gate.check(conn, "SELECT * FROM telemetry ORDER BY speed_kmh", 1)
+
+    assert gate.warnings(cheap) == []
+    assert any("full scan de telemetry" in w for w in gate.warnings(heavy))
+
+
+def test_plans_cached_per_normalized_sql(conn):
+    """El mismo SQL (con otro formato) no vuelve a pasar por EXPLAIN"""
+    gate = QueryPlanGate(max_cost=0, warn_cost=0)
+
+    first = gate.inspect(conn, "SELECT * FROM trucks WHERE brand = 'Volvo';", 1)
+    second = gate.inspect(conn, "SELECT *   FROM trucks\nWHERE brand = 'Volvo'", 1)
+    gate.inspect(conn, "SELECT * FROM trucks WHERE brand = 'Volvo'", 2)
+
+    assert second is first
+    assert gate.stats()["hits"] == 1
+    # Una nueva versión del dataset descarta los planes anteriores
+    assert gate.stats()["entries"] == 1
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,85 @@
+"""
+Tests para /query/stream: lecturas grandes sin el LIMIT por defecto
+"""
+
+import pytest
+import sqlite3
+import sys
+import os
+
+# Agregar directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.lib.gemini_client import DEFAULT_MODEL
+from backend.lib.pagination import drop_default_limit
+from backend.lib.translation_cache import TranslationCache
+from tests.test_startup import run_python
+
+
+TELEMETRY_ROWS = 2500
+
+# Pregunta → SQL que "devuelve el LLM" (sembrado en el cache de traducciones: no hay llamadas a la API)
+TRANSLATIONS = {
+    "Toda la telemetría": "SELECT * FROM telemetry;",
+    "Toda la telemetría con el límite del prompt": "SELECT * FROM telemetry LIMIT 1000;",
+    "Las primeras 20 lecturas": "SELECT * FROM telemetry ORDER BY timestamp LIMIT 20;",
+}
+
+
+def test_drop_default_limit():
+    """Solo se quita el LIMIT 1000 final de nivel superior"""
+    assert drop_default_limit("SELECT * FROM telemetry LIMIT 1000;") == "SELECT * FROM telemetry;"
+    assert drop_default_limit("SELECT * FROM telemetry LIMIT 20;") == "SELECT * FROM telemetry LIMIT 20;"
+    sql = "SELECT * FROM (SELECT * FROM telemetry LIMIT 1000) AS x;"
+    assert drop_default_limit(sql) == sql
+
+
+def test_stream_is_not_capped_by_the_default_limit(tmp_path):
+    """El stream entrega más filas que el tope de /query; un LIMIT explícito se respeta"""
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+
+    db_path = tmp_path / "logiq.db"
+    conn = sqlite3.connect(db_path)
+    conn.execute(
+        "CREATE TABLE telemetry (telemetry_id TEXT PRIMARY KEY, truck_id TEXT, timestamp TEXT, "
+        "speed_kmh REAL, fuel_level REAL, engine_temp_c REAL, timestamp_epoch INTEGER)"
+    )
+    conn.executemany(
+        "INSERT INTO telemetry VALUES (?, 'TRUCK_001', ?, 80, 50, 90, ?)",
+        [(f"T{i:05d}", f"2025-10-20T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}Z", 1760918400 + i)
+         for i in range(TELEMETRY_ROWS)]
+    )
+    conn.commit()
+    conn.close()
+
+    cache = TranslationCache(str(tmp_path / "translations.db"))
+    for question, sql in TRANSLATIONS.items():
+        cache.put(question, DEFAULT_MODEL, sql)
+
+    result = run_python(
+        "import json\n"
+        "from fastapi.testclient import TestClient\n"
+        "import backend.app as app\n"
+        "counts = {}\n"
+        "with TestClient(app.app) as client:\n"
+        f"    for question in {list(TRANSLATIONS)!r}:\n"
+        "        response = client.post('/query/stream', json={'user': 'test', 'nl': question})\n"
+        "        records = [json.loads(line) for line in response.text.splitlines() if line]\n"
+        "        counts[question] = [records[-1]['type'], sum(len(r['rows']) for r in records if r['type'] == 'rows')]\n"
+        "    counts['/query'] = client.post('/query', json={'user': 'test', 'nl': 'Toda la telemetría',"
+        " 'explain': 'none'}).json()['rows_count']\n"
+        "print(json.dumps(counts))",
+        tmp_path, GEMINI_API_KEY="test-key", GEMINI_MODEL=DEFAULT_MODEL, GEMINI_BASE_URL="http://127.0.0.1:1",
+        DB_PATH=str(db_path), STREAM_CHUNK_ROWS="500"
+    )
+
+    assert result["Toda la telemetría"] == ["end", TELEMETRY_ROWS]
+    assert result["Toda la telemetría con el límite del prompt"] == ["end", TELEMETRY_ROWS]
+    assert result["Las primeras 20 lecturas"] == ["end", 20]
+    # /query sin paginar conserva el tope por defecto
+    assert result["/query"] == 1000
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
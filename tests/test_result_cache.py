@@ -0,0 +1,67 @@
+"""
+Tests para el cache de resultados SQL
+"""
+
+import pytest
+import sys
+import os
+
+# Agregar directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.lib.result_cache import ResultCache
+
+
+def test_cache_hit_on_normalized_sql():
+    """SQL equivalente salvo espacios y ';' comparte entrada"""
+    cache = ResultCache()
+    cache.put("SELECT * FROM trucks LIMIT 10;", 1, ["truck_id"], [("TRUCK_001",)])
+
+    entry = cache.get("SELECT *\n  FROM trucks   LIMIT 10", 1)
+
+    assert entry is not None
+    assert entry.to_dicts() == [{"truck_id": "TRUCK_001"}]
+    assert cache.stats()["hits"] == 1
+
+
+def test_cache_invalidated_by_dataset_version():
+    """Una nueva versión del dataset no reutiliza resultados anteriores"""
+    cache = ResultCache()
+    cache.put("SELECT * FROM trucks;", 1, ["truck_id"], [("TRUCK_001",)])
+
+    assert cache.get("SELECT * FROM trucks;", 2) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_cache_lru_eviction():
+    """Con max_entries alcanzado se descarta la entrada menos usada"""
+    cache = ResultCache(max_entries=2)
+    cache.put("SELECT 1 FROM trucks;", 1, ["a"], [(1,)])
+    cache.put("SELECT 2 FROM trucks;", 1, ["a"], [(2,)])
+    cache.get("SELECT 1 FROM trucks;", 1)
+    cache.put("SELECT 3 FROM trucks;", 1, ["a"], [(3,)])
+
+    assert cache.get("SELECT 1 FROM trucks;", 1) is not None
+    assert cache.get("SELECT 2 FROM trucks;", 1) is None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_cache_ttl_expiration():
+    """Las entradas vencidas no se sirven"""
+    cache = ResultCache(ttl_s=0)
+    cache.put("SELECT * FROM trucks;", 1, ["truck_id"], [("TRUCK_001",)])
+
+    assert cache.get("SELECT * FROM trucks;", 1) is None
+
+
+def test_cache_skips_oversized_results():
+    """Resultados mayores que max_cells no se guardan"""
+    cache = ResultCache(max_cells=3)
+    entry = cache.put("SELECT * FROM trucks;", 1, ["a", "b"], [(1, 2), (3, 4)])
+
+    assert entry.to_dicts()[1] == {"a": 3, "b": 4}
+    assert cache.stats()["entries"] == 0
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
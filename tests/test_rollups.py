@@ -0,0 +1,138 @@
+"""
+Tests para los rollups diarios y la reescritura de agregaciones
+"""
+
+import pytest
+import sqlite3
+import sys
+import os
+
+# Agregar directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.lib.rollups import ROLLUPS, complete_rollup_sources, refresh_rollup, rewrite_with_rollups
+
+
+@pytest.fixture
+def conn():
+    """Hechos de dos días con rollups construidos"""
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE trucks (truck_id TEXT PRIMARY KEY, brand TEXT, driver_id TEXT, region TEXT, status TEXT)")
+    conn.execute(
+        "CREATE TABLE telemetry (telemetry_id TEXT PRIMARY KEY, truck_id TEXT, timestamp TEXT, "
+        "speed_kmh REAL, fuel_level REAL, engine_temp_c REAL)"
+    )
+    conn.execute(
+        "CREATE TABLE alerts (alert_id TEXT PRIMARY KEY, truck_id TEXT, timestamp TEXT, "
+        "alert_type TEXT, severity TEXT, description TEXT)"
+    )
+    conn.execute(
+        "CREATE TABLE trips (trip_id TEXT PRIMARY KEY, truck_id TEXT, origin TEXT, destination TEXT, "
+        "start_time TEXT, end_time TEXT, distance_km REAL, status TEXT)"
+    )
+    conn.executemany("INSERT INTO trucks VALUES (?, ?, NULL, 'Sur', 'active')",
+                     [("TRUCK_001", "Volvo"), ("TRUCK_002", "Scania")])
+    conn.executemany(
+        "INSERT INTO telemetry VALUES (?, ?, ?, ?, ?, 90)",
+        [(f"T{i}", f"TRUCK_00{i % 2 + 1}", f"2025-10-2{i % 2}T{i % 24:02d}:00:00Z", 50 + i, 10 + i)
+         for i in range(20)]
+    )
+    conn.executemany(
+        "INSERT INTO alerts VALUES (?, 'TRUCK_001', ?, ?, 'high', '')",
+        [("A1", "2025-10-20T08:00:00Z", "temperature"), ("A2", "2025-10-21T09:00:00Z", "temperature"),
+         ("A3", "2025-10-21T10:00:00Z", "speed")]
+    )
+    for source in ("telemetry", "alerts", "trips"):
+        refresh_rollup(conn, ROLLUPS[source], None)
+    return conn
+
+
+def assert_same_result(conn, sql):
+    rewritten = rewrite_with_rollups(sql, complete_rollup_sources(conn))
+    assert rewritten is not None and "rollup_" in rewritten
+
+    raw = conn.execute(sql)
+    expected = ([c[0] for c in raw.description], raw.fetchall())
+    rolled = conn.execute(rewritten)
+    actual = ([c[0] for c in rolled.description], rolled.fetchall())
+
+    assert actual[0] == expected[0]
+    assert actual[1] == pytest.approx(expected[1])
+
+
+def test_alert_counts_from_rollup(conn):
+    """Conteo de alertas por camión con límite de día completo"""
+    assert_same_result(
+        conn,
+        "SELECT truck_id, COUNT(*) as alerts FROM alerts WHERE alert_type = 'temperature' "
+        "AND timestamp >= '2025-10-21' GROUP BY truck_id ORDER BY alerts DESC LIMIT 5;"
+    )
+
+
+def test_average_fuel_by_brand_from_rollup(conn):
+    """AVG se recompone con suma y cantidad, unido a trucks"""
+    assert_same_result(
+        conn,
+        "SELECT t.brand, AVG(tele.fuel_level) as avg_fuel_level, MAX(tele.speed_kmh), COUNT(*) "
+        "FROM trucks t JOIN telemetry tele ON t.truck_id = tele.truck_id "
+        "WHERE tele.timestamp >= date('2025-10-22', '-30 days') GROUP BY t.brand ORDER BY t.brand LIMIT 1000;"
+    )
+
+
+@pytest.mark.parametrize("sql", [
+    # Filtro que no matchea nada: COUNT da 0, no NULL
+    "SELECT COUNT(*) FROM alerts WHERE truck_id = 'NOPE'",
+    "SELECT COUNT(fuel_level), SUM(fuel_level) FROM telemetry WHERE truck_id = 'NOPE'",
+    "SELECT COUNT(*) FROM alerts WHERE timestamp >= '2030-01-01'",
+    # Sin filtro de tiempo (ninguna fila con timestamp NULL)
+    "SELECT alert_type, COUNT(*) FROM alerts GROUP BY alert_type ORDER BY alert_type",
+])
+def test_rewritten_counts_match_raw_tables(conn, sql):
+    """Raw y reescrito dan lo mismo, incluso cuando el filtro no deja filas"""
+    assert_same_result(conn, sql)
+
+
+def test_null_timestamps_keep_unbounded_queries_on_raw_tables(conn):
+    """Las filas con timestamp NULL no están en el rollup: sin límite de tiempo no se reescribe"""
+    conn.execute("INSERT INTO alerts VALUES ('A9', 'TRUCK_001', NULL, 'speed', 'high', '')")
+    coverage = complete_rollup_sources(conn)
+
+    assert "alerts" not in coverage and "telemetry" in coverage
+    assert rewrite_with_rollups("SELECT COUNT(*) FROM alerts", coverage) is None
+    # Con un límite de día la tabla cruda tampoco ve esa fila
+    assert_same_result(conn, "SELECT COUNT(*) FROM alerts WHERE timestamp >= '2025-10-20'")
+
+
+@pytest.mark.parametrize("sql", [
+    # Límite de tiempo que no cae en borde de día
+    "SELECT truck_id, COUNT(*) FROM alerts WHERE timestamp >= datetime('now', '-7 days') GROUP BY truck_id",
+    # Filtro sobre una métrica cruda
+    "SELECT truck_id, COUNT(*) FROM telemetry WHERE fuel_level < 20 GROUP BY truck_id",
+    # Sin agregación
+    "SELECT * FROM alerts WHERE severity = 'critical' ORDER BY timestamp DESC LIMIT 10",
+    # Agregado sobre una columna de dimensión
+    "SELECT COUNT(DISTINCT truck_id) FROM alerts",
+    # Filtro sobre la columna epoch (no existe en el rollup)
+    "SELECT COUNT(*) FROM trips WHERE status = 'finished' AND end_time_epoch >= strftime('%s', date('now'))",
+])
+def test_non_equivalent_queries_are_not_rewritten(sql):
+    """Solo se reescribe lo que da exactamente el mismo resultado"""
+    assert rewrite_with_rollups(sql) is None
+
+
+def test_incremental_refresh_only_touches_changed_days(conn):
+    """Recalcular un día refleja sus cambios y deja el resto intacto"""
+    spec = ROLLUPS["alerts"]
+    conn.execute("INSERT INTO alerts VALUES ('A4', 'TRUCK_002', '2025-10-21T11:00:00Z', 'speed', 'low', '')")
+    # Cambio en un día que no se recalcula: el rollup no lo ve
+    conn.execute("DELETE FROM alerts WHERE alert_id = 'A1'")
+
+    refreshed = refresh_rollup(conn, spec, {"2025-10-21"})
+
+    counts = dict(conn.execute(f"SELECT day, SUM(alert_count) FROM {spec.table} GROUP BY day"))
+    assert refreshed == 1
+    assert counts == {"2025-10-20": 1, "2025-10-21": 3}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
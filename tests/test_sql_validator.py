@@ -9,7 +9,9 @@ import os
 # Agregar directorio raíz al path
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from backend.lib.validate_sql import validate_sql, validate_and_explain, SQLValidationError
+from backend.lib.validate_sql import (
+    validate_sql, validate_and_explain, extract_tables_from_sql, parse_sql, SQLValidationError
+)
 
 
 def test_valid_select():
@@ -131,5 +133,84 @@ def test_sql_with_comments():
     assert "prohibido" in str(exc_info.value).lower() or "--" in str(exc_info.value)
 
 
+def test_cte_names_are_not_tables():
+    """Test los nombres de CTEs no se validan como tablas, sus cuerpos sí"""
+    sql = "WITH a AS (SELECT truck_id FROM trucks), b(n) AS (SELECT COUNT(*) FROM alerts) SELECT a.truck_id, b.n FROM a, b"
+    assert extract_tables_from_sql(sql) == {"trucks", "alerts"}
+    assert validate_sql(sql).endswith("LIMIT 1000;")
+
+    with pytest.raises(SQLValidationError):
+        validate_sql("WITH a AS (SELECT * FROM sqlite_master) SELECT * FROM a")
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM trucks, sqlite_master",
+    'SELECT * FROM trucks t JOIN "sqlite_master" m ON 1 = 1',
+    "SELECT * FROM pragma_table_info('trucks')",
+    "SELECT * FROM main.trucks",
+])
+def test_every_table_reference_is_checked(sql):
+    """Test listas con coma, nombres citados, funciones tabla y esquemas"""
+    with pytest.raises(SQLValidationError) as exc_info:
+        validate_sql(sql)
+    assert "tablas no permitidas" in str(exc_info.value).lower()
+
+
+def test_literals_are_not_inspected():
+    """Test palabras prohibidas y ';' dentro de un literal no son SQL"""
+    sql = "SELECT * FROM alerts WHERE description = 'drop; delete -- x' LIMIT 5"
+    assert validate_sql(sql) == sql + ";"
+
+
+@pytest.mark.parametrize("sql, column", [
+    ("SELECT password FROM drivers", "password"),
+    ("SELECT t.plate FROM alerts t", "t.plate"),
+    ("SELECT * FROM trucks WHERE rowid = 1", "rowid"),
+])
+def test_invalid_columns(sql, column):
+    """Test columnas que no son del schema de las tablas consultadas"""
+    with pytest.raises(SQLValidationError) as exc_info:
+        validate_sql(sql)
+    assert column in str(exc_info.value)
+
+
+def test_aliases_and_keywords_are_not_columns():
+    """Test alias explícitos e implícitos, funciones y palabras clave"""
+    sql = ("SELECT CASE WHEN a.severity = 'high' THEN 1 ELSE 0 END flag, COUNT(*) AS n, "
+           "ROW_NUMBER() OVER (PARTITION BY a.truck_id ORDER BY a.timestamp) rn "
+           "FROM alerts a WHERE a.alert_type = 'x' COLLATE NOCASE AND a.timestamp IS NOT NULL "
+           "GROUP BY flag ORDER BY n DESC")
+    validate_sql(sql)
+    validate_sql("SELECT x.n FROM (SELECT COUNT(*) AS n FROM trips) x")
+
+
+def test_limit_applies_to_top_level():
+    """Test el LIMIT de una subconsulta no exime al nivel superior"""
+    assert validate_sql("SELECT * FROM (SELECT * FROM trucks LIMIT 5)").endswith(") LIMIT 1000;")
+    assert validate_sql("SELECT * FROM trucks LIMIT 5 OFFSET 10;;") == "SELECT * FROM trucks LIMIT 5 OFFSET 10;"
+    assert validate_sql("SELECT * FROM trucks", enforce_limit=False) == "SELECT * FROM trucks;"
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT * FROM trucks LIMIT -1",
+    "SELECT * FROM trucks LIMIT 10, 50000",
+    "SELECT * FROM trucks LIMIT (SELECT 20000)",
+])
+def test_limit_must_be_bounded_integer(sql):
+    """Test LIMIT negativo (sin límite en SQLite), excesivo o no literal"""
+    with pytest.raises(SQLValidationError) as exc_info:
+        validate_sql(sql)
+    assert "limit" in str(exc_info.value).lower()
+
+
+def test_parse_is_memoized():
+    """Test validar el mismo statement dos veces lo analiza una sola vez"""
+    sql = "SELECT plate FROM trucks WHERE truck_id = 'TRUCK_042'"
+    validate_sql(sql)
+    hits = parse_sql.cache_info().hits
+    validate_sql(sql)
+    assert parse_sql.cache_info().hits == hits + 1
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,68 @@
+"""
+Tests del arranque en frío del backend (imports diferidos y LLM en segundo plano)
+"""
+
+import pytest
+import json
+import subprocess
+import sys
+import os
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Agregar directorio raíz al path
+sys.path.insert(0, PROJECT_ROOT)
+
+
+def run_python(code, tmp_path, **env):
+    """Ejecuta código en un intérprete nuevo (imports en frío); JSON de la última línea"""
+    child_env = dict(os.environ)
+    child_env.update(
+        TRANSLATION_CACHE_PATH=str(tmp_path / "translations.db"),
+        LOG_PATH=str(tmp_path / "queries.log"),
+        **env
+    )
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=PROJECT_ROOT, env=child_env,
+        capture_output=True, text=True, timeout=60
+    )
+    assert proc.returncode == 0, proc.stderr
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def test_app_import_defers_heavy_modules(tmp_path):
+    """Importar el backend no carga pandas/duckdb/httpx ni crea el transporte del LLM"""
+    pytest.importorskip("fastapi")
+    result = run_python(
+        "import json, sys\n"
+        "import backend.app as app\n"
+        "print(json.dumps({'loaded': [m for m in ('pandas', 'numpy', 'duckdb', 'httpx') if m in sys.modules],"
+        " 'llm': app.gemini_client.status()}))",
+        tmp_path, GEMINI_API_KEY="test-key"
+    )
+    assert result["loaded"] == []
+    assert result["llm"]["mode"] == "starting"
+    assert result["llm"]["model"] == "gemini-2.0-flash-exp"
+
+
+def test_health_reports_llm_status(tmp_path):
+    """El startup inicia el LLM en segundo plano y /health informa su estado"""
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    result = run_python(
+        "import json\n"
+        "from fastapi.testclient import TestClient\n"
+        "import backend.app as app\n"
+        "with TestClient(app.app) as client:\n"
+        "    assert app.gemini_client.wait_ready(10)\n"
+        "    print(json.dumps(client.get('/health').json()))",
+        tmp_path, GEMINI_API_KEY="test-key", DB_PATH=str(tmp_path / "missing.db")
+    )
+    # Sin base de datos el health es unhealthy, pero informa el LLM igual
+    assert result["status"] == "unhealthy"
+    assert result["llm"]["mode"] == "api"
+    assert result["llm"]["init_ms"] is not None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
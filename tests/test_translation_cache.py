@@ -0,0 +1,96 @@
+"""
+Tests para el cache persistente de traducciones NL→SQL
+"""
+
+import pytest
+import sys
+import os
+
+# Agregar directorio raíz al path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.lib.translation_cache import TranslationCache, normalize_question
+from backend.lib.gemini_client import GeminiClient
+
+
+class FakeTransport:
+    """Transporte que cuenta las llamadas a generate"""
+
+    def __init__(self):
+        self.calls = 0
+
+    async def generate(self, prompt):
+        self.calls += 1
+        return "```sql\nSELECT * FROM trucks LIMIT 10;\n```"
+
+    async def aclose(self):
+        pass
+
+
+def make_client(cache, model_name="gemini-test"):
+    client = GeminiClient(api_key="", translation_cache=cache)
+    client.use_mock = False
+    client.transport = FakeTransport()
+    client.model_name = model_name
+    return client
+
+
+def test_normalize_question():
+    """Mayúsculas, acentos, puntuación y espacios no cambian la clave"""
+    assert normalize_question("¿Cuántos  camiones hay?") == normalize_question("cuantos camiones HAY")
+
+
+def test_cache_survives_restart(tmp_path):
+    """Una nueva instancia sobre el mismo archivo ve las entradas guardadas"""
+    path = str(tmp_path / "translations.db")
+    TranslationCache(path).put("Lista de camiones", "gemini-test", "SELECT * FROM trucks;")
+
+    reopened = TranslationCache(path)
+    assert reopened.get("lista de camiones!", "gemini-test") == "SELECT * FROM trucks;"
+
+
+def test_cache_is_per_model(tmp_path):
+    """Las entradas de otro modelo no se reutilizan"""
+    cache = TranslationCache(str(tmp_path / "translations.db"))
+    cache.put("Lista de camiones", "gemini-a", "SELECT * FROM trucks;")
+
+    assert cache.get("Lista de camiones", "gemini-b") is None
+
+
+def test_cache_lru_eviction(tmp_path):
+    """Se conservan solo las max_entries usadas más recientemente"""
+    cache = TranslationCache(str(tmp_path / "translations.db"), max_entries=2)
+    cache.put("pregunta uno", "m", "SELECT 1 FROM trucks;")
+    cache.put("pregunta dos", "m", "SELECT 2 FROM trucks;")
+    cache.get("pregunta uno", "m")
+    cache.put("pregunta tres", "m", "SELECT 3 FROM trucks;")
+
+    assert cache.get("pregunta uno", "m") is not None
+    assert cache.get("pregunta dos", "m") is None
+    assert cache.stats()["entries"] == 2
+
+
+def test_client_skips_llm_on_cache_hit(tmp_path):
+    """Una pregunta repetida no vuelve a llamar al modelo"""
+    client = make_client(TranslationCache(str(tmp_path / "translations.db")))
+
+    first = client.nl_to_sql("Lista de camiones")
+    second = client.nl_to_sql("lista de camiones?")
+
+    assert first == second == "SELECT * FROM trucks LIMIT 10;"
+    assert client.transport.calls == 1
+
+
+def test_client_invalidate_translation(tmp_path):
+    """Una traducción invalidada se vuelve a generar"""
+    client = make_client(TranslationCache(str(tmp_path / "translations.db")))
+
+    client.nl_to_sql("Lista de camiones")
+    client.invalidate_translation("Lista de camiones")
+    client.nl_to_sql("Lista de camiones")
+
+    assert client.transport.calls == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])